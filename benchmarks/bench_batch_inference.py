@@ -0,0 +1,61 @@
+# rem_accent_checker/benchmarks/bench_batch_inference.py
+"""
+Compares clips/sec of the per-file `classify_audio` loop against `classify_batch`.
+
+Usage:
+    python -m benchmarks.bench_batch_inference --clips 32 --min-seconds 4 --max-seconds 20
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import torch
+import torchaudio
+from utils.classifier import AccentClassifier
+
+SAMPLE_RATE = 16000
+
+def make_clips(output_dir: str, count: int, min_seconds: float, max_seconds: float, seed: int = 0):
+    """Writes `count` synthetic 16 kHz mono WAV clips of random length and returns their paths."""
+    rng = random.Random(seed)
+    torch.manual_seed(seed)
+    paths = []
+    for i in range(count):
+        seconds = rng.uniform(min_seconds, max_seconds)
+        waveform = 0.1 * torch.randn(1, int(seconds * SAMPLE_RATE))
+        path = os.path.join(output_dir, f"clip_{i:03d}.wav")
+        torchaudio.save(path, waveform, SAMPLE_RATE)
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=32)
+    parser.add_argument("--min-seconds", type=float, default=4.0)
+    parser.add_argument("--max-seconds", type=float, default=20.0)
+    parser.add_argument("--max-batch-seconds", type=float, default=AccentClassifier.DEFAULT_MAX_BATCH_SECONDS)
+    args = parser.parse_args()
+
+    classifier = AccentClassifier()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = make_clips(temp_dir, args.clips, args.min_seconds, args.max_seconds)
+        # Warm-up so one-off allocations don't count against either mode.
+        classifier.classify_batch(paths[:2])
+
+        start = time.perf_counter()
+        for path in paths:
+            classifier.classify_audio(path)
+        loop_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        classifier.classify_batch(paths, max_batch_seconds=args.max_batch_seconds)
+        batch_seconds = time.perf_counter() - start
+
+    print(f"clips: {args.clips} ({args.min_seconds:.0f}-{args.max_seconds:.0f}s), torch threads: {torch.get_num_threads()}")
+    print(f"per-file loop : {args.clips / loop_seconds:7.2f} clips/sec ({loop_seconds:.2f}s)")
+    print(f"classify_batch: {args.clips / batch_seconds:7.2f} clips/sec ({batch_seconds:.2f}s)")
+    print(f"speedup       : {loop_seconds / batch_seconds:7.2f}x")
+
+if __name__ == "__main__":
+    main()
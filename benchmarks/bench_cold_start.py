@@ -0,0 +1,57 @@
+# rem_accent_checker/benchmarks/bench_cold_start.py
+"""
+Reports cold-start time, from process launch to the first prediction, with and
+without the offline model bundle.
+
+Build the bundle first (`python -m utils.bundle`). The "hyperparams.yaml" run
+loads through SpeechBrain's pretrainer and needs its usual network/cache access.
+
+Usage:
+    python -m benchmarks.bench_cold_start --runs 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from utils.bundle import default_bundle_path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_SCRIPT = """
+import torch
+from utils.classifier import AccentClassifier
+classifier = AccentClassifier()
+classifier.classify_waveform(torch.zeros(16000 * 5), top_k=1)
+print("READY", flush=True)
+"""
+
+def time_cold_start(bundle_setting: str) -> float:
+    """Launches a fresh interpreter and returns seconds until it printed its first prediction."""
+    env = dict(os.environ, ACCENT_MODEL_BUNDLE=bundle_setting)
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT], cwd=REPO_ROOT, env=env,
+        capture_output=True, text=True, check=False,
+    )
+    elapsed = time.perf_counter() - start
+    if "READY" not in completed.stdout:
+        raise RuntimeError(f"Cold start failed ({bundle_setting}):\n{completed.stderr[-2000:]}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--bundle", default=default_bundle_path(), help="The bundle to benchmark.")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.bundle):
+        sys.exit(f"No bundle at {args.bundle}. Run `python -m utils.bundle` first.")
+
+    for label, setting in (("hyperparams.yaml (before)", "off"), ("offline bundle (after)", args.bundle)):
+        times = [time_cold_start(setting) for _ in range(args.runs)]
+        print(f"{label:<28} median {statistics.median(times):6.2f}s  (runs: {', '.join(f'{t:.2f}' for t in times)})")
+
+if __name__ == "__main__":
+    main()
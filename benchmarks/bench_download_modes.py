@@ -0,0 +1,85 @@
+# rem_accent_checker/benchmarks/bench_download_modes.py
+"""
+Measures bytes downloaded and wall time of `download_video` with and without `audio_only`.
+
+A synthetic clip (720p video + 128 kb/s AAC) and a 48 kb/s audio rendition are
+packaged as a DASH manifest with separate video and audio representations, the
+same shape YouTube serves, and downloaded from a local stub HTTP server.
+
+Usage:
+    python -m benchmarks.bench_download_modes --seconds 120
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from benchmarks.stub_server import StubMediaServer
+from utils.audio_utils import _get_ffmpeg_binary
+from utils.downloader import download_video
+
+def make_dash_fixture(output_dir: str, seconds: float) -> str:
+    """
+    Renders a synthetic clip and packages it as DASH. Returns the manifest file name.
+
+    The manifest uses SegmentTemplate (`-use_template 1`): yt-dlp's MPD parser cannot
+    read ffmpeg's single-file SegmentList output.
+    """
+    ffmpeg = _get_ffmpeg_binary()
+    source = os.path.join(output_dir, "source.mp4")
+    subprocess.run([
+        ffmpeg, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=44100:duration={seconds}",
+        "-filter_complex", "[1:a]asplit=2[a_hi][a_lo]",
+        "-map", "0:v", "-map", "[a_hi]", "-map", "[a_lo]",
+        "-c:v", "libx264", "-preset", "veryfast", "-b:v", "2500k",
+        "-c:a", "aac", "-b:a:0", "128k", "-b:a:1", "48k",
+        source,
+    ], check=True)
+    subprocess.run([
+        ffmpeg, "-y", "-loglevel", "error", "-i", source,
+        "-map", "0:v", "-map", "0:a:0", "-map", "0:a:1", "-c", "copy",
+        "-f", "dash", "-use_template", "1", "-use_timeline", "0",
+        "-adaptation_sets", "id=0,streams=v id=1,streams=a",
+        os.path.join(output_dir, "clip.mpd"),
+    ], check=True)
+    os.remove(source)
+    return "clip.mpd"
+
+def measure(server: StubMediaServer, manifest: str, audio_only: bool):
+    """Downloads the manifest once in the given mode and returns (bytes, seconds, path size)."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        server.reset_counter()
+        start = time.perf_counter()
+        path = download_video(server.url(manifest), output_dir, audio_only=audio_only)
+        elapsed = time.perf_counter() - start
+        if not path or not os.path.exists(path):
+            raise RuntimeError(f"Download failed (audio_only={audio_only})")
+        return server.bytes_sent, elapsed, os.path.getsize(path)
+
+def run_benchmark(seconds: float):
+    """Renders the fixture and measures both modes. Returns [(mode, bytes, seconds, path size)]."""
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        manifest = make_dash_fixture(fixture_dir, seconds)
+        with StubMediaServer(fixture_dir) as server:
+            return [
+                ("video+audio (before)", *measure(server, manifest, audio_only=False)),
+                ("audio_only (after)", *measure(server, manifest, audio_only=True)),
+            ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=120.0, help="Length of the synthetic clip.")
+    args = parser.parse_args()
+
+    rows = run_benchmark(args.seconds)
+
+    print(f"{'mode':<22}{'downloaded':>14}{'on disk':>14}{'wall time':>12}")
+    for mode, sent, elapsed, on_disk in rows:
+        print(f"{mode:<22}{sent / 1e6:>11.2f} MB{on_disk / 1e6:>11.2f} MB{elapsed:>10.2f} s")
+    before, after = rows[0], rows[1]
+    print(f"bytes reduced {before[1] / max(after[1], 1):.1f}x, wall time reduced {before[2] / after[2]:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# rem_accent_checker/benchmarks/bench_import_time.py
+"""
+Import-time regression check for the web app's startup path.
+
+Imports the given modules in a fresh interpreter under `python -X importtime` and
+reports the total and the slowest top-level imports. Exits with status 1 if any of
+the heavy modules (torch, SpeechBrain, yt-dlp, moviepy, pandas) was imported, or
+if the total is over --max-seconds, so a stray top-level import is caught before
+it slows down the first page render again.
+
+Usage:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --modules app --max-seconds 1.5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Sequence
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The project modules app.py imports at the top (streamlit itself is not measured).
+APP_MODULES = (
+    "utils.batch", "utils.downloader", "utils.metrics", "utils.pipeline", "utils.preflight", "utils.progressive",
+    "utils.result_cache", "utils.scratch", "utils.streaming", "utils.warmup",
+)
+# Loaded only at the point of use (model warmup thread, first download, result display).
+HEAVY_MODULES = ("torch", "torchaudio", "speechbrain", "yt_dlp", "moviepy", "pandas")
+
+def measure_imports(modules: Sequence[str]) -> Dict[str, Dict[str, float]]:
+    """
+    Imports `modules` in a fresh interpreter under -X importtime.
+
+    Returns:
+        Dict[str, Dict[str, float]]: For every imported module, its 'self' and
+        'cumulative' seconds and its nesting 'depth' (0 for top-level imports).
+    """
+    statement = f"import {', '.join(modules)}" if modules else "pass"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed:\n{completed.stderr[-2000:]}")
+    timings = {}
+    for line in completed.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        timings[name.strip()] = {
+            "self": int(self_us) / 1e6, "cumulative": int(cumulative_us) / 1e6, "depth": depth,
+        }
+    return timings
+
+def total_seconds(timings: Dict[str, Dict[str, float]], startup: Sequence[str] = ()) -> float:
+    """Time spent in the top-level imports, leaving out the interpreter's own `startup` imports."""
+    return sum(t["cumulative"] for name, t in timings.items() if t["depth"] == 0 and name not in startup)
+
+def heavy_imports(timings: Dict[str, Dict[str, float]], heavy: Sequence[str] = HEAVY_MODULES) -> List[str]:
+    """The heavy packages that were imported."""
+    return sorted(name for name in timings if name in heavy)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=list(APP_MODULES), help="Modules to import together.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure; the median is used.")
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="Budget for the median total.")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list.")
+    args = parser.parse_args()
+
+    # What a bare interpreter imports (site, encodings, ...) is not the app's doing.
+    startup = set(measure_imports([]))
+    runs = [measure_imports(args.modules) for _ in range(args.runs)]
+    totals = [total_seconds(timings, startup) for timings in runs]
+    median = statistics.median(totals)
+    timings = runs[totals.index(sorted(totals)[len(totals) // 2])]
+
+    print(f"{'module':<40}{'cumulative (ms)':>16}")
+    top_level = sorted(
+        ((name, t) for name, t in timings.items() if t["depth"] == 0 and name not in startup),
+        key=lambda item: -item[1]["cumulative"],
+    )
+    for name, t in top_level[: args.top]:
+        print(f"{name:<40}{t['cumulative'] * 1000:>16.1f}")
+    print(f"median total over {args.runs} runs: {median * 1000:.1f} ms (budget {args.max_seconds * 1000:.0f} ms)")
+
+    heavy = heavy_imports(timings)
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if median > args.max_seconds:
+        print("FAIL: import time is over budget.")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK: startup imports are light.")
+
+if __name__ == "__main__":
+    main()
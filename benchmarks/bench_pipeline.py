@@ -0,0 +1,328 @@
+# rem_accent_checker/benchmarks/bench_pipeline.py
+"""
+Offline benchmark suite for the full analysis pipeline.
+
+Synthetic speech-like fixtures (an AAC audio file and an H.264/AAC video per
+length) are rendered with ffmpeg and served from a local stub HTTP server, so
+`download_video` runs exactly as it does against a real host, without the network.
+Every stage (download, extract, vad, classify) and the end-to-end pipeline are
+timed on every fixture; the report has p50/p95 latency, throughput (seconds of
+audio per second of wall time) and the process's peak RSS after each stage.
+
+Results are written as JSON. Pass an earlier run as --baseline to compare: the
+command exits with status 1 if any p50/p95 or the peak RSS regressed by more than
+the thresholds, so it can gate a change in CI.
+
+Usage:
+    python -m benchmarks.bench_pipeline --lengths 10 60 300 --runs 5 --output bench.json
+    python -m benchmarks.bench_pipeline --output new.json --baseline bench.json --max-regression 0.25
+    python -m benchmarks.bench_pipeline --no-model      # media stages only, no model weights needed
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from benchmarks.stub_server import StubMediaServer
+from utils.audio_utils import MODEL_SAMPLE_RATE, _get_ffmpeg_binary, extract_audio_array
+from utils.downloader import download_video
+from utils.vad import trim_silence
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_LENGTHS = (10, 60, 300)
+STAGES = ("download", "extract", "vad", "classify", "end_to_end")
+# Bumped whenever the fixtures or the measurements change, so old baselines are not compared.
+SUITE_VERSION = 1
+
+# A voiced buzz (140 Hz fundamental plus harmonics) with a 4 Hz syllable envelope,
+# a 0.8 s pause every 4 s and a faint noise floor: enough structure for the VAD
+# and the feature extractor to do real work. `random(0)` is seeded, so it is reproducible.
+SPEECH_LIKE_EXPRESSION = (
+    "0.25*(sin(2*PI*140*t)+0.5*sin(2*PI*280*t)+0.3*sin(2*PI*420*t)+0.2*sin(2*PI*700*t))"
+    "*(0.55+0.45*sin(2*PI*4*t))*lt(mod(t\\,4)\\,3.2)"
+    "+0.003*(2*random(0)-1)"
+)
+
+def make_fixtures(output_dir: str, lengths: Sequence[int], video: bool = True) -> List[Dict[str, Any]]:
+    """
+    Renders the fixtures into `output_dir`, reusing files already there.
+
+    Returns:
+        List[Dict[str, Any]]: One {'name', 'kind', 'seconds'} entry per fixture.
+    """
+    ffmpeg = _get_ffmpeg_binary()
+    if not ffmpeg:
+        sys.exit("ffmpeg is required to render the benchmark fixtures.")
+    os.makedirs(output_dir, exist_ok=True)
+    fixtures = []
+    for seconds in lengths:
+        audio_source = ["-f", "lavfi", "-i", f"aevalsrc=exprs='{SPEECH_LIKE_EXPRESSION}':s=44100:d={seconds}"]
+        renders = [("audio", f"speech_{seconds}s.m4a", audio_source + ["-c:a", "aac", "-b:a", "64k"])]
+        if video:
+            renders.append(("video", f"speech_{seconds}s.mp4", [
+                "-f", "lavfi", "-i", f"testsrc2=size=640x360:rate=25:duration={seconds}", *audio_source,
+                "-map", "0:v", "-map", "1:a", "-c:v", "libx264", "-preset", "veryfast", "-b:v", "800k",
+                "-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart",
+            ]))
+        for kind, name, args in renders:
+            path = os.path.join(output_dir, name)
+            if not os.path.exists(path):
+                subprocess.run([ffmpeg, "-y", "-loglevel", "error", *args, path], check=True)
+            fixtures.append({"name": name, "kind": kind, "seconds": float(seconds)})
+    return fixtures
+
+def peak_rss_mb() -> float:
+    """The process's peak resident set size so far (a high-water mark, never decreases)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (q in [0, 100]) of a non-empty sequence."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+def summarize(latencies: Sequence[float], audio_seconds: float, rss_mb: float) -> Dict[str, float]:
+    """Collapses the timings of one stage on one fixture into the reported statistics."""
+    mean = sum(latencies) / len(latencies)
+    return {
+        "runs": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "mean": mean,
+        "throughput_x_realtime": audio_seconds / mean if mean > 0 else 0.0,
+        "peak_rss_mb": rss_mb,
+    }
+
+def time_runs(func: Callable[[], Any], runs: int, warmup: int) -> List[float]:
+    """Calls `func` `warmup` times untimed, then `runs` times timed. Raises if it returns None."""
+    latencies = []
+    for i in range(warmup + runs):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if result is None:
+            raise RuntimeError("The stage returned no result.")
+        if i >= warmup:
+            latencies.append(elapsed)
+    return latencies
+
+def run_suite(
+    fixtures: List[Dict[str, Any]],
+    server: StubMediaServer,
+    classifier=None,
+    runs: int = 5,
+    warmup: int = 1,
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Times each stage on each fixture. Stages run one after another over all fixtures,
+    so the peak RSS recorded after a stage includes that stage's allocations.
+
+    Args:
+        fixtures: The entries returned by `make_fixtures`, served by `server`.
+        server (StubMediaServer): Serves the fixture directory.
+        classifier: An AccentClassifier or InferenceClient; None skips classify and end_to_end.
+        runs (int): Timed runs per stage and fixture.
+        warmup (int): Untimed runs before those.
+
+    Returns:
+        Dict: results[fixture name][stage] -> the `summarize` statistics.
+    """
+    results: Dict[str, Dict[str, Dict[str, float]]] = {f["name"]: {} for f in fixtures}
+    downloads: Dict[str, str] = {}
+    waveforms: Dict[str, Any] = {}
+    speech: Dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as work_dir:
+        for fixture in fixtures:
+            name = fixture["name"]
+
+            def download():
+                output_dir = tempfile.mkdtemp(dir=work_dir)
+                downloads[name] = download_video(server.url(name), output_dir, audio_only=True)
+                return downloads[name]
+
+            latencies = time_runs(download, runs, warmup)
+            results[name]["download"] = summarize(latencies, fixture["seconds"], peak_rss_mb())
+
+        for fixture in fixtures:
+            name = fixture["name"]
+
+            def extract():
+                waveforms[name] = extract_audio_array(downloads[name], sample_rate=MODEL_SAMPLE_RATE)
+                return waveforms[name]
+
+            latencies = time_runs(extract, runs, warmup)
+            results[name]["extract"] = summarize(latencies, fixture["seconds"], peak_rss_mb())
+
+        for fixture in fixtures:
+            name = fixture["name"]
+
+            def vad():
+                speech[name] = trim_silence(waveforms[name])[0]
+                return speech[name]
+
+            latencies = time_runs(vad, runs, warmup)
+            results[name]["vad"] = summarize(latencies, fixture["seconds"], peak_rss_mb())
+
+        if classifier is None:
+            return results
+
+        for fixture in fixtures:
+            name = fixture["name"]
+            latencies = time_runs(lambda: classifier.classify_waveform(speech[name]) or None, runs, warmup)
+            results[name]["classify"] = summarize(latencies, fixture["seconds"], peak_rss_mb())
+
+        # Imported here; the pipeline pulls in nothing the media stages need.
+        from utils.pipeline import AnalysisPipeline, DONE
+        pipeline = AnalysisPipeline(classifier, result_cache=None)
+        for fixture in fixtures:
+            name = fixture["name"]
+
+            def end_to_end():
+                job = pipeline.get(pipeline.submit(server.url(name), max_duration=None, use_cache=False))
+                job.wait()
+                return job if job.status == DONE else None
+
+            latencies = time_runs(end_to_end, runs, warmup)
+            results[name]["end_to_end"] = summarize(latencies, fixture["seconds"], peak_rss_mb())
+    return results
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    max_regression: float = 0.25,
+    min_delta_seconds: float = 0.02,
+    max_rss_regression: float = 0.2,
+) -> List[str]:
+    """
+    Lists the regressions of `current` against `baseline` (both `main` JSON reports).
+
+    A latency regresses when it is more than `max_regression` (a fraction) slower
+    and also at least `min_delta_seconds` slower, so sub-millisecond stages do not
+    fail on noise. Stages or fixtures missing from either report are not compared.
+
+    Returns:
+        List[str]: One human-readable line per regression; empty if there are none.
+    """
+    if baseline.get("suite_version") != current.get("suite_version"):
+        return [f"Baseline is suite version {baseline.get('suite_version')}, not {current.get('suite_version')}."]
+    regressions = []
+    for fixture, stages in current["results"].items():
+        for stage, stats in stages.items():
+            before = baseline["results"].get(fixture, {}).get(stage)
+            if before is None:
+                continue
+            for metric in ("p50", "p95"):
+                delta = stats[metric] - before[metric]
+                if delta > min_delta_seconds and stats[metric] > before[metric] * (1 + max_regression):
+                    regressions.append(
+                        f"{fixture} {stage} {metric}: {before[metric]:.3f}s -> {stats[metric]:.3f}s "
+                        f"(+{delta / before[metric]:.0%})"
+                    )
+            if stats["peak_rss_mb"] > before["peak_rss_mb"] * (1 + max_rss_regression):
+                regressions.append(
+                    f"{fixture} {stage} peak RSS: {before['peak_rss_mb']:.0f} MB -> {stats['peak_rss_mb']:.0f} MB"
+                )
+    return regressions
+
+def environment() -> Dict[str, Any]:
+    """What the numbers depend on, recorded so runs on different machines are not mistaken for regressions."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+def load_classifier(engine: Optional[str]):
+    inference_url = os.environ.get("ACCENT_INFERENCE_URL")
+    if inference_url:
+        from utils.inference_client import InferenceClient
+        return InferenceClient(inference_url)
+    from utils.classifier import AccentClassifier
+    return AccentClassifier(engine=engine)
+
+def print_report(results: Dict[str, Dict[str, Dict[str, float]]]):
+    print(f"{'fixture':<22}{'stage':<12}{'p50 (s)':>10}{'p95 (s)':>10}{'x realtime':>12}{'peak RSS (MB)':>15}")
+    for fixture, stages in results.items():
+        for stage in STAGES:
+            if stage in stages:
+                s = stages[stage]
+                print(
+                    f"{fixture:<22}{stage:<12}{s['p50']:>10.3f}{s['p95']:>10.3f}"
+                    f"{s['throughput_x_realtime']:>12.1f}{s['peak_rss_mb']:>15.0f}"
+                )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=list(DEFAULT_LENGTHS), help="Fixture lengths in seconds.")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per stage and fixture.")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs before those.")
+    parser.add_argument("--audio-only-fixtures", action="store_true", help="Skip the video fixtures.")
+    parser.add_argument("--fixture-dir", help="Keep the rendered fixtures here and reuse them on later runs.")
+    parser.add_argument("--no-model", action="store_true", help="Skip the classify and end_to_end stages.")
+    parser.add_argument("--engine", choices=("torch", "onnx"), help="AccentClassifier engine (default: its own default).")
+    parser.add_argument("--output", help="Write the JSON report here.")
+    parser.add_argument("--baseline", help="An earlier JSON report to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed latency increase (fraction).")
+    parser.add_argument("--min-delta-ms", type=float, default=20.0, help="Ignore latency increases smaller than this.")
+    parser.add_argument("--max-rss-regression", type=float, default=0.2, help="Allowed peak RSS increase (fraction).")
+    args = parser.parse_args()
+
+    classifier = None if args.no_model else load_classifier(args.engine)
+    with tempfile.TemporaryDirectory(prefix="bench_fixtures_") as scratch:
+        fixture_dir = args.fixture_dir or scratch
+        fixtures = make_fixtures(fixture_dir, args.lengths, video=not args.audio_only_fixtures)
+        with StubMediaServer(fixture_dir) as server:
+            results = run_suite(fixtures, server, classifier, runs=args.runs, warmup=args.warmup)
+
+    report = {
+        "suite_version": SUITE_VERSION,
+        "environment": environment(),
+        "config": {
+            "lengths": args.lengths, "runs": args.runs, "warmup": args.warmup,
+            "video_fixtures": not args.audio_only_fixtures,
+            "model": getattr(classifier, "model_version", None),
+        },
+        "results": results,
+    }
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(
+            report, baseline, max_regression=args.max_regression,
+            min_delta_seconds=args.min_delta_ms / 1000.0, max_rss_regression=args.max_rss_regression,
+        )
+        if regressions:
+            print("FAIL: regressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("OK: no regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# rem_accent_checker/benchmarks/bench_prefork.py
+"""
+Memory and throughput of the pre-forked inference workers as the worker count grows.
+
+For every worker count, starts a `utils.prefork.PreforkServer` in two modes:
+    shared      the model is loaded once before forking (the production mode)
+    per-worker  every worker loads its own copy after the fork (the baseline)
+and drives it with concurrent /v1/classify requests. Reported per run: requests/s,
+audio seconds classified per second, p50/p95 latency, and the workers' total RSS
+and PSS. RSS counts shared pages once per process, so PSS (each shared page
+divided among the processes mapping it) is the number that shows the saving.
+
+Each run happens in a fresh interpreter, so one run's leftovers (memory, threads
+in the forking parent) cannot skew the next.
+
+Without the model weights (or to see the effect quickly), --synthetic-model-mb
+replaces the classifier with a stack of linear layers of that size.
+
+Usage:
+    python -m benchmarks.bench_prefork --workers 1 2 4 --requests 200 --concurrency 16
+    python -m benchmarks.bench_prefork --synthetic-model-mb 80 --output prefork.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from benchmarks.bench_pipeline import percentile
+from utils.inference_client import InferenceClient
+from utils.prefork import PreforkServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ("shared", "per-worker")
+SAMPLE_RATE = 16000
+
+class SyntheticClassifier:
+    """A stand-in with `size_mb` of torch weights that does real matrix work per clip."""
+
+    LAYER_WIDTH = 1024
+
+    def __init__(self, size_mb: float):
+        import torch
+        self._torch = torch
+        layers = max(1, int(size_mb * 1e6 / (self.LAYER_WIDTH * self.LAYER_WIDTH * 4)))
+        torch.manual_seed(0)
+        self.classifier = torch.nn.Module()
+        self.classifier.mods = torch.nn.ModuleDict({
+            "embedding_model": torch.nn.Sequential(*[
+                torch.nn.Linear(self.LAYER_WIDTH, self.LAYER_WIDTH) for _ in range(layers)
+            ]),
+        })
+        self.onnx_engine = None
+        self.bundle_path = None
+        self.model_version = f"synthetic-{size_mb:g}mb"
+        self.sample_rate = SAMPLE_RATE
+        self.embedding_dim = self.LAYER_WIDTH
+
+    def classify_batch(self, waveforms: List[np.ndarray], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        results = []
+        with self._torch.inference_mode():
+            for waveform in waveforms:
+                usable = len(waveform) // self.LAYER_WIDTH * self.LAYER_WIDTH
+                frames = self._torch.from_numpy(np.ascontiguousarray(waveform[:usable])).view(-1, self.LAYER_WIDTH)
+                score = float(self.classifier.mods["embedding_model"](frames).mean())
+                results.append([{"label": "synthetic", "score": score}][:top_k])
+        return results
+
+def process_memory_mb(pid: int) -> Dict[str, Optional[float]]:
+    """A process's RSS and PSS from /proc/<pid>/smaps_rollup (None where unavailable)."""
+    memory = {"rss_mb": None, "pss_mb": None}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                field, value = line.split(":", 1)
+                if field in ("Rss", "Pss"):
+                    memory[f"{field.lower()}_mb"] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return memory
+
+def drive(url: str, requests: int, concurrency: int, clip_seconds: float) -> Dict[str, float]:
+    """Sends `requests` one-clip classifications, `concurrency` at a time; returns throughput and latency."""
+    rng = np.random.default_rng(0)
+    clip = (0.1 * rng.standard_normal(int(clip_seconds * SAMPLE_RATE))).astype(np.float32)
+    client = InferenceClient(url, max_pending=concurrency)
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        def timed_request(_) -> float:
+            start = time.perf_counter()
+            client.classify_waveform(clip, top_k=1)
+            return time.perf_counter() - start
+
+        # The first request on each worker pays for lazy initialization.
+        list(pool.map(timed_request, range(concurrency)))
+        start = time.perf_counter()
+        latencies = list(pool.map(timed_request, range(requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.shutdown()
+        client.close()
+    return {
+        "requests_per_second": requests / elapsed,
+        "audio_seconds_per_second": requests * clip_seconds / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+def run(
+    load: Callable[[], Any],
+    workers: int,
+    mode: str,
+    requests: int,
+    concurrency: int,
+    clip_seconds: float,
+    threads_per_worker: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Measures one worker count in one mode."""
+    server = PreforkServer(
+        load, workers=workers, port=0, threads_per_worker=threads_per_worker, preload=mode == "shared",
+    )
+    server.start()
+    try:
+        report = {"workers": workers, "mode": mode, "threads_per_worker": server.threads_per_worker}
+        report.update(drive(server.url, requests, concurrency, clip_seconds))
+        # After the load, so every worker has touched the weights and allocated its buffers.
+        memory = [process_memory_mb(pid) for pid in server.worker_pids]
+        for field in ("rss_mb", "pss_mb"):
+            values = [m[field] for m in memory]
+            report[f"workers_{field}"] = sum(values) if None not in values else None
+    finally:
+        server.stop()
+    return report
+
+def run_isolated(args: argparse.Namespace, workers: int, mode: str) -> Dict[str, Any]:
+    """Runs `run` for one worker count and mode in a new interpreter and returns its report."""
+    command = [
+        sys.executable, "-m", "benchmarks.bench_prefork", "--single",
+        "--workers", str(workers), "--modes", mode, "--requests", str(args.requests),
+        "--concurrency", str(args.concurrency), "--clip-seconds", str(args.clip_seconds),
+        "--synthetic-model-mb", str(args.synthetic_model_mb),
+    ]
+    if args.threads_per_worker:
+        command += ["--threads-per-worker", str(args.threads_per_worker)]
+    completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Run with {workers} {mode} workers failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def format_report(reports: Sequence[Dict[str, Any]]) -> str:
+    lines = [f"{'workers':>8}{'mode':>12}{'threads':>9}{'req/s':>9}{'audio s/s':>11}"
+             f"{'p50 ms':>9}{'p95 ms':>9}{'RSS MB':>9}{'PSS MB':>9}"]
+    for r in reports:
+        rss = f"{r['workers_rss_mb']:.0f}" if r["workers_rss_mb"] is not None else "n/a"
+        pss = f"{r['workers_pss_mb']:.0f}" if r["workers_pss_mb"] is not None else "n/a"
+        lines.append(
+            f"{r['workers']:>8}{r['mode']:>12}{r['threads_per_worker']:>9}{r['requests_per_second']:>9.1f}"
+            f"{r['audio_seconds_per_second']:>11.1f}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{rss:>9}{pss:>9}"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to measure.")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per run.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once.")
+    parser.add_argument("--clip-seconds", type=float, default=6.0)
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Torch threads per worker (default: CPU cores divided by the worker count).")
+    parser.add_argument("--synthetic-model-mb", type=float, default=0.0,
+                        help="Use a synthetic model of this size instead of AccentClassifier.")
+    parser.add_argument("--output", default=None, help="Write the reports as JSON.")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        if args.synthetic_model_mb:
+            load = lambda: SyntheticClassifier(args.synthetic_model_mb)
+        else:
+            from utils.inference_server import load_classifier
+            load = lambda: load_classifier(with_embedding_store=False)
+        report = run(
+            load, args.workers[0], args.modes[0], args.requests, args.concurrency, args.clip_seconds,
+            args.threads_per_worker,
+        )
+        print(json.dumps(report))
+        return
+
+    reports = []
+    for workers in args.workers:
+        for mode in args.modes:
+            reports.append(run_isolated(args, workers, mode))
+            print(format_report(reports[-1:]).splitlines()[-1], flush=True)
+
+    print()
+    print(format_report(reports))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"cpu_count": os.cpu_count(), "reports": reports}, f, indent=2)
+        print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
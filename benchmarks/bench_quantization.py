@@ -0,0 +1,60 @@
+# rem_accent_checker/benchmarks/bench_quantization.py
+"""
+Latency and memory of the fp32 and int8 CPU backends.
+
+Each mode runs in a fresh interpreter so that peak RSS reflects that mode alone.
+
+Usage:
+    python -m benchmarks.bench_quantization --seconds 30 --runs 10 --threads 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_SCRIPT = """
+import json, resource, statistics, sys, time
+import torch
+from utils.classifier import AccentClassifier
+quantize, seconds, runs, threads = sys.argv[1] or None, float(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+classifier = AccentClassifier(quantize=quantize, num_threads=threads)
+waveform = 0.1 * torch.randn(int(seconds * 16000))
+classifier.classify_waveform(waveform)
+latencies = []
+for _ in range(runs):
+    start = time.perf_counter()
+    classifier.classify_waveform(waveform)
+    latencies.append(time.perf_counter() - start)
+latencies.sort()
+print(json.dumps({
+    "p50": statistics.median(latencies),
+    "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+def run_mode(quantize: str, seconds: float, runs: int, threads: int) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, quantize, str(seconds), str(runs), str(threads)],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0, help="Clip length per inference.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{args.seconds:.0f}s clips, {args.runs} runs, {args.threads} threads")
+    print(f"{'mode':<8}{'p50 (s)':>10}{'p95 (s)':>10}{'peak RSS (MB)':>16}")
+    for label, quantize in (("fp32", ""), ("int8", "int8")):
+        stats = run_mode(quantize, args.seconds, args.runs, args.threads)
+        print(f"{label:<8}{stats['p50']:>10.3f}{stats['p95']:>10.3f}{stats['peak_rss_mb']:>16.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# rem_accent_checker/benchmarks/quantization_parity.py
+"""
+Accuracy-parity harness for the int8 backend: compares top-1 predictions and score
+drift against the fp32 model on a set of audio fixtures, or on synthetic voiced
+clips (--synthetic N) when there are none.
+
+Exits with status 1 if the top-1 agreement or the score drift is outside the limits,
+so it can gate a change to the quantization setup.
+
+Usage:
+    python -m benchmarks.quantization_parity --fixtures tests/fixtures --min-top1-agreement 0.95
+    python -m benchmarks.quantization_parity --synthetic 32
+"""
+import argparse
+import glob
+import os
+import sys
+import numpy as np
+import torch
+from utils.classifier import AccentClassifier
+
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures")
+AUDIO_PATTERNS = ("*.wav", "*.flac", "*.mp3", "*.m4a", "*.ogg")
+
+def synthetic_clips(count: int, seconds: float = 3.0, sample_rate: int = 16000, seed: int = 0):
+    """
+    Voice-like test clips: a harmonic series at a random pitch with vibrato and a
+    syllable-rate amplitude envelope, plus a little noise. Not speech, but it drives
+    the network through the same ranges of activations.
+
+    Returns:
+        Dict[str, np.ndarray]: Clip names mapped to mono float32 waveforms.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    clips = {}
+    for i in range(count):
+        pitch = rng.uniform(90.0, 250.0) * (1.0 + 0.03 * np.sin(2 * np.pi * rng.uniform(3.0, 6.0) * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+        voiced = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 9))
+        envelope = 0.55 + 0.45 * np.sin(2 * np.pi * rng.uniform(2.0, 5.0) * t)
+        clip = voiced * envelope + 0.05 * rng.standard_normal(t.size)
+        clips[f"synthetic_{i:03d}"] = (0.5 * clip / np.abs(clip).max()).astype(np.float32)
+    return clips
+
+def full_scores(classifier: AccentClassifier, names, items):
+    """Returns the kept names and an [n_items, n_labels] score matrix (items that fail to load are dropped)."""
+    embeddings = classifier.embed(items)
+    kept = [(name, e) for name, e in zip(names, embeddings) if e is not None]
+    if not kept:
+        return [], torch.empty(0)
+    return [n for n, _ in kept], torch.from_numpy(classifier._score(np.stack([e for _, e in kept])))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR, help="Directory of audio files.")
+    parser.add_argument("--min-top1-agreement", type=float, default=0.95)
+    parser.add_argument("--max-score-drift", type=float, default=0.05, help="Max absolute score difference.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Compare on this many synthetic clips instead.")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        clips = synthetic_clips(args.synthetic)
+        names, items = list(clips), list(clips.values())
+    else:
+        paths = sorted(p for pattern in AUDIO_PATTERNS for p in glob.glob(os.path.join(args.fixtures, "**", pattern), recursive=True))
+        if not paths:
+            sys.exit(f"No audio fixtures found in {args.fixtures}; use --synthetic N to compare on synthetic clips.")
+        names, items = [os.path.relpath(p, args.fixtures) for p in paths], paths
+
+    fp32_names, fp32 = full_scores(AccentClassifier(), names, items)
+    int8_names, int8 = full_scores(AccentClassifier(quantize="int8"), names, items)
+    if fp32_names != int8_names or not fp32_names:
+        sys.exit("The two backends could not load the same fixtures.")
+
+    top1_fp32, top1_int8 = fp32.argmax(dim=-1), int8.argmax(dim=-1)
+    agreement = (top1_fp32 == top1_int8).float().mean().item()
+    drift = (fp32 - int8).abs()
+    print(f"fixtures          : {len(fp32_names)}")
+    print(f"top-1 agreement   : {agreement:.2%} (min {args.min_top1_agreement:.2%})")
+    print(f"score drift mean  : {drift.mean().item():.4f}")
+    print(f"score drift max   : {drift.max().item():.4f} (max {args.max_score_drift:.4f})")
+    for name, a, b in zip(fp32_names, top1_fp32.tolist(), top1_int8.tolist()):
+        if a != b:
+            print(f"  top-1 differs: {name}")
+
+    if agreement < args.min_top1_agreement or drift.max().item() > args.max_score_drift:
+        print("FAIL: int8 backend is outside the parity limits.")
+        sys.exit(1)
+    print("OK: int8 backend is within the parity limits.")
+
+if __name__ == "__main__":
+    main()
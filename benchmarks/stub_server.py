@@ -0,0 +1,76 @@
+# rem_accent_checker/benchmarks/stub_server.py
+"""
+A local HTTP server for exercising `download_video` offline.
+
+It serves a directory of fixture files and counts the bytes it sends, so benchmarks
+can report exactly how much a download mode transferred.
+"""
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+class _CountingHandler(SimpleHTTPRequestHandler):
+    """Serves files from the server's directory and adds every body byte to a counter."""
+
+    extensions_map = {
+        **SimpleHTTPRequestHandler.extensions_map,
+        '.mpd': 'application/dash+xml',
+        '.m4a': 'audio/mp4',
+        '.mp4': 'video/mp4',
+    }
+
+    def copyfile(self, source, outputfile):
+        server = self.server
+        while True:
+            chunk = source.read(64 * 1024)
+            if not chunk:
+                break
+            try:
+                outputfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                # yt-dlp closes probing connections early; that is not an error.
+                return
+            with server.counter_lock:
+                server.bytes_sent += len(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubMediaServer:
+    """
+    Serves `directory` on 127.0.0.1 from a background thread.
+
+    Usage:
+        with StubMediaServer(fixture_dir) as server:
+            download_video(server.url("clip.mpd"), out_dir)
+            print(server.bytes_sent)
+    """
+
+    def __init__(self, directory: str, port: int = 0):
+        handler = functools.partial(_CountingHandler, directory=directory)
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._httpd.bytes_sent = 0
+        self._httpd.counter_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def bytes_sent(self) -> int:
+        return self._httpd.bytes_sent
+
+    def reset_counter(self):
+        with self._httpd.counter_lock:
+            self._httpd.bytes_sent = 0
+
+    def url(self, name: str) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+    def __enter__(self) -> "StubMediaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,38 @@
+# tests/conftest.py
+import os
+import pytest
+import torch
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'utils', 'accent_id_model_clean')
+HYPERPARAMS_PATH = os.path.join(MODEL_DIR, 'hyperparams.yaml')
+
+@pytest.fixture
+def temp_dir(tmpdir):
+    """A pytest fixture to create a temporary directory for test artifacts."""
+    return str(tmpdir)
+
+@pytest.fixture(scope="session")
+def reference_model():
+    """
+    Builds the model described by hyperparams.yaml with random weights (no network access)
+    and returns it with its hyperparams text and a label map.
+    """
+    from hyperpyyaml import load_hyperpyyaml
+    from speechbrain.inference import EncoderClassifier
+
+    torch.manual_seed(0)
+    with open(HYPERPARAMS_PATH, "r", encoding="utf-8") as f:
+        hyperparams_text = f.read()
+    hparams = load_hyperpyyaml(hyperparams_text)
+    model = EncoderClassifier(modules=hparams["modules"], hparams=hparams)
+    labels = {i: f"accent_{i}" for i in range(hparams["n_languages"])}
+    return model, hyperparams_text, labels
+
+@pytest.fixture(scope="session")
+def bundle_path(reference_model, tmp_path_factory):
+    """Writes the random-weight reference model as an offline model bundle."""
+    from utils.bundle import write_bundle
+
+    model, hyperparams_text, labels = reference_model
+    path = str(tmp_path_factory.mktemp("bundle") / "accent_id_bundle.pt")
+    return write_bundle(model.mods, labels, hyperparams_text, path)
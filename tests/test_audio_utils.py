@@ -1,7 +1,11 @@
 # tests/test_audio_utils.py
+import io
 import os
+import numpy as np
 import pytest
-from utils.audio_utils import extract_audio
+import soundfile as sf
+from unittest.mock import MagicMock
+from utils.audio_utils import _get_ffmpeg_binary, extract_audio, extract_audio_array, load_media_audio
 
 # Define the path to the fixtures directory
 FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
@@ -45,8 +49,8 @@ def test_extract_audio_no_audio_track(mocker, temp_output_path):
     # Simulate a clip with no audio
     mock_clip_instance.audio = None
     
-    # Patch the class in the audio_utils module
-    mocker.patch('utils.audio_utils.VideoFileClip', return_value=mock_clip_instance)
+    # Patch the class where audio_utils imports it from (the import is deferred)
+    mocker.patch('moviepy.editor.VideoFileClip', return_value=mock_clip_instance)
     
     # The video path must exist for the initial check, so we can use a dummy file
     dummy_video_path = "dummy.mp4"
@@ -71,7 +75,7 @@ def test_extract_audio_exception_on_write(mocker, temp_output_path):
     mock_video_clip_instance = MagicMock()
     mock_video_clip_instance.audio = mock_audio_clip
     
-    mocker.patch('utils.audio_utils.VideoFileClip', return_value=mock_video_clip_instance)
+    mocker.patch('moviepy.editor.VideoFileClip', return_value=mock_video_clip_instance)
     mocker.patch('os.path.exists', return_value=True)
     
     result = extract_audio("dummy.mp4", temp_output_path)
@@ -79,4 +83,147 @@ def test_extract_audio_exception_on_write(mocker, temp_output_path):
     # Assertions
     assert result is None
     mock_video_clip_instance.close.assert_called_once() # Ensure parent clip is closed
-    assert not os.path.exists(temp_output_path)
\ No newline at end of file
+    assert not os.path.exists(temp_output_path)
+
+def test_extract_audio_opens_webm_downloads_as_audio(mocker, temp_output_path):
+    """
+    Test that a bestaudio .webm (opus) download is opened as an audio clip, not a video clip.
+    """
+    audio_clip = MagicMock()
+    audio_file_clip = mocker.patch('moviepy.editor.AudioFileClip', return_value=audio_clip)
+    video_file_clip = mocker.patch('moviepy.editor.VideoFileClip')
+    mocker.patch('os.path.exists', return_value=True)
+
+    result = extract_audio("talk.webm", temp_output_path)
+
+    assert result == temp_output_path
+    audio_file_clip.assert_called_once_with("talk.webm")
+    video_file_clip.assert_not_called()
+    audio_clip.write_audiofile.assert_called_once()
+
+def _mock_ffmpeg_process(mocker, stdout_chunks, return_code=0, stderr=b""):
+    """Patches subprocess.Popen in audio_utils with a fake ffmpeg process."""
+    process = MagicMock()
+    process.stdout.read.side_effect = list(stdout_chunks) + [b""]
+    process.stderr.read.return_value = stderr
+    process.wait.return_value = return_code
+    popen = mocker.patch('utils.audio_utils.subprocess.Popen')
+    popen.return_value.__enter__.return_value = process
+    mocker.patch('utils.audio_utils._get_ffmpeg_binary', return_value="ffmpeg")
+    return popen
+
+def test_extract_audio_array_video_not_found():
+    """
+    Test that in-memory extraction returns None when the input file does not exist.
+    """
+    assert extract_audio_array("/path/to/non_existent_video.mp4") is None
+
+def test_extract_audio_array_decodes_pipe_output(mocker):
+    """
+    Test that raw f32le samples from the ffmpeg pipe become a writable float32 array.
+    """
+    samples = np.linspace(-1.0, 1.0, 1000, dtype="<f4")
+    raw = samples.tobytes()
+    popen = _mock_ffmpeg_process(mocker, [raw[:1024], raw[1024:]])
+    mocker.patch('os.path.exists', return_value=True)
+
+    audio = extract_audio_array("dummy.mp4")
+
+    assert audio.dtype == np.float32
+    assert audio.flags.writeable
+    np.testing.assert_array_equal(audio, samples)
+    command = popen.call_args.args[0]
+    assert command[-1] == "pipe:1"
+    assert command[command.index("-f") + 1] == "f32le"
+    assert command[command.index("-ar") + 1] == "16000"
+    assert command[command.index("-ac") + 1] == "1"
+
+def test_extract_audio_array_ffmpeg_failure(mocker):
+    """
+    Test that a failing ffmpeg run (e.g. no audio stream) returns None.
+    """
+    _mock_ffmpeg_process(mocker, [], return_code=1, stderr=b"Output file does not contain any stream")
+    mocker.patch('os.path.exists', return_value=True)
+
+    assert extract_audio_array("dummy.mp4") is None
+
+def test_extract_audio_array_time_window(mocker):
+    """
+    Test that the window is passed to ffmpeg as an input seek plus an output duration.
+    """
+    popen = _mock_ffmpeg_process(mocker, [np.zeros(160, dtype="<f4").tobytes()])
+    mocker.patch('os.path.exists', return_value=True)
+
+    extract_audio_array("dummy.mp4", start_offset=12.5, max_duration=30)
+
+    command = popen.call_args.args[0]
+    assert command[command.index("-ss") + 1] == "12.500"
+    assert command.index("-ss") < command.index("-i") < command.index("-t")
+    assert command[command.index("-t") + 1] == "30.000"
+
+def _wav_bytes(samples: np.ndarray, sample_rate: int, subtype: str = "FLOAT", format: str = "WAV") -> bytes:
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, subtype=subtype, format=format)
+    return buffer.getvalue()
+
+def test_load_media_audio_reads_model_rate_wav_without_ffmpeg(mocker):
+    """
+    Test that an upload that is already 16 kHz mono WAV is read directly, never starting ffmpeg.
+    """
+    popen = mocker.patch('utils.audio_utils.subprocess.Popen')
+    probe = mocker.patch('utils.audio_utils.probe_media')
+    samples = np.linspace(-0.5, 0.5, 32000, dtype=np.float32)
+
+    audio = load_media_audio(_wav_bytes(samples, 16000), start_offset=0.5, max_duration=1.0)
+
+    np.testing.assert_array_equal(audio, samples[8000:24000])
+    popen.assert_not_called()
+    probe.assert_not_called()
+
+def test_load_media_audio_skips_media_without_audio_stream(mocker):
+    """
+    Test that a probe showing no audio stream stops before decoding.
+    """
+    mocker.patch('utils.audio_utils.probe_media', return_value={"streams": [{"codec_type": "video"}]})
+    popen = mocker.patch('utils.audio_utils.subprocess.Popen')
+
+    assert load_media_audio(b"not really a video") is None
+    popen.assert_not_called()
+
+@pytest.mark.skipif(_get_ffmpeg_binary() is None, reason="ffmpeg is not available")
+def test_load_media_audio_decodes_upload_from_memory(mocker):
+    """
+    Integration test: a 44.1 kHz stereo upload is decoded through ffmpeg's stdin to 16 kHz mono.
+    """
+    mocker.patch('utils.audio_utils.probe_media', return_value=None)
+    spill = mocker.patch('utils.audio_utils.tempfile.NamedTemporaryFile')
+    t = np.arange(44100 * 2) / 44100
+    stereo = np.stack([0.3 * np.sin(2 * np.pi * 440 * t)] * 2, axis=1).astype(np.float32)
+
+    audio = load_media_audio(io.BytesIO(_wav_bytes(stereo, 44100, subtype="PCM_16")), max_duration=1.5)
+
+    assert audio.dtype == np.float32
+    assert abs(audio.shape[0] - 24000) <= 16
+    # ffmpeg's downmix keeps the tone audible (its exact gain depends on the build).
+    assert 0.2 < np.abs(audio).max() < 0.5
+    spill.assert_not_called()
+
+def test_stream_audio_chunks_yields_chunks_and_stops_when_closed(tmpdir):
+    """
+    Test that a file is decoded in fixed-size chunks, and that closing the stream early ends the decode.
+    """
+    from utils.audio_utils import stream_audio_chunks
+
+    path = os.path.join(str(tmpdir), "speech.wav")
+    sf.write(path, np.full(16000 * 20, 0.25, dtype=np.float32), 16000, subtype="FLOAT")
+
+    chunks = list(stream_audio_chunks(path, chunk_seconds=6.0, max_duration=15.0))
+    assert [chunk.shape[0] for chunk in chunks] == [96000, 96000, 48000]
+    assert chunks[0].flags.writeable and np.allclose(chunks[0], 0.25)
+
+    stream = stream_audio_chunks(path, chunk_seconds=2.0)
+    assert next(stream).shape[0] == 32000
+    stream.close()
+
+    with pytest.raises(RuntimeError):
+        list(stream_audio_chunks(os.path.join(str(tmpdir), "missing.wav")))
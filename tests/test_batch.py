@@ -0,0 +1,134 @@
+# tests/test_batch.py
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock
+from utils.batch import read_sources, run_batch
+
+def fake_classify_batch(waveforms, top_k=5):
+    return [[{"label": "Us", "score": 0.8}, {"label": "England", "score": 0.2}][:top_k] for _ in waveforms]
+
+@pytest.fixture
+def fake_classifier():
+    classifier = MagicMock()
+    classifier.sample_rate = 16000
+    classifier.classify_batch.side_effect = fake_classify_batch
+    return classifier
+
+@pytest.fixture
+def fake_downloads(mocker):
+    """Downloads succeed except for URLs containing 'broken'; every clip decodes to 5s of speech."""
+    def fake_download(url, output_dir, **kwargs):
+        if "broken" in url:
+            return None
+        path = os.path.join(output_dir, "audio.m4a")
+        open(path, "wb").close()
+        return path
+
+    download = mocker.patch("utils.batch.download_video", side_effect=fake_download)
+    mocker.patch("utils.batch.extract_audio_array", return_value=np.full(16000 * 5, 0.5, dtype=np.float32))
+    return download
+
+def test_read_sources_text_and_csv(temp_dir):
+    """
+    Test that text lists skip comments, blanks and duplicates, and CSV lists use the 'url' column.
+    """
+    text_path = os.path.join(temp_dir, "urls.txt")
+    with open(text_path, "w") as f:
+        f.write("# talks\nhttps://a.example/1\n\nhttps://a.example/2#t=5\nhttps://a.example/1\n")
+    csv_path = os.path.join(temp_dir, "urls.csv")
+    with open(csv_path, "w") as f:
+        f.write("speaker,url\nann,https://b.example/1\nbob,https://b.example/2\n")
+
+    assert read_sources(text_path) == ["https://a.example/1", "https://a.example/2#t=5"]
+    assert read_sources(csv_path) == ["https://b.example/1", "https://b.example/2"]
+
+def test_run_batch_writes_csv_rows_and_summary(fake_classifier, fake_downloads, temp_dir):
+    """
+    Test that every source gets a row, failures included, and inference runs in batches.
+    """
+    output_path = os.path.join(temp_dir, "results.csv")
+    sources = ["https://a.example/1", "https://a.example/broken", "https://a.example/2", "https://a.example/3"]
+    progress = []
+
+    summary = run_batch(
+        sources, fake_classifier, output_path, download_workers=2, batch_size=2,
+        progress_callback=lambda done, total: progress.append((done, total)),
+    )
+
+    results = pd.read_csv(output_path).set_index("source")
+    assert set(results.index) == set(sources)
+    assert results.loc["https://a.example/broken", "status"] == "error"
+    assert results.loc["https://a.example/broken", "error"] == "download failed"
+    assert results.loc["https://a.example/1", "label"] == "Us"
+    assert json.loads(results.loc["https://a.example/1", "predictions"])[0]["score"] == 0.8
+    assert summary["succeeded"] == 3 and summary["failed"] == 1 and summary["skipped"] == 0
+    assert summary["speech_seconds"] == pytest.approx(15.0)
+    assert all(len(call.args[0]) <= 2 for call in fake_classifier.classify_batch.call_args_list)
+    assert progress[-1] == (4, 4)
+
+def test_run_batch_resumes_from_existing_output(fake_classifier, fake_downloads, temp_dir):
+    """
+    Test that sources already in the output file are skipped on the next run.
+    """
+    output_path = os.path.join(temp_dir, "results.csv")
+    run_batch(["https://a.example/1", "https://a.example/2"], fake_classifier, output_path)
+    fake_downloads.reset_mock()
+
+    summary = run_batch(
+        ["https://a.example/1", "https://a.example/2", "https://a.example/3"], fake_classifier, output_path
+    )
+
+    assert summary["skipped"] == 2 and summary["succeeded"] == 1
+    assert [call.args[0] for call in fake_downloads.call_args_list] == ["https://a.example/3"]
+    assert len(pd.read_csv(output_path)) == 3
+
+def test_run_batch_retries_failed_sources(fake_classifier, fake_downloads, temp_dir):
+    """
+    Test that a source with only an error row is not treated as done on the next run.
+    """
+    output_path = os.path.join(temp_dir, "results.csv")
+    fake_classifier.classify_batch.side_effect = lambda waveforms, top_k=5: [[] for _ in waveforms]
+    first = run_batch(["https://a.example/1"], fake_classifier, output_path)
+    fake_classifier.classify_batch.side_effect = fake_classify_batch
+
+    second = run_batch(["https://a.example/1"], fake_classifier, output_path)
+    third = run_batch(["https://a.example/1"], fake_classifier, output_path)
+
+    assert first["failed"] == 1
+    assert second["skipped"] == 0 and second["succeeded"] == 1
+    assert third["skipped"] == 1
+    assert list(pd.read_csv(output_path)["status"]) == ["error", "ok"]
+
+def test_run_batch_never_sends_more_than_batch_size(fake_classifier, fake_downloads, temp_dir, mocker):
+    """
+    Test that loads finishing together are split into batch_size calls, not sent as one oversized batch.
+    """
+    all_loaded = mocker.patch("utils.batch.wait", side_effect=lambda futures, return_when: (set(futures), set()))
+    sources = [f"https://a.example/{i}" for i in range(7)]
+
+    summary = run_batch(sources, fake_classifier, os.path.join(temp_dir, "results.csv"), download_workers=5, batch_size=2)
+
+    assert all_loaded.called
+    assert [len(call.args[0]) for call in fake_classifier.classify_batch.call_args_list] == [2, 2, 2, 1]
+    assert summary["succeeded"] == 7
+
+def test_run_batch_parquet_dataset(fake_classifier, fake_downloads, temp_dir):
+    """
+    Test that a .parquet output is written as part files that resume like the CSV output.
+    """
+    pytest.importorskip("pyarrow")
+    output_path = os.path.join(temp_dir, "results.parquet")
+
+    run_batch(["https://a.example/1", "https://a.example/2", "https://a.example/broken"],
+              fake_classifier, output_path, batch_size=1)
+    summary = run_batch(["https://a.example/1", "https://a.example/3", "https://a.example/broken"],
+                        fake_classifier, output_path)
+
+    results = pd.read_parquet(output_path)
+    assert sorted(set(results["source"])) == [
+        "https://a.example/1", "https://a.example/2", "https://a.example/3", "https://a.example/broken",
+    ]
+    assert summary["skipped"] == 1 and summary["failed"] == 1
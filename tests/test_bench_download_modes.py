@@ -0,0 +1,16 @@
+# tests/test_bench_download_modes.py
+import pytest
+from benchmarks.bench_download_modes import run_benchmark
+from utils.audio_utils import _get_ffmpeg_binary
+
+def test_benchmark_runs_offline_against_stub_server():
+    """
+    Test that the DASH fixture renders, both download modes complete, and audio_only fetches far fewer bytes.
+    """
+    if not _get_ffmpeg_binary():
+        pytest.skip("ffmpeg is not available")
+
+    (_, full_bytes, _, full_size), (_, audio_bytes, _, audio_size) = run_benchmark(seconds=3.0)
+
+    assert full_size > 0 and audio_size > 0
+    assert audio_bytes * 5 < full_bytes
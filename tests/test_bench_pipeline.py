@@ -0,0 +1,55 @@
+# tests/test_bench_pipeline.py
+import pytest
+from unittest.mock import MagicMock
+from benchmarks.bench_pipeline import SUITE_VERSION, compare, make_fixtures, percentile, run_suite, summarize
+from benchmarks.stub_server import StubMediaServer
+from utils.audio_utils import _get_ffmpeg_binary
+
+def make_report(p50: float, p95: float, rss: float = 100.0) -> dict:
+    stats = {"runs": 5, "p50": p50, "p95": p95, "mean": p50, "throughput_x_realtime": 1.0, "peak_rss_mb": rss}
+    return {"suite_version": SUITE_VERSION, "results": {"speech_60s.m4a": {"extract": stats}}}
+
+def test_summarize_percentiles():
+    """
+    Test the nearest-rank percentiles and the realtime throughput.
+    """
+    latencies = [0.1 * i for i in range(1, 21)]
+    stats = summarize(latencies, audio_seconds=10.5, rss_mb=50.0)
+
+    assert stats["p50"] == pytest.approx(1.0)
+    assert stats["p95"] == pytest.approx(1.9)
+    assert stats["throughput_x_realtime"] == pytest.approx(10.5 / 1.05)
+    assert percentile([3.0], 95) == 3.0
+
+def test_compare_flags_only_real_regressions():
+    """
+    Test that slowdowns past both thresholds and RSS growth fail, while noise does not.
+    """
+    baseline = make_report(p50=1.0, p95=1.2)
+
+    assert compare(make_report(1.1, 1.3), baseline) == []
+    assert compare(make_report(0.5, 0.6), baseline) == []
+    regressions = compare(make_report(1.5, 1.3, rss=130.0), baseline)
+    assert len(regressions) == 2
+    assert "extract p50" in regressions[0] and "peak RSS" in regressions[1]
+    # A large relative change on a tiny stage stays under the absolute floor.
+    assert compare(make_report(0.002, 0.003), make_report(0.001, 0.001)) == []
+
+def test_suite_runs_offline_against_stub_server(temp_dir):
+    """
+    Test that the fixtures render, download from the stub server and go through every stage.
+    """
+    if not _get_ffmpeg_binary():
+        pytest.skip("ffmpeg is not available")
+    classifier = MagicMock()
+    classifier.model_version = "fake-version"
+    classifier.classify_waveform.return_value = [{"label": "Us", "score": 0.9}]
+
+    fixtures = make_fixtures(temp_dir, [5], video=False)
+    with StubMediaServer(temp_dir) as server:
+        results = run_suite(fixtures, server, classifier, runs=1, warmup=0)
+
+    stages = results["speech_5s.m4a"]
+    assert set(stages) == {"download", "extract", "vad", "classify", "end_to_end"}
+    assert all(stats["p50"] > 0 for stats in stages.values())
+    assert stages["download"]["peak_rss_mb"] > 0
@@ -0,0 +1,46 @@
+# tests/test_bundle.py
+import torch
+from utils.bundle import load_bundle
+from utils.classifier import AccentClassifier
+
+def test_bundle_round_trip_matches_reference(reference_model, bundle_path):
+    """
+    Test that a model loaded from the bundle produces the reference model's embeddings.
+    """
+    model, _, labels = reference_model
+    loaded, loaded_labels, model_version = load_bundle(bundle_path)
+
+    wavs = torch.randn(2, 16000)
+    wav_lens = torch.tensor([1.0, 0.75])
+    with torch.no_grad():
+        expected = model.encode_batch(wavs, wav_lens)
+        actual = loaded.encode_batch(wavs, wav_lens)
+
+    torch.testing.assert_close(actual, expected)
+    assert loaded_labels == labels
+    assert len(model_version) == 16
+
+def test_classifier_loads_bundle_without_network(bundle_path, mocker):
+    """
+    Test that AccentClassifier uses the bundle and never calls from_hparams (the network path).
+    """
+    from_hparams = mocker.patch('speechbrain.inference.EncoderClassifier.from_hparams')
+
+    classifier = AccentClassifier(bundle_path=bundle_path)
+    results = classifier.classify_waveform(torch.randn(16000), top_k=3)
+
+    from_hparams.assert_not_called()
+    assert len(results) == 3
+    assert results[0]["label"].startswith("Accent ")
+
+def test_bundle_can_be_disabled(mocker, monkeypatch, bundle_path):
+    """
+    Test that ACCENT_MODEL_BUNDLE=off forces the hyperparams.yaml loading path.
+    """
+    monkeypatch.setenv("ACCENT_MODEL_BUNDLE", "off")
+    from_hparams = mocker.patch('speechbrain.inference.EncoderClassifier.from_hparams')
+    mocker.patch('utils.classifier.AccentClassifier._hash_model_files', return_value="0" * 16)
+
+    AccentClassifier()
+
+    from_hparams.assert_called_once()
@@ -1,13 +1,19 @@
 # tests/test_classifier.py
 import os
+import threading
 import pytest
 import torch
+import torchaudio
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
 from utils.classifier import AccentClassifier
+from utils.embedding_store import EmbeddingStore
 
 # Define paths to fixtures
 FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
 SAMPLE_AUDIO_PATH = os.path.join(FIXTURE_DIR, 'sample_audio.wav')
 MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'utils', 'accent_id_model_clean')
+STUB_LABELS = {0: "us", 1: "england", 2: "indian"}
 
 @pytest.fixture(scope="module")
 def classifier():
@@ -23,6 +29,27 @@ def classifier():
     except Exception as e:
         pytest.fail(f"Failed to initialize AccentClassifier from '{MODEL_DIR}'. Error: {e}")
 
+@pytest.fixture
+def stub_classifier():
+    """
+    An AccentClassifier whose SpeechBrain model is replaced by a tiny deterministic stub.
+    The stub "predicts" the label whose index is ten times the first sample of each waveform.
+    """
+    stub = AccentClassifier.__new__(AccentClassifier)
+    stub._inference_slots = threading.BoundedSemaphore(2)
+    stub.classifier = MagicMock()
+    stub.classifier.audio_normalizer.sample_rate = 16000
+    # Files are read as [time, channels]; downmix like SpeechBrain's AudioNormalizer.
+    stub.classifier.audio_normalizer.side_effect = lambda signal, sr: signal.mean(dim=1)
+    stub.classifier.encode_batch.side_effect = lambda wavs, wav_lens: torch.nn.functional.one_hot(
+        torch.round(wavs[:, 0] * 10).long(), num_classes=len(STUB_LABELS)
+    ).float().unsqueeze(1)
+    stub.classifier.mods.classifier.side_effect = lambda embeddings: embeddings
+    stub.ind2lab = STUB_LABELS
+    stub.embedding_store = None
+    stub.onnx_engine = None
+    return stub
+
 def test_classifier_initialization_fails_if_model_missing(mocker):
     """
     Unit test: Verifies that AccentClassifier raises FileNotFoundError if the model directory is missing.
@@ -38,8 +65,6 @@ def test_classify_audio_success(classifier, temp_dir):
     """
     Integration test: Classifies a real audio file and checks the output format.
     """
-    # SpeechBrain requires an absolute path for its internal handling.
-    # The fix in the source code handles chdir, but providing a full path is robust.
     # We'll copy the fixture to a temp dir to avoid issues with relative paths in tests.
     test_audio_path = os.path.join(temp_dir, 'test.wav')
     import shutil
@@ -70,29 +95,205 @@ def test_classify_audio_file_not_found(classifier):
     results = classifier.classify_audio(non_existent_path)
     assert results == []
 
-def test_chdir_logic_restores_original_directory(classifier, mocker, temp_dir):
+def test_classify_audio_does_not_change_working_directory(stub_classifier, mocker, temp_dir):
     """
-    Test that the os.chdir logic correctly restores the current working directory,
+    Test that classification never mutates the process-wide working directory,
     even if an error occurs during classification.
     """
     original_cwd = os.getcwd()
-    
-    # Mock the classifier's internal model to raise an exception
-    mocked_internal_classifier = MagicMock()
-    mocked_internal_classifier.classify_file.side_effect = Exception("Classification failed")
-    classifier.classifier = mocked_internal_classifier
-    
+    chdir_spy = mocker.spy(os, 'chdir')
+    stub_classifier.classifier.encode_batch.side_effect = Exception("Classification failed")
+
     test_audio_path = os.path.join(temp_dir, 'test.wav')
-    with open(test_audio_path, 'w') as f: # create a dummy file to pass the `isfile` check
-        f.write("dummy")
+    torchaudio.save(test_audio_path, torch.zeros(1, 1600), 16000)
 
-    # The function should catch the exception and return [], but the finally block must run
-    results = classifier.classify_audio(test_audio_path)
+    # The function should catch the exception and return []
+    results = stub_classifier.classify_audio(test_audio_path)
     assert results == []
-    
-    # The most important assertion: did we return to the original directory?
+
+    chdir_spy.assert_not_called()
     assert os.getcwd() == original_cwd
-    
-    # Restore the original classifier for other tests if necessary (though this is last)
-    # This is not strictly needed due to test isolation but is good practice.
-    del classifier.classifier
\ No newline at end of file
+
+def test_classify_batch_preserves_input_order(stub_classifier):
+    """
+    Unit test: results come back in input order even though clips are batched by length.
+    """
+    items = [
+        torch.full((16000,), 0.2),
+        torch.full((48000,), 0.0),
+        torch.full((8000,), 0.1),
+    ]
+    results = stub_classifier.classify_batch(items, top_k=2)
+
+    assert [r[0]["label"] for r in results] == ["Indian", "Us", "England"]
+    assert all(len(r) == 2 for r in results)
+    # Everything fits in the default budget, so a single forward pass is used.
+    assert stub_classifier.classifier.encode_batch.call_count == 1
+
+def test_classify_batch_respects_seconds_budget(stub_classifier):
+    """
+    Unit test: mini-batches are split so padded audio stays within max_batch_seconds.
+    """
+    items = [torch.full((16000,), 0.1) for _ in range(5)]
+    results = stub_classifier.classify_batch(items, top_k=1, max_batch_seconds=2.0)
+
+    assert all(r[0]["label"] == "England" for r in results)
+    assert stub_classifier.classifier.encode_batch.call_count == 3
+    for call_args in stub_classifier.classifier.encode_batch.call_args_list:
+        wavs, wav_lens = call_args.args
+        assert wavs.numel() <= 2 * 16000
+        assert torch.all(wav_lens <= 1.0)
+
+def test_classify_batch_pads_with_relative_lengths():
+    """
+    Unit test: shorter clips are zero-padded and described by their relative length.
+    """
+    wavs, wav_lens = AccentClassifier._pad_batch([torch.ones(4), torch.ones(2)])
+
+    assert wavs.shape == (2, 4)
+    assert wavs[1].tolist() == [1.0, 1.0, 0.0, 0.0]
+    assert wav_lens.tolist() == [1.0, 0.5]
+
+def test_classify_batch_missing_file_yields_empty_result(stub_classifier):
+    """
+    Test that an unreadable item gets an empty result without failing the rest of the batch.
+    """
+    results = stub_classifier.classify_batch(["/path/to/missing.wav", torch.zeros(1600)])
+
+    assert results[0] == []
+    assert results[1][0]["label"] == "Us"
+
+def test_classify_audio_is_thread_safe(stub_classifier, tmpdir):
+    """
+    Stress test: many threads classify files living in different directories through
+    one shared classifier, and every thread gets the prediction for its own file.
+    """
+    n_threads, files_per_dir = 8, 6
+    jobs = []
+    for d in range(n_threads):
+        audio_dir = tmpdir.mkdir(f"session_{d}")
+        for f in range(files_per_dir):
+            label_index = (d + f) % len(STUB_LABELS)
+            path = str(audio_dir.join(f"clip.{f}.wav"))
+            # Stereo so the load -> downmix path is exercised too.
+            torchaudio.save(path, torch.full((2, 16000), label_index / 10), 16000)
+            jobs.append((path, STUB_LABELS[label_index].title()))
+
+    original_cwd = os.getcwd()
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        predictions = list(pool.map(lambda job: stub_classifier.classify_audio(job[0], top_k=1), jobs))
+
+    assert [p[0]["label"] for p in predictions] == [expected for _, expected in jobs]
+    assert os.getcwd() == original_cwd
+
+def test_embed_returns_one_embedding_per_clip(stub_classifier):
+    """
+    Unit test: embed() returns a 1-D embedding per input and None for unreadable inputs.
+    """
+    embeddings = stub_classifier.embed([torch.full((1600,), 0.2), "/path/to/missing.wav"])
+
+    assert embeddings[0].tolist() == [0.0, 0.0, 1.0]
+    assert embeddings[1] is None
+
+def test_embedding_store_skips_repeat_forward_pass(stub_classifier, tmpdir):
+    """
+    Test that a clip seen before is scored from the store without running the TDNN again.
+    """
+    stub_classifier.embedding_store = EmbeddingStore(str(tmpdir), dim=len(STUB_LABELS))
+    clip = torch.full((1600,), 0.1)
+
+    first = stub_classifier.classify_batch([clip], top_k=1)
+    second = stub_classifier.classify_batch([clip.clone()], top_k=1)
+
+    assert first == second
+    assert first[0][0]["label"] == "England"
+    assert stub_classifier.classifier.encode_batch.call_count == 1
+    assert len(stub_classifier.embedding_store) == 1
+
+def test_classify_embeddings_rescores_stored_matrix(stub_classifier, tmpdir):
+    """
+    Test that stored embeddings can be re-scored by the head alone.
+    """
+    store = EmbeddingStore(str(tmpdir), dim=len(STUB_LABELS))
+    store.put("a", [0.0, 0.0, 1.0])
+    store.put("b", [1.0, 0.0, 0.0])
+
+    _, matrix = store.matrix()
+    results = stub_classifier.classify_embeddings(matrix, top_k=1)
+
+    assert [r[0]["label"] for r in results] == ["Indian", "Us"]
+    stub_classifier.classifier.encode_batch.assert_not_called()
+
+def _two_accent_clip():
+    """18 seconds of audio: 9 s the stub reads as "Us", then 9 s it reads as "Indian"."""
+    return torch.cat([torch.full((9 * 16000,), 0.0), torch.full((9 * 16000,), 0.2)])
+
+def test_classify_segments_timeline_and_mean_aggregation(stub_classifier):
+    """
+    Unit test: windows of 6 s with a 3 s hop produce a timeline and a mean-aggregated top-k.
+    """
+    result = stub_classifier.classify_segments(_two_accent_clip(), top_k=2, batch_size=2)
+
+    segments = result["segments"]
+    assert [s["start"] for s in segments] == [0.0, 3.0, 6.0, 9.0, 12.0]
+    assert all(s["end"] - s["start"] == 6.0 for s in segments)
+    assert [s["label"] for s in segments] == ["Us", "Us", "Us", "Indian", "Indian"]
+    assert set(segments[0]["scores"]) == {"Us", "Indian"}
+    assert [r["label"] for r in result["top_k"]] == ["Us", "Indian"]
+    assert result["top_k"][0]["score"] == pytest.approx(0.6)
+
+    # Peak memory is bounded by batch_size windows per forward pass.
+    calls = stub_classifier.classifier.encode_batch.call_args_list
+    assert len(calls) == 3
+    assert all(c.args[0].shape[0] <= 2 for c in calls)
+
+def test_classify_segments_confidence_weighted_vote(stub_classifier):
+    """
+    Unit test: the vote aggregation reports each label's share of the weighted votes.
+    """
+    result = stub_classifier.classify_segments(_two_accent_clip(), top_k=3, aggregation="vote")
+
+    scores = {r["label"]: r["score"] for r in result["top_k"]}
+    assert scores["Us"] == pytest.approx(0.6)
+    assert scores["Indian"] == pytest.approx(0.4)
+    assert scores["England"] == pytest.approx(0.0)
+
+def test_classify_segments_short_clip_is_one_window(stub_classifier):
+    """
+    Unit test: a clip shorter than one window is classified as a single segment.
+    """
+    result = stub_classifier.classify_segments(torch.full((16000,), 0.1), top_k=1)
+
+    assert len(result["segments"]) == 1
+    assert result["segments"][0]["end"] == 1.0
+    assert result["top_k"][0]["label"] == "England"
+
+def test_classify_segments_rejects_unknown_aggregation(stub_classifier):
+    """
+    Test that an unsupported aggregation method raises ValueError.
+    """
+    with pytest.raises(ValueError, match="Unknown aggregation"):
+        stub_classifier.classify_segments(torch.zeros(16000), aggregation="median")
+
+def test_classify_segments_streams_a_file_in_blocks(stub_classifier, tmpdir, mocker):
+    """
+    Unit test: a file is decoded in hop-sized blocks and gives the same windows, tail window included,
+    as the same audio in memory.
+    """
+    import soundfile as sf
+    import utils.classifier as classifier_module
+
+    clip = torch.cat([_two_accent_clip(), torch.full((16000,), 0.2)])
+    path = os.path.join(str(tmpdir), "clip.wav")
+    sf.write(path, clip.numpy(), 16000, subtype="FLOAT")
+    stream = mocker.spy(classifier_module, "stream_audio_chunks")
+
+    from_file = stub_classifier.classify_segments(path, top_k=2)
+    in_memory = stub_classifier.classify_segments(clip, top_k=2)
+
+    assert stream.call_args.kwargs["chunk_seconds"] == 3.0
+    assert [s["start"] for s in from_file["segments"]] == [0.0, 3.0, 6.0, 9.0, 12.0, 13.0]
+    assert from_file == in_memory
+    short = os.path.join(str(tmpdir), "short.wav")
+    sf.write(short, torch.full((16000,), 0.1).numpy(), 16000, subtype="FLOAT")
+    assert stub_classifier.classify_segments(short, top_k=1)["segments"][0]["end"] == 1.0
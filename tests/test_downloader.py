@@ -78,4 +78,51 @@ def test_progress_callback_is_used(mocker, temp_dir):
     # The options dict is the first positional argument
     options = args[0]
     assert 'progress_hooks' in options
-    assert options['progress_hooks'] == [mock_callback]
\ No newline at end of file
+    assert options['progress_hooks'] == [mock_callback]
+
+def test_audio_only_mode_skips_video_and_merge(mocker, temp_dir):
+    """
+    Test that audio_only asks yt-dlp for a small audio stream and no mp4 merge.
+    """
+    mock_youtube_dl = mocker.patch('utils.downloader.yt_dlp.YoutubeDL')
+
+    download_video("https://www.youtube.com/watch?v=test", temp_dir, audio_only=True)
+
+    options = mock_youtube_dl.call_args.args[0]
+    assert options['format'].startswith('bestaudio')
+    assert 'merge_output_format' not in options
+
+def test_default_mode_downloads_merged_video(mocker, temp_dir):
+    """
+    Test that the default mode keeps the original bestvideo+bestaudio merge to mp4.
+    """
+    mock_youtube_dl = mocker.patch('utils.downloader.yt_dlp.YoutubeDL')
+
+    download_video("https://www.youtube.com/watch?v=test", temp_dir)
+
+    options = mock_youtube_dl.call_args.args[0]
+    assert options['format'] == 'bestvideo+bestaudio/best'
+    assert options['merge_output_format'] == 'mp4'
+
+def test_time_window_sets_download_ranges(mocker, temp_dir):
+    """
+    Test that a start_offset/max_duration window is passed to yt-dlp as download_ranges.
+    """
+    mock_youtube_dl = mocker.patch('utils.downloader.yt_dlp.YoutubeDL')
+    range_func = mocker.patch('utils.downloader.yt_dlp.utils.download_range_func')
+
+    download_video("https://www.youtube.com/watch?v=test", temp_dir, start_offset=30, max_duration=45)
+
+    options = mock_youtube_dl.call_args.args[0]
+    assert options['download_ranges'] is range_func.return_value
+    range_func.assert_called_once_with(None, [(30, 75)])
+
+def test_no_window_downloads_everything(mocker, temp_dir):
+    """
+    Test that no download_ranges are set when no window is requested.
+    """
+    mock_youtube_dl = mocker.patch('utils.downloader.yt_dlp.YoutubeDL')
+
+    download_video("https://www.youtube.com/watch?v=test", temp_dir)
+
+    assert 'download_ranges' not in mock_youtube_dl.call_args.args[0]
@@ -0,0 +1,109 @@
+# tests/test_embedding_store.py
+import numpy as np
+import pytest
+from utils.embedding_store import EmbeddingStore, audio_content_hash
+
+DIM = 4
+
+@pytest.fixture
+def store_dir(tmpdir):
+    """A pytest fixture with a fresh directory for an embedding store."""
+    return str(tmpdir.mkdir("embeddings"))
+
+def test_audio_content_hash_is_stable():
+    """
+    Test that equal samples hash equally regardless of dtype, and different samples do not.
+    """
+    samples = np.linspace(-1, 1, 100)
+    assert audio_content_hash(samples) == audio_content_hash(samples.astype(np.float32))
+    assert audio_content_hash(samples) != audio_content_hash(samples[::-1])
+
+def test_put_and_get_round_trip(store_dir):
+    """
+    Test that a stored embedding can be read back, and a duplicate key keeps its row.
+    """
+    store = EmbeddingStore(store_dir, dim=DIM)
+    vector = np.arange(DIM, dtype=np.float32)
+
+    assert store.put("a", vector) == 0
+    assert store.put("a", vector + 1) == 0
+    np.testing.assert_array_equal(store.get("a"), vector)
+    assert store.get("missing") is None
+    assert len(store) == 1
+
+def test_store_grows_and_persists(store_dir):
+    """
+    Test that the memmap grows past its initial capacity and survives a reopen.
+    """
+    store = EmbeddingStore(store_dir, dim=DIM, initial_capacity=2)
+    for i in range(5):
+        store.put(f"key{i}", np.full(DIM, i, dtype=np.float32))
+
+    reopened = EmbeddingStore(store_dir, dim=DIM)
+    keys, matrix = reopened.matrix()
+
+    assert keys == [f"key{i}" for i in range(5)]
+    assert matrix.shape == (5, DIM)
+    np.testing.assert_array_equal(matrix[:, 0], np.arange(5, dtype=np.float32))
+    assert not matrix.flags.writeable
+
+def test_wrong_dimension_is_rejected(store_dir):
+    """
+    Test that an embedding of the wrong size raises ValueError.
+    """
+    store = EmbeddingStore(store_dir, dim=DIM)
+    with pytest.raises(ValueError, match="Expected a 4-dim embedding"):
+        store.put("a", np.zeros(DIM + 1))
+
+def test_stores_are_kept_per_model_version(tmpdir):
+    """
+    Test that each model version gets its own store and a store is refused by another version.
+    """
+    root = str(tmpdir)
+    fp32 = EmbeddingStore.for_model(root, "abc123", dim=DIM)
+    int8 = EmbeddingStore.for_model(root, "abc123-int8", dim=DIM)
+    fp32.put("clip", np.ones(DIM, dtype=np.float32))
+
+    assert int8.get("clip") is None
+    assert fp32.directory != int8.directory
+    with pytest.raises(ValueError, match="abc123"):
+        EmbeddingStore(fp32.directory, dim=DIM, model_version="def456")
+
+def test_writers_in_separate_processes_do_not_overwrite_each_other(store_dir):
+    """
+    Test that two processes appending to one store get distinct rows and see each other's embeddings.
+    """
+    import multiprocessing
+
+    def write(prefix: str, offset: int):
+        store = EmbeddingStore(store_dir, dim=DIM, initial_capacity=2)
+        for i in range(40):
+            store.put(f"{prefix}{i}", np.full(DIM, offset + i, dtype=np.float32))
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=write, args=(prefix, offset)) for prefix, offset in (("a", 0), ("b", 1000))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    store = EmbeddingStore(store_dir, dim=DIM)
+    keys, matrix = store.matrix()
+    assert sorted(keys) == sorted([f"a{i}" for i in range(40)] + [f"b{i}" for i in range(40)])
+    for key, row in zip(keys, matrix):
+        expected = int(key[1:]) + (1000 if key[0] == "b" else 0)
+        np.testing.assert_array_equal(row, np.full(DIM, expected, dtype=np.float32))
+
+def test_embeddings_stored_by_another_writer_are_found(store_dir):
+    """
+    Test that an open store sees rows appended through another handle since it was opened.
+    """
+    first = EmbeddingStore(store_dir, dim=DIM, initial_capacity=1)
+    second = EmbeddingStore(store_dir, dim=DIM, initial_capacity=1)
+    assert first.put("a", np.zeros(DIM)) == 0
+    assert second.put("b", np.ones(DIM)) == 1
+    assert first.put("c", np.full(DIM, 2.0)) == 2
+
+    np.testing.assert_array_equal(first.get("b"), np.ones(DIM, dtype=np.float32))
+    assert second.matrix()[0] == ["a", "b", "c"]
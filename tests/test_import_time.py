@@ -0,0 +1,26 @@
+# tests/test_import_time.py
+from benchmarks.bench_import_time import APP_MODULES, heavy_imports, measure_imports, total_seconds
+
+def test_app_startup_modules_do_not_import_heavy_packages():
+    """
+    Test that the modules app.py imports at the top leave torch, yt-dlp, moviepy and pandas unloaded.
+    """
+    timings = measure_imports(APP_MODULES)
+
+    assert "utils.pipeline" in timings
+    assert heavy_imports(timings) == []
+
+def test_heavy_import_is_detected():
+    """
+    Test that the check notices a module that pulls in a heavy package at import time.
+    """
+    timings = measure_imports(["utils.bundle"])
+
+    assert "torch" in heavy_imports(timings)
+    assert total_seconds(timings) > 0
+
+def test_classifier_module_defers_torch_to_the_torch_engine():
+    """
+    Test that importing the classifier loads neither torch nor SpeechBrain until the torch engine is built.
+    """
+    assert heavy_imports(measure_imports(["utils.classifier"])) == []
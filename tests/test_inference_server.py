@@ -0,0 +1,102 @@
+# tests/test_inference_server.py
+import threading
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from utils.inference_client import InferenceClient
+from utils.inference_server import InferenceServer, MicroBatcher
+
+LABELS = ["Us", "England", "Indian"]
+
+def fake_classify_batch(waveforms, top_k=5):
+    """'Predicts' the label whose index is ten times the first sample of each clip."""
+    results = []
+    for waveform in waveforms:
+        best = int(round(float(waveform[0]) * 10))
+        ranked = [best] + [i for i in range(len(LABELS)) if i != best]
+        results.append([{"label": LABELS[i], "score": 1.0 if i == best else 0.0} for i in ranked][:top_k])
+    return results
+
+@pytest.fixture
+def fake_classifier():
+    classifier = MagicMock()
+    classifier.model_version = "fake-version"
+    classifier.sample_rate = 16000
+    classifier.embedding_dim = 3
+    classifier.classify_batch.side_effect = fake_classify_batch
+    classifier.classify_segments.return_value = {"top_k": [{"label": "Us", "score": 1.0}], "segments": []}
+    return classifier
+
+@pytest.fixture
+def server(fake_classifier):
+    server = InferenceServer(fake_classifier, port=0, max_batch_size=4, max_wait_ms=200)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_micro_batcher_groups_concurrent_requests(fake_classifier):
+    """
+    Test that requests queued together share one forward pass and get their own results.
+    """
+    batcher = MicroBatcher(fake_classifier, max_batch_size=4, max_wait_ms=500)
+    try:
+        futures = [batcher.submit(np.full(160, i / 10, dtype=np.float32), top_k=1) for i in (0, 1, 2, 1)]
+        results = [f.result(timeout=5) for f in futures]
+    finally:
+        batcher.stop()
+
+    assert [r[0]["label"] for r in results] == ["Us", "England", "Indian", "England"]
+    assert all(len(r) == 1 for r in results)
+    fake_classifier.classify_batch.assert_called_once()
+    assert batcher.batches_run == 1 and batcher.clips_run == 4
+
+def test_micro_batcher_fails_every_request_in_a_failed_batch(fake_classifier):
+    """
+    Test that an error in the forward pass is raised from every affected future.
+    """
+    fake_classifier.classify_batch.side_effect = RuntimeError("model crashed")
+    batcher = MicroBatcher(fake_classifier, max_batch_size=2, max_wait_ms=500)
+    try:
+        futures = [batcher.submit(np.zeros(160, dtype=np.float32)) for _ in range(2)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model crashed"):
+                future.result(timeout=5)
+    finally:
+        batcher.stop()
+
+def test_client_round_trip(server, fake_classifier):
+    """
+    Test that the client reaches the worker, and that concurrent clips come back in one batch.
+    """
+    client = InferenceClient(server.url, max_pending=4)
+    try:
+        assert client.model_version == "fake-version"
+        futures = [client.submit_waveform(np.full(1600, i / 10, dtype=np.float32), top_k=2) for i in range(3)]
+        results = [f.result(timeout=10) for f in futures]
+        segments = client.classify_segments(np.zeros(1600, dtype=np.float32), top_k=1, window_seconds=2.0)
+    finally:
+        client.close()
+
+    assert [r[0]["label"] for r in results] == LABELS
+    assert fake_classifier.classify_batch.call_count == 1
+    assert segments["top_k"][0]["label"] == "Us"
+    assert fake_classifier.classify_segments.call_args.kwargs["window_seconds"] == 2.0
+
+def test_client_reports_failures_as_empty_results(server):
+    """
+    Test that an invalid request to the worker comes back as an empty result, not an exception.
+    """
+    client = InferenceClient(server.url)
+    try:
+        assert client.classify_waveform(np.zeros(0, dtype=np.float32)) == []
+    finally:
+        client.close()
+
+def test_client_raises_when_worker_is_down():
+    """
+    Test that creating a client for an unreachable worker raises RuntimeError.
+    """
+    with pytest.raises(RuntimeError, match="not reachable"):
+        InferenceClient("http://127.0.0.1:9", timeout=1)
@@ -0,0 +1,107 @@
+# tests/test_metrics.py
+import json
+import os
+import pstats
+import urllib.request
+import pytest
+from utils.metrics import (
+    ATTRIBUTE_HISTOGRAMS, DEFAULT_PROFILE_DIR, STAGE_SECONDS, Histogram, MetricsRegistry, profiled, span, start_metrics_server, trace,
+)
+
+def test_span_records_duration_and_attributes():
+    """
+    Test that a span feeds the duration histogram and the size histograms, and marks failures.
+    """
+    with span("test_decode", bytes=2048) as s:
+        s["audio_seconds"] = 12.5
+    with pytest.raises(ValueError):
+        with span("test_decode"):
+            raise ValueError("boom")
+    with span("test_decode") as s:
+        s["status"] = "rejected"
+
+    assert STAGE_SECONDS.snapshot(stage="test_decode", status="ok")["count"] == 1
+    assert STAGE_SECONDS.snapshot(stage="test_decode", status="error")["count"] == 1
+    assert STAGE_SECONDS.snapshot(stage="test_decode", status="rejected")["count"] == 1
+    assert ATTRIBUTE_HISTOGRAMS["bytes"].snapshot(stage="test_decode")["sum"] == 2048
+    assert ATTRIBUTE_HISTOGRAMS["audio_seconds"].snapshot(stage="test_decode")["sum"] == 12.5
+
+def test_span_writes_json_lines_trace(temp_dir, monkeypatch):
+    """
+    Test that ACCENT_TRACE_PATH receives one JSON event per span, tagged with the trace ID.
+    """
+    trace_path = os.path.join(temp_dir, "trace.jsonl")
+    monkeypatch.setenv("ACCENT_TRACE_PATH", trace_path)
+
+    with trace("job-1"):
+        with span("test_outer", batch_size=4):
+            with span("test_inner"):
+                pass
+
+    with open(trace_path) as f:
+        events = [json.loads(line) for line in f]
+    assert [event["stage"] for event in events] == ["test_inner", "test_outer"]
+    assert all(event["trace_id"] == "job-1" for event in events)
+    assert events[1]["attributes"] == {"batch_size": 4}
+    assert events[1]["duration"] >= events[0]["duration"]
+
+def test_metrics_endpoint_serves_prometheus_text():
+    """
+    Test the exposition format: cumulative buckets, +Inf, sum and count, served on /metrics.
+    """
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "A test histogram.", buckets=[0.1, 1.0])
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage="download")
+
+    server = start_metrics_server(port=0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert "# TYPE test_seconds histogram" in body
+    assert 'test_seconds_bucket{stage="download",le="0.1"} 1' in body
+    assert 'test_seconds_bucket{stage="download",le="1.0"} 2' in body
+    assert 'test_seconds_bucket{stage="download",le="+Inf"} 3' in body
+    assert 'test_seconds_count{stage="download"} 3' in body
+
+def test_profiled_dumps_cprofile_only_when_enabled(temp_dir, monkeypatch):
+    """
+    Test that the profiling toggle writes a loadable cProfile dump, and nothing when off.
+    """
+    monkeypatch.setenv("ACCENT_PROFILE_DIR", temp_dir)
+
+    with profiled("off", enabled=False) as path:
+        assert path is None
+    with profiled("job-1-inference") as path:
+        sum(i * i for i in range(1000))
+
+    assert os.listdir(temp_dir) == ["job-1-inference.prof"]
+    assert pstats.Stats(path).total_calls > 0
+
+def test_profiled_defaults_to_a_per_user_directory(temp_dir, monkeypatch):
+    """
+    Test that without ACCENT_PROFILE_DIR the dumps go to the user's cache, not the working directory.
+    """
+    monkeypatch.delenv("ACCENT_PROFILE_DIR", raising=False)
+    monkeypatch.setattr("utils.metrics.DEFAULT_PROFILE_DIR", os.path.join(temp_dir, "cache", "profiles"))
+    monkeypatch.chdir(temp_dir)
+
+    with profiled("job-2-inference") as path:
+        pass
+
+    assert path == os.path.join(temp_dir, "cache", "profiles", "job-2-inference.prof") and os.path.exists(path)
+    assert not os.path.exists(os.path.join(temp_dir, "profiles"))
+    assert os.path.isabs(DEFAULT_PROFILE_DIR)
+
+def test_histogram_labels_are_escaped():
+    """
+    Test that label values with quotes cannot break the exposition format.
+    """
+    histogram = Histogram("test_escape", "Escaping.", buckets=[1.0])
+    histogram.observe(0.5, source='a "quoted" name')
+    assert 'test_escape_count{source="a \\"quoted\\" name"} 1' in histogram.render()
@@ -0,0 +1,116 @@
+# tests/test_onnx_engine.py
+import json
+import os
+import subprocess
+import sys
+import pytest
+import torch
+from utils.classifier import AccentClassifier
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from utils.onnx_engine import OnnxEngine
+from utils.onnx_export import export_onnx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope="module")
+def onnx_dir(reference_model, tmp_path_factory):
+    """Exports the random-weight reference model to ONNX."""
+    model, _, labels = reference_model
+    return export_onnx(model.mods, labels, "0123456789abcdef", str(tmp_path_factory.mktemp("onnx")))
+
+def test_onnx_engine_matches_speechbrain(reference_model, onnx_dir):
+    """
+    Test that ORT embeddings and scores match the SpeechBrain modules for several lengths.
+    """
+    model, _, labels = reference_model
+    engine = OnnxEngine(onnx_dir)
+
+    for n_samples in (8000, 16000, 40123):
+        wavs = 0.1 * torch.randn(2, n_samples)
+        with torch.no_grad():
+            expected = model.encode_batch(wavs, torch.ones(2)).squeeze(1)
+            expected_scores = model.mods.classifier(expected.unsqueeze(1)).squeeze(1)
+        embeddings = engine.encode(wavs.numpy())
+
+        torch.testing.assert_close(torch.from_numpy(embeddings), expected, atol=1e-4, rtol=1e-3)
+        torch.testing.assert_close(torch.from_numpy(engine.score(embeddings)), expected_scores, atol=1e-4, rtol=1e-3)
+
+    assert engine.labels == labels
+    assert engine.model_version == "0123456789abcdef"
+    assert engine.embedding_dim == model.hparams.emb_dim
+
+def test_onnx_engine_embeds_a_padded_batch_like_speechbrain(reference_model, onnx_dir):
+    """
+    Test that one encoder run embeds a zero-padded batch as SpeechBrain's encode_batch
+    does with the same relative lengths, whatever the batch size.
+    """
+    model, _, _ = reference_model
+    engine = OnnxEngine(onnx_dir)
+
+    for lengths in ([12000, 16000], [16000, 6000, 9000, 16000, 11000]):
+        wavs = torch.zeros(len(lengths), max(lengths))
+        for row, length in enumerate(lengths):
+            wavs[row, :length] = 0.1 * torch.randn(length)
+        wav_lens = torch.tensor(lengths, dtype=torch.float32) / wavs.shape[1]
+        with torch.no_grad():
+            expected = model.encode_batch(wavs, wav_lens).squeeze(1)
+
+        embeddings = engine.encode(wavs.numpy(), lengths=lengths)
+
+        assert engine.batched
+        torch.testing.assert_close(torch.from_numpy(embeddings), expected, atol=1e-4, rtol=1e-3)
+
+def test_classifier_onnx_engine_matches_torch_engine(bundle_path, onnx_dir, monkeypatch):
+    """
+    Test that ACCENT_CLASSIFIER_ENGINE=onnx gives the torch engine's predictions.
+    """
+    torch_classifier = AccentClassifier(bundle_path=bundle_path)
+    monkeypatch.setenv("ACCENT_CLASSIFIER_ENGINE", "onnx")
+    onnx_classifier = AccentClassifier(onnx_dir=onnx_dir)
+
+    waveform = 0.1 * torch.randn(24000)
+    expected = {r["label"]: r["score"] for r in torch_classifier.classify_waveform(waveform, top_k=16)}
+    actual = {r["label"]: r["score"] for r in onnx_classifier.classify_waveform(waveform, top_k=16)}
+
+    assert onnx_classifier.classifier is None
+    assert onnx_classifier.model_version == "0123456789abcdef-onnx"
+    assert actual == pytest.approx(expected, abs=1e-4)
+
+def test_classifier_onnx_engine_imports_only_numpy_and_onnxruntime(onnx_dir):
+    """
+    Test that a process classifying with the onnx engine loads no third-party package
+    beyond what importing NumPy and onnxruntime does (no torch, torchaudio or SpeechBrain).
+    """
+    report = (
+        "import json, sys\n"
+        "print(json.dumps(sorted({name.split('.')[0] for name, module in list(sys.modules.items())"
+        " if 'site-packages' in (getattr(module, '__file__', None) or '')})))\n"
+    )
+    classify = (
+        "import sys\n"
+        "import numpy as np\n"
+        "from utils.classifier import AccentClassifier\n"
+        "classifier = AccentClassifier(engine='onnx', onnx_dir=sys.argv[1])\n"
+        "assert classifier.classify_waveform(0.1 * np.ones(16000, dtype=np.float32), top_k=1)\n"
+    )
+
+    def third_party(code):
+        completed = subprocess.run(
+            [sys.executable, "-c", code + report, onnx_dir], cwd=REPO_ROOT, capture_output=True, text=True,
+        )
+        assert completed.returncode == 0, completed.stderr[-2000:]
+        return set(json.loads(completed.stdout.splitlines()[-1]))
+
+    loaded = third_party(classify)
+    assert {"numpy", "onnxruntime"} <= loaded
+    assert loaded <= third_party("import numpy, onnxruntime\n")
+
+def test_classifier_rejects_unknown_engine():
+    """
+    Test that an unsupported engine name raises ValueError.
+    """
+    with pytest.raises(ValueError, match="Unknown engine"):
+        AccentClassifier(engine="tensorrt")
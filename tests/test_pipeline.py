@@ -0,0 +1,481 @@
+# tests/test_pipeline.py
+import os
+import threading
+import time
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from utils.pipeline import AnalysisPipeline, DONE, FAILED, REJECTED
+
+RESULTS = [{"label": "Us", "score": 0.9}, {"label": "England", "score": 0.1}]
+
+@pytest.fixture
+def fake_classifier():
+    classifier = MagicMock()
+    classifier.model_version = "fake-version"
+    classifier.max_concurrent_inferences = 2
+    classifier.classify_waveform.return_value = RESULTS
+    return classifier
+
+@pytest.fixture
+def fake_stages(mocker):
+    """Replaces the download and decode steps; downloads write a file into the job's temp dir."""
+    def fake_download(url, output_dir, **kwargs):
+        path = os.path.join(output_dir, "audio.m4a")
+        open(path, "wb").close()
+        return path
+
+    download = mocker.patch("utils.pipeline.download_video", side_effect=fake_download)
+    mocker.patch("utils.pipeline.extract_audio_array", return_value=np.full(16000 * 5, 0.5, dtype=np.float32))
+    return download
+
+def test_job_runs_through_all_stages(fake_classifier, fake_stages):
+    """
+    Test that a job is downloaded, decoded and classified, emitting a status event per stage.
+    """
+    cache = MagicMock()
+    cache.get.return_value = None
+    pipeline = AnalysisPipeline(fake_classifier, result_cache=cache)
+
+    job = pipeline.get(pipeline.submit("https://youtu.be/abcdefghijk", max_duration=30.0))
+    assert job.wait(timeout=10)
+
+    assert job.status == DONE
+    assert job.result == {"top_k": RESULTS, "segments": None, "cached": False}
+    statuses = [event["status"] for event in job.events()]
+    assert statuses.index("downloading") < statuses.index("extracting") < statuses.index("classifying") < statuses.index("done")
+    assert fake_stages.call_args.kwargs["max_duration"] == 30.0
+    assert not os.path.exists(fake_stages.call_args.args[1])
+    cache.put.assert_called_once_with(job.cache_key, RESULTS)
+
+def test_cached_job_finishes_without_downloading(fake_classifier, fake_stages):
+    """
+    Test that a result cache hit completes the job immediately.
+    """
+    cache = MagicMock()
+    cache.get.return_value = RESULTS
+    pipeline = AnalysisPipeline(fake_classifier, result_cache=cache)
+
+    job = pipeline.get(pipeline.submit("https://example.com/talk.mp4"))
+
+    assert job.finished and job.status == DONE
+    assert job.result["cached"] is True
+    fake_stages.assert_not_called()
+
+def test_next_job_downloads_while_previous_is_classified(fake_classifier, fake_stages):
+    """
+    Test that the stages overlap: job 2 is downloaded while job 1 is still in the model.
+    """
+    second_download = threading.Event()
+    downloads = []
+
+    def tracking_download(url, output_dir, **kwargs):
+        downloads.append(url)
+        if len(downloads) == 2:
+            second_download.set()
+        path = os.path.join(output_dir, "audio.m4a")
+        open(path, "wb").close()
+        return path
+
+    fake_stages.side_effect = tracking_download
+    overlapped = []
+
+    def slow_classify(waveform, top_k=5):
+        overlapped.append(second_download.wait(timeout=5))
+        return RESULTS
+
+    fake_classifier.classify_waveform.side_effect = slow_classify
+    pipeline = AnalysisPipeline(fake_classifier, download_workers=1, extract_workers=1)
+
+    first = pipeline.get(pipeline.submit("https://example.com/1.mp4"))
+    second = pipeline.get(pipeline.submit("https://example.com/2.mp4"))
+    assert first.wait(timeout=10) and second.wait(timeout=10)
+
+    assert overlapped[0] is True
+    assert first.status == second.status == DONE
+
+def test_jobs_are_classified_concurrently_up_to_the_classifier_limit(fake_classifier, fake_stages):
+    """
+    Test that there is an inference thread per classifier slot, so two jobs are in the model at once.
+    """
+    both_in_model = threading.Barrier(2, timeout=5)
+
+    def concurrent_classify(waveform, top_k=5):
+        both_in_model.wait()
+        return RESULTS
+
+    fake_classifier.classify_waveform.side_effect = concurrent_classify
+    pipeline = AnalysisPipeline(fake_classifier)
+
+    jobs = [pipeline.get(pipeline.submit(f"https://example.com/{i}.mp4")) for i in range(2)]
+
+    assert all(job.wait(timeout=10) for job in jobs)
+    assert [job.status for job in jobs] == [DONE, DONE]
+
+def test_failed_download_and_silent_audio(fake_classifier, fake_stages, mocker):
+    """
+    Test that a failed download fails the job and too little speech rejects it.
+    """
+    pipeline = AnalysisPipeline(fake_classifier)
+
+    fake_stages.side_effect = lambda url, output_dir, **kwargs: None
+    failed = pipeline.get(pipeline.submit("https://example.com/missing.mp4"))
+    assert failed.wait(timeout=10)
+    assert failed.status == FAILED and "Could not download" in failed.error
+
+    fake_stages.side_effect = lambda url, output_dir, **kwargs: os.path.join(output_dir, "audio.m4a")
+    mocker.patch("utils.pipeline.extract_audio_array", return_value=np.zeros(16000 * 5, dtype=np.float32))
+    silent = pipeline.get(pipeline.submit("https://example.com/silent.mp4"))
+    assert silent.wait(timeout=10)
+    assert silent.status == REJECTED and "Too little speech" in silent.error
+    fake_classifier.classify_waveform.assert_not_called()
+
+def test_uploaded_media_skips_download(fake_classifier, fake_stages):
+    """
+    Test that an uploaded 16 kHz mono WAV is analyzed without the download stage.
+    """
+    import io
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, np.full(16000 * 5, 0.5, dtype=np.float32), 16000, format="WAV", subtype="FLOAT")
+    pipeline = AnalysisPipeline(fake_classifier)
+
+    job = pipeline.get(pipeline.submit_media(buffer, "talk.wav", max_duration=4.0))
+    assert job.wait(timeout=10)
+
+    assert job.status == DONE
+    assert job.vad_stats["kept_seconds"] == pytest.approx(4.0)
+    assert job.media_source is None
+    fake_stages.assert_not_called()
+
+def test_stage_spans_are_traced_per_job(fake_classifier, fake_stages, temp_dir, monkeypatch):
+    """
+    Test that each stage emits a span tagged with the job ID and its queue wait.
+    """
+    import json
+
+    trace_path = os.path.join(temp_dir, "trace.jsonl")
+    monkeypatch.setenv("ACCENT_TRACE_PATH", trace_path)
+    pipeline = AnalysisPipeline(fake_classifier)
+
+    job = pipeline.get(pipeline.submit("https://example.com/talk.mp4"))
+    assert job.wait(timeout=10)
+
+    # The inference span is written just after the job is marked done.
+    for _ in range(100):
+        with open(trace_path) as f:
+            events = [event for event in map(json.loads, f) if event["trace_id"] == job.id]
+        if len(events) == 3:
+            break
+        time.sleep(0.05)
+    stages = [event["stage"] for event in events]
+    assert stages == ["pipeline_download", "pipeline_extract", "pipeline_inference"]
+    assert all(event["attributes"]["queue_wait_seconds"] >= 0 for event in events)
+
+def test_preflight_rejects_or_trims_before_download(fake_classifier, fake_stages):
+    """
+    Test that a rejected video is never downloaded and a trimmed one is fetched with the policy's window.
+    """
+    from utils.preflight import AdmissionPolicy
+
+    preflight = MagicMock()
+    preflight.probe.return_value = {
+        "id": "abcdefghijk", "title": "Live", "duration": None, "is_live": True, "has_audio": True, "audio_formats": [],
+    }
+    pipeline = AnalysisPipeline(fake_classifier, preflight=preflight, admission_policy=AdmissionPolicy(max_analysis_seconds=120))
+
+    rejected = pipeline.get(pipeline.submit("https://youtu.be/abcdefghijk"))
+    assert rejected.wait(timeout=10)
+    assert rejected.status == REJECTED and "Live streams" in rejected.error
+    fake_stages.assert_not_called()
+
+    preflight.probe.return_value = {
+        "id": "bcdefghijkl", "title": "Talk", "duration": 3600.0, "is_live": False, "has_audio": True,
+        "audio_formats": [{"format_id": "139", "ext": "m4a", "acodec": "mp4a", "abr": 48.0, "estimated_bytes": 2e7}],
+    }
+    trimmed = pipeline.get(pipeline.submit("https://youtu.be/bcdefghijkl", max_duration=None))
+    assert trimmed.wait(timeout=10)
+    assert trimmed.status == DONE
+    assert fake_stages.call_args.kwargs["max_duration"] == 120
+    assert fake_stages.call_args.kwargs["format_selector"].startswith("139/")
+
+def test_result_is_stored_in_an_empty_result_cache(fake_classifier, fake_stages, temp_dir):
+    """
+    Test that the first result reaches a fresh cache (an empty ResultCache has len() 0).
+    """
+    from utils.result_cache import ResultCache
+
+    cache = ResultCache(path=os.path.join(temp_dir, "results.sqlite3"))
+    pipeline = AnalysisPipeline(fake_classifier, result_cache=cache)
+
+    job = pipeline.get(pipeline.submit("https://example.com/talk.mp4"))
+    assert job.wait(timeout=10)
+
+    assert len(cache) == 1
+    repeat = pipeline.get(pipeline.submit("https://example.com/talk.mp4"))
+    assert repeat.result["cached"] is True
+
+def test_concurrent_duplicates_share_one_job(fake_classifier, fake_stages):
+    """
+    Test that identical requests (in any URL form) made while a job runs join it instead of downloading again.
+    """
+    release = threading.Event()
+
+    def blocked_download(url, output_dir, **kwargs):
+        release.wait(timeout=10)
+        path = os.path.join(output_dir, "audio.m4a")
+        open(path, "wb").close()
+        return path
+
+    fake_stages.side_effect = blocked_download
+    pipeline = AnalysisPipeline(fake_classifier)
+
+    job_id = pipeline.submit("https://youtu.be/abcdefghijk")
+    duplicates = [
+        pipeline.submit("https://www.youtube.com/watch?v=abcdefghijk&si=shared"),
+        pipeline.submit("https://youtu.be/abcdefghijk?t=5"),
+    ]
+    other_window = pipeline.submit("https://youtu.be/abcdefghijk", start_offset=60.0)
+    assert duplicates == [job_id, job_id] and other_window != job_id
+
+    job = pipeline.get(job_id)
+    assert job.joined == 2
+    release.set()
+    assert job.wait(timeout=10) and pipeline.get(other_window).wait(timeout=10)
+    assert job.status == DONE
+    assert fake_stages.call_count == 2
+
+    # A finished job is not joined; the request runs again.
+    rerun = pipeline.submit("https://youtu.be/abcdefghijk")
+    assert rerun != job_id
+    assert pipeline.get(rerun).wait(timeout=10)
+
+def test_fresh_and_profiled_requests_do_not_join(fake_classifier, fake_stages, temp_dir, monkeypatch):
+    """
+    Test that use_cache=False and profile=True requests run their own job instead of joining an identical one.
+    """
+    monkeypatch.setenv("ACCENT_PROFILE_DIR", temp_dir)
+    release = threading.Event()
+
+    def blocked_download(url, output_dir, **kwargs):
+        release.wait(timeout=10)
+        path = os.path.join(output_dir, "audio.m4a")
+        open(path, "wb").close()
+        return path
+
+    fake_stages.side_effect = blocked_download
+    pipeline = AnalysisPipeline(fake_classifier)
+
+    job_id = pipeline.submit("https://youtu.be/abcdefghijk")
+    fresh = pipeline.submit("https://youtu.be/abcdefghijk", use_cache=False)
+    profiled = pipeline.submit("https://youtu.be/abcdefghijk", profile=True)
+    release.set()
+
+    assert len({job_id, fresh, profiled}) == 3
+    assert pipeline.get(profiled).profile is True
+    assert all(pipeline.get(j).wait(timeout=10) for j in (job_id, fresh, profiled))
+    assert pipeline.get(job_id).joined == 0
+    assert fake_stages.call_count == 3
+
+def test_cross_process_duplicate_waits_for_the_shared_result(fake_classifier, fake_stages, temp_dir):
+    """
+    Test that a pipeline sharing a lock directory waits for another's identical job and reuses its cached result.
+    """
+    from utils.result_cache import ResultCache
+
+    release = threading.Event()
+
+    def blocked_download(url, output_dir, **kwargs):
+        release.wait(timeout=10)
+        path = os.path.join(output_dir, "audio.m4a")
+        open(path, "wb").close()
+        return path
+
+    fake_stages.side_effect = blocked_download
+    cache_path = os.path.join(temp_dir, "results.sqlite3")
+    lock_dir = os.path.join(temp_dir, "locks")
+    first = AnalysisPipeline(fake_classifier, result_cache=ResultCache(path=cache_path), lock_dir=lock_dir)
+    second = AnalysisPipeline(fake_classifier, result_cache=ResultCache(path=cache_path), lock_dir=lock_dir)
+
+    leader = first.get(first.submit("https://youtu.be/abcdefghijk"))
+    while fake_stages.call_count == 0:
+        time.sleep(0.01)
+    follower = second.get(second.submit("https://youtu.be/abcdefghijk"))
+    while "waiting for its result" not in follower.message:
+        time.sleep(0.01)
+
+    release.set()
+    assert leader.wait(timeout=10) and follower.wait(timeout=10)
+    assert leader.result["cached"] is False
+    assert follower.status == DONE and follower.result == {"top_k": RESULTS, "segments": None, "cached": True}
+    assert fake_stages.call_count == 1
+
+def test_job_waiting_for_another_process_does_not_hold_a_download_worker(fake_classifier, fake_stages, temp_dir):
+    """
+    Test that a job waiting for another process's identical job is parked, so the only download worker serves the next job.
+    """
+    release = threading.Event()
+
+    def download(url, output_dir, **kwargs):
+        if "youtu" in url:
+            release.wait(timeout=10)
+        path = os.path.join(output_dir, "audio.m4a")
+        open(path, "wb").close()
+        return path
+
+    fake_stages.side_effect = download
+    lock_dir = os.path.join(temp_dir, "locks")
+    other_process = AnalysisPipeline(fake_classifier, lock_dir=lock_dir)
+    pipeline = AnalysisPipeline(fake_classifier, lock_dir=lock_dir, download_workers=1)
+
+    leader = other_process.get(other_process.submit("https://youtu.be/abcdefghijk"))
+    while fake_stages.call_count == 0:
+        time.sleep(0.01)
+    waiting = pipeline.get(pipeline.submit("https://youtu.be/abcdefghijk"))
+    while "waiting for its result" not in waiting.message:
+        time.sleep(0.01)
+    unrelated = pipeline.get(pipeline.submit("https://example.com/other.mp4"))
+
+    assert unrelated.wait(timeout=10) and unrelated.status == DONE
+    assert not waiting.finished
+    release.set()
+    assert leader.wait(timeout=10) and waiting.wait(timeout=10)
+    # There is no shared result cache, so the parked job does the work itself once the lock is free.
+    assert waiting.status == DONE and waiting.result["cached"] is False
+    assert fake_stages.call_count == 3
+
+def test_progressive_job_streams_and_stops_early(fake_classifier, fake_stages, mocker, temp_dir):
+    """
+    Test that a progressive URL job skips the download, streams the audio and stops once confident.
+    """
+    import soundfile as sf
+    from utils.progressive import EarlyExitPolicy
+
+    path = os.path.join(temp_dir, "stream.wav")
+    sf.write(path, np.full(16000 * 60, 0.3, dtype=np.float32), 16000, subtype="FLOAT")
+    resolve = mocker.patch("utils.pipeline.resolve_stream_url", return_value={"url": path, "http_headers": {}})
+    fake_classifier.classify_batch.return_value = [[{"label": "Us", "score": 0.6}, {"label": "England", "score": 0.1}]]
+    cache = MagicMock()
+    cache.get.return_value = None
+    pipeline = AnalysisPipeline(
+        fake_classifier, result_cache=cache, early_exit_policy=EarlyExitPolicy(min_confidence=0.9, min_seconds=12.0)
+    )
+
+    job = pipeline.get(pipeline.submit("https://youtu.be/abcdefghijk", max_duration=60.0, progressive=True))
+    assert job.wait(timeout=10)
+
+    assert job.status == DONE
+    assert job.result["progressive"]["audio_seconds"] == pytest.approx(12.0)
+    assert job.result["progressive"]["stop_reason"] == "confident"
+    assert job.result["top_k"][0]["label"] == "Us"
+    resolve.assert_called_once()
+    fake_stages.assert_not_called()
+    assert cache.put.call_args.args[1]["progressive"]["audio_seconds"] == pytest.approx(12.0)
+    with pytest.raises(ValueError):
+        pipeline.submit("https://youtu.be/abcdefghijk", segmented=True, progressive=True)
+
+def test_progressive_stream_is_decoded_off_the_inference_thread(fake_classifier, fake_stages, mocker):
+    """
+    Test that a progressive job reuses the preflight's stream URL and that the stream is decoded on its own thread.
+    """
+    decode_threads = []
+
+    def stream_audio_chunks(url, chunk_seconds, **kwargs):
+        for _ in range(3):
+            decode_threads.append(threading.current_thread().name)
+            yield np.full(int(chunk_seconds * 16000), 0.3, dtype=np.float32)
+
+    mocker.patch("utils.pipeline.stream_audio_chunks", side_effect=stream_audio_chunks)
+    resolve = mocker.patch("utils.pipeline.resolve_stream_url")
+    preflight = MagicMock()
+    preflight.probe.return_value = None
+    preflight.stream.return_value = {"url": "https://cdn.example/audio", "http_headers": {}}
+    fake_classifier.classify_batch.return_value = [[{"label": "Us", "score": 0.6}, {"label": "England", "score": 0.1}]]
+    pipeline = AnalysisPipeline(fake_classifier, preflight=preflight)
+
+    job = pipeline.get(pipeline.submit("https://example.com/talk", max_duration=60.0, progressive=True))
+
+    assert job.wait(timeout=10) and job.status == DONE
+    resolve.assert_not_called()
+    preflight.stream.assert_called_once_with("https://example.com/talk", None)
+    assert decode_threads and all(name.startswith("pipeline-stream-") for name in decode_threads)
+    assert job.chunks is None
+
+def test_download_is_deleted_once_its_audio_is_extracted(fake_classifier, fake_stages, mocker, temp_dir):
+    """
+    Test the WAV fallback: the download is removed as soon as the WAV exists, and the job's scratch space at the end.
+    """
+    from utils.scratch import ScratchSpace
+
+    def fake_extract(media_path, audio_path, **kwargs):
+        open(audio_path, "wb").close()
+        return audio_path
+
+    mocker.patch("utils.pipeline.extract_audio_array", return_value=None)
+    mocker.patch("utils.pipeline.extract_audio", side_effect=fake_extract)
+    seen = {}
+
+    def classify_audio(path, top_k=5):
+        seen["files"] = sorted(os.listdir(os.path.dirname(path)))
+        return RESULTS
+
+    fake_classifier.classify_audio.side_effect = classify_audio
+    scratch = ScratchSpace(root=temp_dir, quota_bytes=10 ** 9)
+    pipeline = AnalysisPipeline(fake_classifier, scratch=scratch)
+
+    job = pipeline.get(pipeline.submit("https://youtu.be/abcdefghijk", max_duration=30.0))
+    assert job.wait(timeout=10) and job.status == DONE
+
+    assert seen["files"] == ["audio.m4a.wav"]
+    assert scratch.usage()["active"] == 0 and os.listdir(temp_dir) == []
+
+def test_segment_times_are_on_the_media_timeline(fake_classifier, fake_stages, mocker):
+    """
+    Test that segments of VAD-trimmed audio are mapped back across the dropped silence and past the start offset.
+    """
+    rate = 16000
+    tone = lambda seconds: (0.3 * np.sin(np.arange(seconds * rate) / rate * 2 * np.pi * 220)).astype(np.float32)
+    silence = lambda seconds: np.zeros(seconds * rate, dtype=np.float32)
+    audio = np.concatenate([silence(2), tone(3), silence(4), tone(3)])
+    mocker.patch("utils.pipeline.extract_audio_array", return_value=audio)
+    fake_classifier.classify_segments.return_value = {"top_k": RESULTS, "segments": [
+        {"start": 0.0, "end": 3.0, "label": "Us", "score": 0.9, "scores": {}},
+        {"start": 3.0, "end": 6.0, "label": "Us", "score": 0.8, "scores": {}},
+    ]}
+    pipeline = AnalysisPipeline(fake_classifier)
+
+    job = pipeline.get(pipeline.submit("https://youtu.be/abcdefghijk", start_offset=60.0, segmented=True))
+    assert job.wait(timeout=10) and job.status == DONE
+
+    first, second = job.result["segments"]
+    # The VAD keeps 0.2 s of padding around each region.
+    assert (first["start"], first["end"]) == (pytest.approx(61.8, abs=0.05), pytest.approx(64.8, abs=0.05))
+    # 3.4 s are kept of the first region, so 6 s into the trimmed audio is 2.6 s into the second one.
+    assert (second["start"], second["end"]) == (pytest.approx(64.8, abs=0.05), pytest.approx(71.4, abs=0.1))
+
+def test_untrimmed_fallback_is_cached_under_its_own_key(fake_classifier, fake_stages, mocker):
+    """
+    Test that a result classified without VAD (the WAV fallback) is not stored under the VAD cache key.
+    """
+    from utils.result_cache import make_cache_key
+
+    def fake_extract(media_path, audio_path, **kwargs):
+        open(audio_path, "wb").close()
+        return audio_path
+
+    mocker.patch("utils.pipeline.extract_audio_array", return_value=None)
+    mocker.patch("utils.pipeline.extract_audio", side_effect=fake_extract)
+    fake_classifier.classify_audio.return_value = RESULTS
+    cache = MagicMock()
+    cache.get.return_value = None
+    pipeline = AnalysisPipeline(fake_classifier, result_cache=cache)
+
+    job = pipeline.get(pipeline.submit("https://youtu.be/abcdefghijk"))
+    assert job.wait(timeout=10) and job.status == DONE
+
+    stored_key = cache.put.call_args.args[0]
+    assert stored_key != job.cache_key
+    assert stored_key == make_cache_key(
+        "https://www.youtube.com/watch?v=abcdefghijk", "fake-version", 5, vad=False, **job.options
+    )
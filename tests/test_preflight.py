@@ -0,0 +1,166 @@
+# tests/test_preflight.py
+import os
+import threading
+import pytest
+from unittest.mock import MagicMock
+from utils.preflight import ACCEPT, REJECT, TRIM, AdmissionPolicy, Preflight, metadata_key, summarize_info
+from utils.result_cache import ResultCache
+
+# The shape of a yt-dlp info dictionary for a YouTube video (trimmed to what matters).
+YOUTUBE_INFO = {
+    "id": "abcdefghijk",
+    "title": "A talk",
+    "duration": 3600,
+    "live_status": "not_live",
+    "formats": [
+        {"format_id": "139", "ext": "m4a", "acodec": "mp4a.40.5", "vcodec": "none", "abr": 48.0, "filesize": 21_600_000},
+        {"format_id": "249", "ext": "webm", "acodec": "opus", "vcodec": "none", "abr": 50.0},
+        {"format_id": "600", "ext": "webm", "acodec": "opus", "vcodec": "none", "abr": 20.0},
+        {"format_id": "137", "ext": "mp4", "acodec": "none", "vcodec": "avc1", "tbr": 4000.0},
+    ],
+}
+
+def test_metadata_key_normalizes_url_forms():
+    """
+    Test that every URL form of one video shares a cache key, and direct links drop the fragment.
+    """
+    keys = {
+        metadata_key("https://youtu.be/abcdefghijk?si=xyz"),
+        metadata_key("https://www.youtube.com/watch?v=abcdefghijk&t=42"),
+        metadata_key("https://www.youtube.com/shorts/abcdefghijk"),
+    }
+    assert keys == {"youtube:abcdefghijk"}
+    assert metadata_key("https://example.com/talk.mp4#t=5") == "url:https://example.com/talk.mp4"
+
+def test_policy_trims_window_and_picks_cheapest_adequate_format():
+    """
+    Test that an open-ended request is trimmed and the cheapest format above the bitrate floor is used.
+    """
+    metadata = summarize_info(YOUTUBE_INFO)
+    assert metadata["has_audio"] is True and metadata["is_live"] is False
+    assert [f["format_id"] for f in metadata["audio_formats"]] == ["139", "249", "600"]
+
+    decision = AdmissionPolicy(max_analysis_seconds=600).decide(metadata, start_offset=60.0, max_duration=None)
+
+    assert decision["action"] == TRIM
+    assert decision["max_duration"] == 600
+    # 600 (too low at 20 kbps) is skipped; 139 is 21.6 MB for the hour, so 3.6 MB for ten minutes.
+    assert decision["format"] == "139"
+    assert decision["estimated_bytes"] == pytest.approx(3_600_000)
+
+    within = AdmissionPolicy(max_analysis_seconds=600).decide(metadata, max_duration=60.0)
+    assert within["action"] == ACCEPT and within["max_duration"] == 60.0
+
+@pytest.mark.parametrize("info, kwargs, policy, reason", [
+    ({**YOUTUBE_INFO, "live_status": "is_live"}, {}, AdmissionPolicy(), "Live streams"),
+    ({**YOUTUBE_INFO, "formats": [YOUTUBE_INFO["formats"][-1]]}, {}, AdmissionPolicy(), "no audio"),
+    (YOUTUBE_INFO, {"start_offset": 4000.0}, AdmissionPolicy(), "past the end"),
+    (YOUTUBE_INFO, {}, AdmissionPolicy(max_source_seconds=1800), "minutes long"),
+    (YOUTUBE_INFO, {}, AdmissionPolicy(max_analysis_seconds=None, max_download_bytes=5e6), "about 22 MB"),
+])
+def test_policy_rejections(info, kwargs, policy, reason):
+    """
+    Test each rejection rule: live, no audio, start past the end, too long, too large.
+    """
+    decision = policy.decide(summarize_info(info), **kwargs)
+    assert decision["action"] == REJECT
+    assert reason in decision["reason"]
+
+def test_policy_accepts_unknown_metadata():
+    """
+    Test that a direct link with no duration or codecs, or a failed preflight, is not rejected.
+    """
+    direct = summarize_info({"id": "talk", "title": "talk", "ext": "mp4", "format_id": "mp4"})
+    assert direct["has_audio"] is None and direct["duration"] is None
+
+    decision = AdmissionPolicy().decide(direct, max_duration=30.0)
+    assert decision["action"] == ACCEPT and decision["format"] is None
+    assert AdmissionPolicy().decide(None, max_duration=30.0)["action"] == ACCEPT
+
+def test_probe_is_cached_by_video_id(mocker, temp_dir):
+    """
+    Test that a second probe of the same video (in another URL form) skips the extractor.
+    """
+    ydl = MagicMock()
+    ydl.__enter__.return_value.extract_info.return_value = YOUTUBE_INFO
+    youtube_dl = mocker.patch("yt_dlp.YoutubeDL", return_value=ydl)
+    preflight = Preflight(cache=ResultCache(path=os.path.join(temp_dir, "metadata.sqlite3")))
+
+    first = preflight.probe("https://youtu.be/abcdefghijk")
+    second = preflight.probe("https://www.youtube.com/watch?v=abcdefghijk&si=share")
+
+    assert first == second and first["duration"] == 3600.0
+    assert youtube_dl.call_count == 1
+    assert ydl.__enter__.return_value.extract_info.call_args.kwargs["download"] is False
+
+def test_failures_and_live_streams_are_remembered_briefly(mocker, temp_dir):
+    """
+    Test that a failed probe and a live stream are reused until recent_ttl_seconds pass, but never cached on disk.
+    """
+    ydl = MagicMock()
+    extract_info = ydl.__enter__.return_value.extract_info
+    extract_info.side_effect = [Exception("timed out"), dict(YOUTUBE_INFO, live_status="is_live"), YOUTUBE_INFO]
+    mocker.patch("yt_dlp.YoutubeDL", return_value=ydl)
+    clock = mocker.patch("utils.preflight.time.monotonic", return_value=1000.0)
+    cache = ResultCache(path=os.path.join(temp_dir, "metadata.sqlite3"))
+    preflight = Preflight(cache=cache, recent_ttl_seconds=60.0)
+
+    assert preflight.probe("https://youtu.be/abcdefghijk") is None
+    assert preflight.probe("https://youtu.be/abcdefghijk") is None
+    clock.return_value = 1061.0
+    assert preflight.probe("https://youtu.be/abcdefghijk")["is_live"] is True
+    assert preflight.probe("https://youtu.be/abcdefghijk")["is_live"] is True
+    assert len(cache) == 0
+    clock.return_value = 1122.0
+    assert preflight.probe("https://youtu.be/abcdefghijk")["is_live"] is False
+
+    assert extract_info.call_count == 3
+    assert len(cache) == 1
+
+def test_background_probes_share_one_extractor_call(mocker, temp_dir):
+    """
+    Test that start_probe returns before the extractor finishes, and that probes of one video made meanwhile join it.
+    """
+    release = threading.Event()
+
+    def slow_extract(url, download):
+        release.wait(timeout=5)
+        return YOUTUBE_INFO
+
+    ydl = MagicMock()
+    ydl.__enter__.return_value.extract_info.side_effect = slow_extract
+    youtube_dl = mocker.patch("yt_dlp.YoutubeDL", return_value=ydl)
+    preflight = Preflight(cache=ResultCache(path=os.path.join(temp_dir, "metadata.sqlite3")))
+
+    first = preflight.start_probe("https://youtu.be/abcdefghijk")
+    second = preflight.start_probe("https://www.youtube.com/watch?v=abcdefghijk")
+    assert not first.done() and second is first
+    release.set()
+
+    assert preflight.probe("https://youtu.be/abcdefghijk")["duration"] == 3600.0
+    assert first.result(timeout=5)["duration"] == 3600.0
+    assert youtube_dl.call_count == 1
+
+def test_probe_keeps_audio_stream_urls_for_progressive_jobs(mocker):
+    """
+    Test that a probe's audio-only format URLs can be reused without another extractor call, until they expire.
+    """
+    info = dict(YOUTUBE_INFO, http_headers={"User-Agent": "test"}, formats=[
+        dict(fmt, url=f"https://cdn.example/{fmt['format_id']}") for fmt in YOUTUBE_INFO["formats"]
+    ])
+    ydl = MagicMock()
+    ydl.__enter__.return_value.extract_info.return_value = info
+    youtube_dl = mocker.patch("yt_dlp.YoutubeDL", return_value=ydl)
+    clock = mocker.patch("utils.preflight.time.monotonic", return_value=1000.0)
+    preflight = Preflight()
+
+    assert preflight.stream("https://youtu.be/abcdefghijk", "139") is None
+    preflight.probe("https://youtu.be/abcdefghijk")
+
+    stream = preflight.stream("https://www.youtube.com/watch?v=abcdefghijk", "139")
+    assert stream == {"url": "https://cdn.example/139", "http_headers": {"User-Agent": "test"}}
+    assert preflight.stream("https://youtu.be/abcdefghijk", "137") is None
+    assert preflight.stream("https://youtu.be/abcdefghijk") is None
+    clock.return_value = 1000.0 + 31 * 60
+    assert preflight.stream("https://youtu.be/abcdefghijk", "139") is None
+    assert youtube_dl.call_count == 1
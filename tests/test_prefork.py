@@ -0,0 +1,106 @@
+# tests/test_prefork.py
+import os
+import time
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from utils.inference_client import InferenceClient
+from utils.prefork import PreforkServer, share_model_memory, worker_thread_count
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+
+def make_classifier():
+    classifier = MagicMock()
+    classifier.onnx_engine = None
+    classifier.classifier = None
+    classifier.model_version = "fake-version"
+    classifier.sample_rate = 16000
+    classifier.embedding_dim = 3
+    classifier.classify_batch.side_effect = lambda waveforms, top_k=5: [[{"label": "Us", "score": 1.0}]] * len(waveforms)
+    return classifier
+
+def test_worker_thread_count_splits_the_cores():
+    """
+    Test that workers share the cores without oversubscribing, with at least one thread each.
+    """
+    assert worker_thread_count(4, cpus=8) == 2
+    assert worker_thread_count(3, cpus=8) == 2
+    assert worker_thread_count(16, cpus=8) == 1
+
+def test_share_model_memory_moves_weights_unless_memory_mapped():
+    """
+    Test that torch weights are moved into shared memory, while bundle and ONNX models are handled separately.
+    """
+    torch = pytest.importorskip("torch")
+    classifier = MagicMock()
+    classifier.onnx_engine = None
+    classifier.bundle_path = None
+    classifier.classifier.mods = torch.nn.ModuleDict({"embedding_model": torch.nn.Linear(8, 4)})
+
+    assert share_model_memory(classifier) == (8 * 4 + 4) * 4
+    assert classifier.classifier.mods["embedding_model"].weight.is_shared()
+    assert share_model_memory(classifier) == 0
+
+    classifier.bundle_path = "bundle.pt"
+    assert share_model_memory(classifier) == 0
+    classifier.onnx_engine = MagicMock()
+    with pytest.raises(ValueError):
+        share_model_memory(classifier)
+
+def test_forked_workers_serve_the_preloaded_model():
+    """
+    Test that workers forked after loading the model answer requests and are all stopped with the server.
+    """
+    loads = []
+
+    def load():
+        loads.append(os.getpid())
+        return make_classifier()
+
+    server = PreforkServer(load, workers=2, port=0, threads_per_worker=1)
+    server.start()
+    try:
+        pids = server.worker_pids
+        assert len(pids) == 2 and os.getpid() not in pids
+        client = InferenceClient(server.url)
+        assert client.health()["pid"] in pids
+        assert client.classify_waveform(np.zeros(1600, dtype=np.float32), top_k=1)[0]["label"] == "Us"
+        client.close()
+    finally:
+        server.stop()
+
+    assert loads == [os.getpid()]
+    assert server.worker_pids == []
+    for pid in pids:
+        with pytest.raises(ChildProcessError):
+            os.waitpid(pid, os.WNOHANG)
+
+def test_init_worker_runs_in_every_worker_after_the_fork(temp_dir, monkeypatch):
+    """
+    Test that the per-worker hook (e.g. opening the embedding store) runs once in each worker, never in the parent.
+    """
+    from utils.inference_server import attach_embedding_store
+
+    monkeypatch.setenv("ACCENT_EMBEDDING_STORE", os.path.join(temp_dir, "store"))
+
+    def init_worker(classifier):
+        attach_embedding_store(classifier)
+        opened = classifier.embedding_store is not None and not isinstance(classifier.embedding_store, MagicMock)
+        with open(os.path.join(temp_dir, f"worker-{os.getpid()}"), "w") as f:
+            f.write("store" if opened else "none")
+
+    server = PreforkServer(make_classifier, workers=2, port=0, threads_per_worker=1, init_worker=init_worker)
+    server.start()
+    try:
+        pids = server.worker_pids
+        deadline = time.monotonic() + 30
+        while len([n for n in os.listdir(temp_dir) if n.startswith("worker-")]) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        server.stop()
+
+    workers = sorted(name for name in os.listdir(temp_dir) if name.startswith("worker-"))
+    assert workers == sorted(f"worker-{pid}" for pid in pids)
+    for name in workers:
+        with open(os.path.join(temp_dir, name)) as f:
+            assert f.read() == "store"
@@ -0,0 +1,137 @@
+# tests/test_progressive.py
+import threading
+import time
+from contextlib import closing
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from utils.progressive import (
+    STOP_CONFIDENT, STOP_END_OF_AUDIO, STOP_TIME_BUDGET, EarlyExitPolicy, PrefetchedChunks, chunk_waveform,
+    classify_progressive,
+)
+
+def scores(us: float, england: float, indian: float):
+    ranked = sorted([("Us", us), ("England", england), ("Indian", indian)], key=lambda item: -item[1])
+    return [[{"label": label, "score": score} for label, score in ranked]]
+
+def tracked_chunks(count: int, seconds: float = 6.0):
+    """Yields speech-like chunks and records how many were pulled and whether the stream was closed."""
+    state = {"pulled": 0, "closed": False}
+
+    def generate():
+        try:
+            for _ in range(count):
+                state["pulled"] += 1
+                yield np.full(int(seconds * 16000), 0.3, dtype=np.float32)
+        finally:
+            state["closed"] = True
+
+    return generate(), state
+
+def test_stops_once_confident_and_closes_the_stream():
+    """
+    Test that a clear answer stops after the minimum speech, reporting the audio used.
+    """
+    classifier = MagicMock()
+    classifier.classify_batch.return_value = scores(0.6, 0.2, 0.1)
+    chunks, state = tracked_chunks(10)
+    updates = []
+
+    result = classify_progressive(
+        classifier, chunks, EarlyExitPolicy(min_confidence=0.9, min_seconds=12.0), top_k=2, on_update=updates.append
+    )
+
+    assert result["stop_reason"] == STOP_CONFIDENT
+    assert result["chunks"] == 2 and result["audio_seconds"] == pytest.approx(12.0)
+    assert [r["label"] for r in result["top_k"]] == ["Us", "England"]
+    assert result["top_k"][0]["score"] == pytest.approx(0.6)
+    assert result["confidence"] > 0.9
+    assert state == {"pulled": 2, "closed": True}
+    assert len(updates) == 2
+
+def test_prefetched_chunks_decode_ahead_on_their_own_thread():
+    """
+    Test that the source runs on the prefetch thread, at most max_chunks ahead, and that closing it stops and closes the source.
+    """
+    chunks, state = tracked_chunks(10)
+    threads = set()
+
+    def source():
+        with closing(chunks):
+            for chunk in chunks:
+                threads.add(threading.current_thread().name)
+                yield chunk
+
+    prefetched = PrefetchedChunks(source(), max_chunks=2, name="test-prefetch")
+    first = next(prefetched)
+    time.sleep(0.2)
+
+    assert first.shape == (96000,)
+    # One chunk consumed, two queued and one more pulled while waiting for room.
+    assert state["pulled"] == 4
+    assert threads == {"test-prefetch"}
+    prefetched.close()
+    deadline = time.monotonic() + 5
+    while not state["closed"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert state["closed"] and state["pulled"] == 4
+    assert list(prefetched) == []
+
+def test_prefetched_chunks_end_and_raise_like_the_source():
+    """
+    Test that a prefetched source ends with its last chunk and re-raises its error to the consumer.
+    """
+    chunks, _ = tracked_chunks(3)
+    assert len(list(PrefetchedChunks(chunks))) == 3
+
+    def failing():
+        yield np.zeros(16000, dtype=np.float32)
+        raise RuntimeError("ffmpeg could not decode audio")
+
+    prefetched = PrefetchedChunks(failing())
+    next(prefetched)
+    with pytest.raises(RuntimeError, match="could not decode"):
+        next(prefetched)
+
+def test_ambiguous_audio_runs_to_the_end_unless_out_of_time():
+    """
+    Test that close scores use all the audio, and that the time budget stops with the current answer.
+    """
+    classifier = MagicMock()
+    classifier.classify_batch.side_effect = [scores(0.52, 0.48, 0.1), scores(0.46, 0.5, 0.1), scores(0.5, 0.47, 0.1)]
+    result = classify_progressive(classifier, chunk_waveform(np.full(16000 * 15, 0.3, dtype=np.float32)))
+
+    assert result["stop_reason"] == STOP_END_OF_AUDIO
+    assert result["chunks"] == 3 and result["audio_seconds"] == pytest.approx(15.0)
+    # Weighted by speech seconds: the last chunk is 3 s long.
+    assert result["top_k"][0]["label"] == "Us"
+    assert result["top_k"][0]["score"] == pytest.approx((0.52 * 6 + 0.46 * 6 + 0.5 * 3) / 15)
+
+    classifier.classify_batch.side_effect = None
+    classifier.classify_batch.return_value = scores(0.5, 0.48, 0.1)
+    chunks, state = tracked_chunks(10)
+    result = classify_progressive(classifier, chunks, EarlyExitPolicy(time_budget_seconds=0.0))
+    assert result["stop_reason"] == STOP_TIME_BUDGET and state == {"pulled": 1, "closed": True}
+
+def test_silent_chunks_are_skipped():
+    """
+    Test that chunks without enough speech never reach the model, and all-silent audio gives no prediction.
+    """
+    classifier = MagicMock()
+    result = classify_progressive(classifier, [np.zeros(16000 * 6, dtype=np.float32)] * 2)
+
+    assert result["top_k"] == [] and result["audio_seconds"] == pytest.approx(12.0)
+    classifier.classify_batch.assert_not_called()
+
+def test_policy_from_env(monkeypatch):
+    """
+    Test that the environment overrides the defaults and 0 disables a threshold.
+    """
+    monkeypatch.setenv("ACCENT_EARLY_EXIT_CONFIDENCE", "0")
+    monkeypatch.setenv("ACCENT_EARLY_EXIT_MARGIN", "0.4")
+    monkeypatch.setenv("ACCENT_EARLY_EXIT_BUDGET_SECONDS", "5")
+    policy = EarlyExitPolicy.from_env()
+
+    assert policy.min_confidence is None and policy.min_margin == 0.4 and policy.time_budget_seconds == 5.0
+    assert policy.stop_reason(confidence=0.99, margin=0.5, speech_seconds=12.0, elapsed=1.0) == "margin"
+    assert policy.stop_reason(confidence=0.99, margin=0.5, speech_seconds=6.0, elapsed=1.0) is None
@@ -0,0 +1,64 @@
+# tests/test_quantization.py
+import pytest
+import torch
+import torch.ao.nn.quantized.dynamic as nnqd
+from benchmarks.quantization_parity import full_scores, synthetic_clips
+from utils.classifier import AccentClassifier
+from utils.quantization import PointwiseLinear, quantize_module
+
+def test_quantize_module_converts_linear_and_pointwise_conv():
+    """
+    Test that Linear and kernel-size-1 Conv1d layers become dynamic int8 Linear layers,
+    and that wider convolutions stay in fp32.
+    """
+    torch.manual_seed(0)
+    module = torch.nn.Sequential(
+        torch.nn.Conv1d(8, 8, 3), torch.nn.Conv1d(8, 16, 1), torch.nn.Flatten(), torch.nn.Linear(16 * 6, 4),
+    ).eval()
+    x = torch.randn(2, 8, 8)
+    expected = module(x)
+    quantized = quantize_module(module)
+
+    assert type(quantized[0]) is torch.nn.Conv1d
+    assert isinstance(quantized[1], PointwiseLinear) and isinstance(quantized[1].linear, nnqd.Linear)
+    assert isinstance(quantized[3], nnqd.Linear)
+    assert torch.allclose(quantized(x), expected, atol=0.05)
+
+def test_quantize_module_rejects_unknown_mode():
+    """
+    Test that an unsupported mode raises ValueError.
+    """
+    with pytest.raises(ValueError, match="Unknown quantization mode"):
+        quantize_module(torch.nn.Linear(2, 2), mode="int4")
+
+def test_classifier_int8_mode(bundle_path, monkeypatch):
+    """
+    Test that the environment variables select the int8 backend and the thread count,
+    and that the quantized model still returns well-formed results.
+    """
+    monkeypatch.setenv("ACCENT_CLASSIFIER_QUANTIZE", "int8")
+    monkeypatch.setenv("ACCENT_CLASSIFIER_THREADS", "2")
+    original_threads = torch.get_num_threads()
+    try:
+        classifier = AccentClassifier(bundle_path=bundle_path)
+
+        assert torch.get_num_threads() == 2
+        assert classifier.model_version.endswith("-int8")
+        assert any(isinstance(m, nnqd.Linear) for m in classifier.classifier.mods.embedding_model.modules())
+        results = classifier.classify_waveform(torch.randn(16000), top_k=3)
+        assert len(results) == 3
+    finally:
+        torch.set_num_threads(original_threads)
+
+def test_int8_agrees_with_fp32_on_synthetic_audio(bundle_path):
+    """
+    Test that the int8 backend keeps the fp32 top-1 prediction and stays within a
+    small score drift on voice-like synthetic clips.
+    """
+    clips = synthetic_clips(8)
+    names, items = list(clips), list(clips.values())
+    _, fp32 = full_scores(AccentClassifier(bundle_path=bundle_path), names, items)
+    _, int8 = full_scores(AccentClassifier(bundle_path=bundle_path, quantize="int8"), names, items)
+
+    assert torch.equal(fp32.argmax(dim=-1), int8.argmax(dim=-1))
+    assert (fp32 - int8).abs().max().item() < 0.02
@@ -0,0 +1,72 @@
+# tests/test_result_cache.py
+import os
+import pytest
+from utils.result_cache import ResultCache, make_cache_key
+
+RESULTS = [{"label": "Us", "score": 0.91}, {"label": "England", "score": 0.05}]
+
+@pytest.fixture
+def cache(tmpdir):
+    """A pytest fixture that creates a fresh cache file in a temporary directory."""
+    return ResultCache(path=os.path.join(str(tmpdir), "results.sqlite3"), ttl_seconds=60, max_entries=3)
+
+def test_cache_key_depends_on_model_and_options():
+    """
+    Test that every input that changes the prediction changes the key.
+    """
+    base = make_cache_key("https://www.youtube.com/watch?v=abcdefghijk", "v1", 5, max_duration=60)
+
+    assert base == make_cache_key(" https://www.youtube.com/watch?v=abcdefghijk ", "v1", 5, max_duration=60)
+    assert base != make_cache_key("https://www.youtube.com/watch?v=abcdefghijk", "v2", 5, max_duration=60)
+    assert base != make_cache_key("https://www.youtube.com/watch?v=abcdefghijk", "v1", 3, max_duration=60)
+    assert base != make_cache_key("https://www.youtube.com/watch?v=abcdefghijk", "v1", 5, max_duration=30)
+
+def test_put_then_get_counts_hits_and_misses(cache):
+    """
+    Test the round trip and the hit/miss counters.
+    """
+    assert cache.get("key") is None
+    cache.put("key", RESULTS)
+
+    assert cache.get("key") == RESULTS
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+def test_fresh_cache_stores_the_first_result_and_serves_it(cache):
+    """
+    Test that an empty cache is not mistaken for a missing one: the first put is stored and then hit.
+    """
+    assert len(cache) == 0 and cache
+    key = make_cache_key("https://www.youtube.com/watch?v=abcdefghijk", "v1", 5)
+    if cache and cache.get(key) is None:
+        cache.put(key, RESULTS)
+
+    assert cache.get(key) == RESULTS
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+def test_entries_expire_after_ttl(cache, mocker):
+    """
+    Test that an entry older than the TTL is treated as a miss.
+    """
+    mock_time = mocker.patch('utils.result_cache.time.time', return_value=1000.0)
+    cache.put("key", RESULTS)
+
+    mock_time.return_value = 1000.0 + cache.ttl_seconds + 1
+    assert cache.get("key") is None
+
+def test_least_recently_used_entry_is_evicted(cache, mocker):
+    """
+    Test that exceeding max_entries evicts the entry that was used least recently.
+    """
+    mock_time = mocker.patch('utils.result_cache.time.time')
+    for i, key in enumerate(["a", "b", "c"]):
+        mock_time.return_value = 1000.0 + i
+        cache.put(key, RESULTS)
+
+    mock_time.return_value = 1010.0
+    cache.get("a")  # "b" is now the least recently used entry
+    mock_time.return_value = 1011.0
+    cache.put("d", RESULTS)
+
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert cache.get("a") == RESULTS
@@ -0,0 +1,93 @@
+# tests/test_scratch.py
+import os
+import threading
+import time
+from utils.metrics import REGISTRY
+from utils.scratch import ScratchDir, ScratchSpace, default_scratch_root
+
+def test_acquire_waits_for_quota_until_space_is_given_back(temp_dir):
+    """
+    Test that a job that does not fit waits (instead of failing) and starts once another releases its space.
+    """
+    space = ScratchSpace(root=temp_dir, quota_bytes=100)
+    first = space.acquire(60)
+    waited = threading.Event()
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(space.acquire(60, on_wait=waited.set)))
+    thread.start()
+
+    assert waited.wait(timeout=5)
+    time.sleep(0.1)
+    assert not acquired
+    assert space.usage()["waiting"] == 1
+
+    first.release()
+    thread.join(timeout=5)
+    assert acquired and acquired[0].reserved == 60
+    assert not os.path.exists(first.path)
+    assert space.usage()["waiting"] == 0 and space.usage()["active"] == 1
+    assert space.acquire(60, timeout=0.1) is None
+    # More than the whole quota runs alone instead of waiting forever.
+    acquired[0].release()
+    assert space.acquire(10 ** 9, timeout=0.1).reserved == 100
+
+def test_discard_gives_space_back_eagerly(temp_dir):
+    """
+    Test that deleting a finished file returns its bytes to the quota and shows in the usage gauges.
+    """
+    space = ScratchSpace(root=os.path.join(temp_dir, "scratch"), quota_bytes=1000)
+    scratch = space.acquire(800)
+    media = os.path.join(scratch.path, "audio.m4a")
+    with open(media, "wb") as f:
+        f.write(b"x" * 300)
+    scratch.expect(200)
+    assert space.usage()["reserved_bytes"] == 500 and space.usage()["used_bytes"] == 300
+
+    scratch.discard(media)
+    assert not os.path.exists(media)
+    assert space.usage()["reserved_bytes"] == 0
+    assert f'accent_scratch_quota_bytes{{root="{space.root}"}} 1000.0' in REGISTRY.render()
+
+    with scratch:
+        pass
+    assert not os.path.exists(scratch.path)
+    assert space.usage() == {
+        "root": space.root, "quota_bytes": 1000, "reserved_bytes": 0, "active": 0, "waiting": 0, "used_bytes": 0,
+    }
+
+def test_expect_waits_for_quota_and_gives_up_without_changing_the_reservation(temp_dir, mocker):
+    """
+    Test that growing a reservation respects the quota like acquire, and that only usage() walks the disk.
+    """
+    space = ScratchSpace(root=temp_dir, quota_bytes=100)
+    walks = mocker.spy(ScratchDir, "used_bytes")
+    other = space.acquire(50)
+    scratch = space.acquire(30)
+    assert walks.call_count == 0
+
+    assert not scratch.expect(60, timeout=0.1)
+    assert scratch.reserved == 30 and space.usage()["waiting"] == 0
+
+    waited = threading.Event()
+    grown = []
+    thread = threading.Thread(target=lambda: grown.append(scratch.expect(60, on_wait=waited.set)))
+    thread.start()
+    assert waited.wait(timeout=5)
+    assert space.usage()["waiting"] == 1
+    other.release()
+    thread.join(timeout=5)
+    assert grown == [True] and scratch.reserved == 60
+    # More than the whole quota is capped to it instead of waiting forever.
+    assert scratch.expect(10 ** 9, timeout=0.1) and scratch.reserved == 100
+
+def test_root_comes_from_the_environment(temp_dir, monkeypatch):
+    """
+    Test that ACCENT_SCRATCH_DIR and ACCENT_SCRATCH_QUOTA_MB configure the scratch space.
+    """
+    monkeypatch.setenv("ACCENT_SCRATCH_DIR", temp_dir)
+    monkeypatch.setenv("ACCENT_SCRATCH_QUOTA_MB", "5")
+    assert default_scratch_root() == temp_dir
+    space = ScratchSpace.from_env()
+    assert space.root == temp_dir and space.quota_bytes == 5_000_000
+    # The default reservation is capped to the small quota.
+    assert space.acquire().reserved == 5_000_000
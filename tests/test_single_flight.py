@@ -0,0 +1,25 @@
+# tests/test_single_flight.py
+import pytest
+from utils.single_flight import FlightLock, cross_process_locks_supported
+
+pytestmark = pytest.mark.skipif(not cross_process_locks_supported(), reason="needs fcntl")
+
+def test_flight_lock_is_exclusive_per_key(temp_dir):
+    """
+    Test that a second holder of the same key is refused until the first releases, and other keys are independent.
+    """
+    first = FlightLock(temp_dir, "youtube:abcdefghijk")
+    second = FlightLock(temp_dir, "youtube:abcdefghijk")
+    other = FlightLock(temp_dir, "youtube:zyxwvutsrqp")
+
+    assert first.acquire(blocking=False)
+    assert not second.acquire(blocking=False)
+    assert not second.acquire(timeout=0.1, poll_seconds=0.02)
+    assert other.acquire(blocking=False)
+
+    first.release()
+    first.release()
+    assert not first.locked
+    assert second.acquire(blocking=False) and second.locked
+    second.release()
+    other.release()
@@ -0,0 +1,148 @@
+# tests/test_streaming.py
+import os
+import time
+import numpy as np
+import pytest
+import soundfile as sf
+from unittest.mock import MagicMock
+from utils.audio_utils import stream_audio_chunks
+from utils.streaming import ChunkQueue, LiveSession, LiveSessions, RingBuffer, StreamingClassifier, paced
+
+def loudness_classifier(delay: float = 0.0):
+    """A classifier that says 'Us' for loud windows and 'England' for quiet ones."""
+    def classify_batch(waveforms, top_k=5):
+        time.sleep(delay)
+        loud = float(np.abs(waveforms[0]).mean()) > 0.4
+        us, england = (0.6, 0.2) if loud else (0.2, 0.6)
+        ranked = sorted([("Us", us), ("England", england)], key=lambda item: -item[1])
+        return [[{"label": label, "score": score} for label, score in ranked][:top_k]]
+
+    classifier = MagicMock()
+    classifier.classify_batch.side_effect = classify_batch
+    return classifier
+
+def test_ring_buffer_wraps_and_forgets_overwritten_audio():
+    """
+    Test that reads by absolute position survive wrap-around and refuse audio that is gone or not yet written.
+    """
+    buffer = RingBuffer(10)
+    buffer.write(np.arange(7, dtype=np.float32))
+    buffer.write(np.arange(7, 15, dtype=np.float32))
+
+    assert buffer.total_written == 15
+    assert buffer.read(15, 10).tolist() == list(range(5, 15))
+    assert buffer.read(12, 4).tolist() == [8, 9, 10, 11]
+    assert buffer.read(15, 11) is None
+    assert buffer.read(16, 2) is None
+
+    buffer.write(np.arange(100, 125, dtype=np.float32))
+    assert buffer.read(40, 10).tolist() == list(range(115, 125))
+
+def test_falls_behind_by_at_most_the_allowed_lag_and_keeps_bounded_history():
+    """
+    Test that a backlog is skipped to the newest window, and that only the last updates are kept.
+    """
+    engine = StreamingClassifier(loudness_classifier(), max_lag_seconds=4.0, history=3)
+    engine.feed(np.full(16000 * 30, 0.3, dtype=np.float32))
+
+    update = engine.step()
+    assert update["stream_seconds"] == pytest.approx(30.0)
+    assert engine.windows_skipped == 12
+    assert engine.step() is None
+
+    for _ in range(5):
+        engine.feed(np.full(16000 * 2, 0.3, dtype=np.float32))
+        engine.step()
+    assert engine.update_count == 6
+    assert [u["stream_seconds"] for u in engine.updates()] == pytest.approx([36.0, 38.0, 40.0])
+    assert [u["stream_seconds"] for u in engine.updates(since=5)] == pytest.approx([40.0])
+    assert engine.buffer.capacity == 16000 * 12
+
+def test_silent_windows_leave_the_running_result_alone():
+    """
+    Test that windows without enough speech are reported as silence and do not move the average.
+    """
+    classifier = loudness_classifier()
+    engine = StreamingClassifier(classifier, hop_seconds=6.0)
+    engine.feed(np.full(16000 * 6, 0.3, dtype=np.float32))
+    first = engine.step()
+    engine.feed(np.zeros(16000 * 6, dtype=np.float32))
+    silent = engine.step()
+
+    assert first["window"] == {"label": "England", "score": 0.6}
+    assert silent["window"] is None
+    assert silent["top_k"] == first["top_k"]
+    assert classifier.classify_batch.call_count == 1
+
+def test_live_session_on_a_real_time_paced_wav(tmpdir):
+    """
+    Test the engine end to end on a local WAV played back in real time (4x), as a live source would deliver it.
+    """
+    path = os.path.join(str(tmpdir), "speech.wav")
+    audio = np.concatenate([np.full(16000 * 8, 0.3), np.full(16000 * 12, 0.6)]).astype(np.float32)
+    sf.write(path, audio, 16000, subtype="FLOAT")
+
+    engine = StreamingClassifier(loudness_classifier(delay=0.05), window_seconds=4.0, hop_seconds=2.0)
+    started = time.monotonic()
+    session = LiveSession(engine, paced(stream_audio_chunks(path, chunk_seconds=0.5), speed=4.0))
+    first_update_at = None
+    while session.running:
+        if first_update_at is None and engine.update_count:
+            first_update_at = time.monotonic() - started
+        time.sleep(0.01)
+
+    assert session.error is None
+    assert session.received_seconds == pytest.approx(20.0)
+    updates = engine.updates()
+    assert [u["stream_seconds"] for u in updates] == pytest.approx([4.0, 6.0, 8.0, 10.0, 12.0, 14.0, 16.0, 18.0, 20.0])
+    # Results come while the audio is still playing, each shortly after its window ends.
+    assert first_update_at < 5.0 / 4.0 + 0.5
+    assert max(u["lag_seconds"] for u in updates) <= 2.0
+    assert [u["window"]["label"] for u in updates[:3]] == ["England"] * 3
+    assert updates[-1]["window"]["label"] == "Us"
+    assert updates[-1]["top_k"][0]["label"] == "Us"
+    assert engine.windows_skipped == 0
+
+def test_chunk_queue_drops_the_oldest_audio_when_full_and_stops_sessions():
+    """
+    Test that pushed audio (e.g. microphone frames) is bounded and that stopping a session ends its iteration.
+    """
+    chunks = ChunkQueue(max_chunks=2)
+    for value in (1, 2, 3):
+        chunks.put(np.full(4, value, dtype=np.float32))
+    chunks.close()
+    assert [chunk[0] for chunk in chunks] == [2, 3]
+
+    engine = StreamingClassifier(loudness_classifier())
+    live = ChunkQueue()
+    session = LiveSession(engine, live)
+    live.put(np.full(16000 * 6, 0.6, dtype=np.float32))
+    deadline = time.monotonic() + 5
+    while not engine.update_count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    session.stop()
+
+    assert not session.running
+    assert engine.updates()[0]["window"]["label"] == "Us"
+
+def test_live_sessions_are_capped_and_stopped_once_nobody_polls_them():
+    """
+    Test that the registry refuses sessions past its limit and stops the ones that are no longer touched.
+    """
+    sessions = LiveSessions(max_sessions=2, idle_seconds=0.3, check_seconds=0.05)
+    watched = sessions.start(StreamingClassifier(loudness_classifier()), ChunkQueue(), name="watched")
+    abandoned = sessions.start(StreamingClassifier(loudness_classifier()), ChunkQueue(), name="abandoned")
+    assert sessions.start(StreamingClassifier(loudness_classifier()), ChunkQueue(), name="extra") is None
+
+    deadline = time.monotonic() + 5
+    while abandoned.running and time.monotonic() < deadline:
+        watched.touch()
+        time.sleep(0.02)
+
+    assert not abandoned.running and abandoned.stopped_idle
+    assert watched.running and not watched.stopped_idle
+    assert sessions.active == 1
+    assert sessions.start(StreamingClassifier(loudness_classifier()), ChunkQueue(), name="next") is not None
+
+    sessions.stop(watched)
+    assert not watched.running and not watched.stopped_idle
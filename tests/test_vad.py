@@ -0,0 +1,73 @@
+# tests/test_vad.py
+import numpy as np
+import pytest
+from utils.vad import trim_silence
+
+SAMPLE_RATE = 16000
+
+def _tone(seconds, amplitude=0.3, frequency=220.0):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+def _silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+def test_trim_silence_keeps_speech_and_drops_silence():
+    """
+    Test that 4 s of "speech" between 6 s of silence is kept (plus padding) and the rest dropped.
+    """
+    waveform = np.concatenate([_silence(3), _tone(4), _silence(3)])
+
+    trimmed, stats = trim_silence(waveform, SAMPLE_RATE, padding_seconds=0.2)
+
+    assert stats["kept_seconds"] == pytest.approx(4.4, abs=0.1)
+    assert stats["kept_seconds"] + stats["dropped_seconds"] == pytest.approx(10.0)
+    assert trimmed.shape[0] == pytest.approx(stats["kept_seconds"] * SAMPLE_RATE)
+
+def test_trim_silence_drops_quiet_background():
+    """
+    Test that a quiet background well below the speech level is treated as non-speech.
+    """
+    waveform = np.concatenate([_tone(2, amplitude=0.001), _tone(2, amplitude=0.5)])
+
+    _, stats = trim_silence(waveform, SAMPLE_RATE, padding_seconds=0.0)
+
+    assert stats["kept_seconds"] == pytest.approx(2.0, abs=0.05)
+    assert stats["speech_ratio"] == pytest.approx(0.5, abs=0.02)
+
+def test_trim_silence_all_silence():
+    """
+    Test that a silent clip keeps nothing.
+    """
+    trimmed, stats = trim_silence(_silence(5), SAMPLE_RATE)
+
+    assert trimmed.size == 0
+    assert stats["kept_seconds"] == 0.0
+    assert stats["dropped_seconds"] == pytest.approx(5.0)
+
+def test_trim_silence_shorter_than_a_frame():
+    """
+    Test that input shorter than one analysis frame returns an empty result instead of failing.
+    """
+    trimmed, stats = trim_silence(_tone(0.01), SAMPLE_RATE)
+
+    assert trimmed.size == 0
+    assert stats["speech_ratio"] == 0.0
+
+def test_trimmed_times_map_back_to_the_input():
+    """
+    Test that the kept intervals are reported and that positions in the trimmed audio map back across the gaps.
+    """
+    from utils.vad import to_source_time
+
+    waveform = np.concatenate([_silence(2), _tone(3), _silence(4), _tone(2)])
+    trimmed, stats = trim_silence(waveform, SAMPLE_RATE, padding_seconds=0.0)
+
+    assert stats["intervals"] == [pytest.approx([2.0, 5.0], abs=0.05), pytest.approx([9.0, 11.0], abs=0.05)]
+    assert trimmed.shape[0] / SAMPLE_RATE == pytest.approx(5.0, abs=0.05)
+    intervals = [[2.0, 5.0], [9.0, 11.0]]
+    assert to_source_time(1.0, intervals) == pytest.approx(3.0)
+    assert to_source_time(3.0, intervals) == pytest.approx(9.0)
+    assert to_source_time(3.0, intervals, end=True) == pytest.approx(5.0)
+    assert to_source_time(4.5, intervals, end=True) == pytest.approx(10.5)
+    assert to_source_time(5.0, intervals, end=True) == pytest.approx(11.0)
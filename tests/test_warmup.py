@@ -0,0 +1,38 @@
+# tests/test_warmup.py
+import threading
+import pytest
+from utils.warmup import BackgroundLoader
+
+def test_loader_runs_in_background_and_returns_value():
+    """
+    Test that loading starts immediately on another thread and `get` waits for it.
+    """
+    release = threading.Event()
+    threads = []
+
+    def load():
+        threads.append(threading.current_thread().name)
+        release.wait(timeout=5)
+        return "model"
+
+    loader = BackgroundLoader(load, name="test-warmup")
+    assert not loader.ready
+    with pytest.raises(TimeoutError):
+        loader.get(timeout=0.01)
+
+    release.set()
+    assert loader.get(timeout=5) == "model"
+    assert loader.ready and loader.load_seconds is not None
+    assert threads == ["test-warmup"]
+
+def test_loader_reraises_load_error():
+    """
+    Test that a failed load is reported by `get` instead of being lost on the thread.
+    """
+    def load():
+        raise RuntimeError("weights missing")
+
+    loader = BackgroundLoader(load)
+    with pytest.raises(RuntimeError, match="weights missing"):
+        loader.get(timeout=5)
+    assert isinstance(loader.error, RuntimeError)
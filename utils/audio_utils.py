@@ -1,18 +1,420 @@
 # rem_accent_checker/utils/audio_utils.py
+import io
+import json
 import os
-from moviepy.editor import VideoFileClip
-from typing import Optional
+import shutil
+import subprocess
+import tempfile
+import threading
+import numpy as np
+from typing import Any, Dict, Iterator, Optional, Union
+from .metrics import span
 from .logger import get_logger
 
 logger = get_logger(__name__)
 
-def extract_audio(video_path: str, output_audio_path: str) -> Optional[str]:
+# The sample rate the accent model works at; decoding straight to it avoids a second resample.
+MODEL_SAMPLE_RATE = 16000
+# How many bytes to read from the ffmpeg pipe at a time.
+PIPE_CHUNK_BYTES = 1 << 16
+# Containers that audio-only downloads come in; moviepy must open these as audio clips.
+# bestaudio is often opus in a .webm container, which has no video stream either.
+AUDIO_ONLY_EXTENSIONS = {'.m4a', '.mp3', '.aac', '.opus', '.ogg', '.oga', '.wav', '.flac', '.weba', '.webm'}
+# Uncompressed/lossless formats soundfile reads directly; at the model rate and mono they need no ffmpeg.
+SOUNDFILE_FORMATS = {'WAV', 'FLAC'}
+
+# A local media path, or the bytes of an uploaded file (raw or as a file-like object).
+MediaSource = Union[str, bytes, bytearray, io.IOBase]
+
+def _get_ffmpeg_binary() -> Optional[str]:
+    """
+    Returns the ffmpeg executable to use: the system one if on PATH, else the
+    binary bundled with imageio-ffmpeg (the same one moviepy falls back to).
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception as e:
+        logger.error(f"No ffmpeg binary available. Error: {e}")
+        return None
+
+def _file_size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+def _get_ffprobe_binary() -> Optional[str]:
+    """Returns ffprobe from PATH or next to the ffmpeg binary, or None (imageio-ffmpeg ships none)."""
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        return ffprobe
+    ffmpeg = _get_ffmpeg_binary()
+    if ffmpeg:
+        sibling = os.path.join(os.path.dirname(ffmpeg), os.path.basename(ffmpeg).replace("ffmpeg", "ffprobe"))
+        if sibling != ffmpeg and os.path.isfile(sibling):
+            return sibling
+    return None
+
+def _run_decoder(command: list, source_label: str, input_bytes: Optional[bytes] = None) -> Optional[bytearray]:
+    """
+    Runs an ffmpeg command that writes raw samples to stdout and returns them.
+
+    With `input_bytes`, ffmpeg reads its input from stdin; a writer thread feeds it
+    while the output is read, so neither pipe can fill up and block the other.
+    """
+    stdin = subprocess.PIPE if input_bytes is not None else None
+    with subprocess.Popen(command, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+        writer = None
+        if input_bytes is not None:
+            def feed():
+                try:
+                    process.stdin.write(input_bytes)
+                except (BrokenPipeError, OSError):
+                    # ffmpeg stopped reading early (e.g. -t reached); that is not an error.
+                    pass
+                finally:
+                    process.stdin.close()
+
+            writer = threading.Thread(target=feed, daemon=True)
+            writer.start()
+        pcm = bytearray()
+        for chunk in iter(lambda: process.stdout.read(PIPE_CHUNK_BYTES), b""):
+            pcm += chunk
+        stderr = process.stderr.read()
+        return_code = process.wait()
+        if writer:
+            writer.join()
+
+    if return_code != 0:
+        message = stderr.decode(errors="replace").strip()
+        logger.warning(f"ffmpeg could not decode audio from {source_label}. Error: {message}")
+        return None
+    return pcm
+
+def _decode_command(
+    ffmpeg: str,
+    input_arg: str,
+    sample_rate: int,
+    start_offset: float,
+    max_duration: Optional[float],
+    http_headers: Optional[Dict[str, str]] = None,
+) -> list:
+    """Builds an ffmpeg command that decodes `input_arg` to mono f32le samples on stdout."""
+    command = [ffmpeg, "-hide_banner", "-loglevel", "error"]
+    if input_arg != "pipe:0":
+        # Unless the input itself comes through stdin, keep ffmpeg off it.
+        command.insert(1, "-nostdin")
+    if http_headers:
+        command += ["-headers", "".join(f"{name}: {value}\r\n" for name, value in http_headers.items())]
+    if start_offset > 0:
+        # Before -i, so ffmpeg seeks in the container instead of decoding up to the offset.
+        command += ["-ss", f"{start_offset:.3f}"]
+    command += ["-i", input_arg]
+    if max_duration is not None:
+        command += ["-t", f"{max_duration:.3f}"]
+    command += [
+        "-vn", "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ac", "1", "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+    return command
+
+def _pcm_to_array(pcm: Optional[bytearray], sample_rate: int, source_label: str) -> Optional[np.ndarray]:
+    if pcm is None:
+        return None
+    n_samples = len(pcm) // 4
+    if n_samples == 0:
+        logger.warning(f"The file at {source_label} has no audio samples.")
+        return None
+    audio = np.frombuffer(pcm, dtype="<f4", count=n_samples)
+    logger.info(f"Successfully decoded {n_samples / sample_rate:.1f}s of audio from: {source_label}")
+    return audio
+
+def extract_audio_array(
+    video_path: str,
+    sample_rate: int = MODEL_SAMPLE_RATE,
+    start_offset: float = 0.0,
+    max_duration: Optional[float] = None,
+) -> Optional[np.ndarray]:
+    """
+    Decodes the audio track of a media file straight into memory as mono float32 samples.
+
+    ffmpeg downmixes and resamples while decoding and writes raw `f32le` samples to a
+    pipe, so nothing is written to disk. The returned array owns a writable buffer and
+    can be handed to the classifier without a copy (`torch.from_numpy`).
+
+    Args:
+        video_path (str): The path to the input video (or audio) file.
+        sample_rate (int): The output sample rate in Hz.
+        start_offset (float): Seconds into the file to start decoding at (input seek).
+        max_duration (Optional[float]): Stop decoding after this many seconds.
+
+    Returns:
+        Optional[np.ndarray]: A 1-D float32 array of samples, or None on failure.
+    """
+    if not os.path.exists(video_path):
+        logger.error(f"Video file not found at: {video_path}")
+        return None
+
+    ffmpeg = _get_ffmpeg_binary()
+    if not ffmpeg:
+        return None
+
+    command = _decode_command(ffmpeg, video_path, sample_rate, start_offset, max_duration)
+    with span("extract_audio", bytes=_file_size(video_path)) as s:
+        try:
+            logger.info(f"Decoding audio from {video_path} to memory at {sample_rate} Hz")
+            audio = _pcm_to_array(_run_decoder(command, video_path), sample_rate, video_path)
+        except Exception as e:
+            logger.error(f"Failed to decode audio from {video_path}. Error: {e}")
+            audio = None
+        if audio is None:
+            s["status"] = "error"
+        else:
+            s["audio_seconds"] = audio.shape[0] / sample_rate
+        return audio
+
+def stream_audio_chunks(
+    source: str,
+    chunk_seconds: float = 6.0,
+    sample_rate: int = MODEL_SAMPLE_RATE,
+    start_offset: float = 0.0,
+    max_duration: Optional[float] = None,
+    http_headers: Optional[Dict[str, str]] = None,
+) -> Iterator[np.ndarray]:
+    """
+    Decodes a media file or stream URL incrementally, yielding mono float32 chunks.
+
+    ffmpeg only runs ahead of the consumer by its pipe buffer, so decoding (and, for
+    a URL, downloading) proceeds as fast as chunks are used. Closing the generator
+    early, e.g. once `utils.progressive.classify_progressive` is confident, stops
+    ffmpeg and with it the rest of the decode and download.
+
+    Args:
+        source (str): A local media path or a direct media URL (see `downloader.resolve_stream_url`).
+        chunk_seconds (float): Audio per yielded chunk; the last one may be shorter.
+        sample_rate (int): The output sample rate in Hz.
+        start_offset (float): Seconds into the media to start at (input seek).
+        max_duration (Optional[float]): Stop after this many seconds.
+        http_headers (Optional[Dict[str, str]]): Headers for a URL source (some hosts require theirs).
+
+    Yields:
+        np.ndarray: 1-D float32 arrays with writable buffers.
+
+    Raises:
+        RuntimeError: If ffmpeg is unavailable, or fails before producing any audio.
+    """
+    ffmpeg = _get_ffmpeg_binary()
+    if not ffmpeg:
+        raise RuntimeError("No ffmpeg binary available.")
+    command = _decode_command(ffmpeg, source, sample_rate, start_offset, max_duration, http_headers)
+    chunk_bytes = max(4, int(chunk_seconds * sample_rate) * 4)
+    label = source.split("?", 1)[0]
+    logger.info(f"Streaming audio from {label} in {chunk_seconds:.0f}s chunks")
+    # stderr goes to a file so an unread pipe can never block ffmpeg.
+    with tempfile.TemporaryFile() as stderr, \
+            subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr) as process:
+        decoded = 0
+        try:
+            while True:
+                pcm = process.stdout.read(chunk_bytes)
+                n_samples = len(pcm) // 4
+                if n_samples:
+                    decoded += n_samples
+                    yield np.frombuffer(bytearray(pcm[: n_samples * 4]), dtype="<f4")
+                if len(pcm) < chunk_bytes:
+                    break
+        finally:
+            if process.poll() is None:
+                # The consumer stopped early: the rest of the media is not needed.
+                process.kill()
+                logger.info(f"Stopped streaming {label} after {decoded / sample_rate:.1f}s of audio")
+            return_code = process.wait()
+        if return_code != 0:
+            stderr.seek(0)
+            message = stderr.read().decode(errors="replace").strip()
+            if not decoded:
+                raise RuntimeError(f"ffmpeg could not decode audio from {label}. Error: {message}")
+            logger.warning(f"ffmpeg stopped early on {label} after {decoded / sample_rate:.1f}s. Error: {message}")
+
+def probe_media(source: MediaSource) -> Optional[Dict[str, Any]]:
+    """
+    Describes a media file's container and streams with ffprobe.
+
+    Args:
+        source (Union[str, bytes, file-like]): A local path, or an uploaded file's bytes
+            (probed through stdin, so nothing is written to disk).
+
+    Returns:
+        Optional[Dict[str, Any]]: ffprobe's JSON ('format' and 'streams'), or None if
+        ffprobe is unavailable or cannot read the input.
+    """
+    ffprobe = _get_ffprobe_binary()
+    if not ffprobe:
+        logger.info("ffprobe is not available; skipping the container probe.")
+        return None
+    data = read_media_bytes(source) if not isinstance(source, str) else None
+    command = [ffprobe, "-hide_banner", "-loglevel", "error", "-of", "json", "-show_format", "-show_streams"]
+    command.append("pipe:0" if data is not None else source)
+    try:
+        completed = subprocess.run(command, input=data, capture_output=True, timeout=30)
+        if completed.returncode != 0:
+            logger.warning(f"ffprobe could not read the media. Error: {completed.stderr.decode(errors='replace').strip()}")
+            return None
+        return json.loads(completed.stdout)
+    except Exception as e:
+        logger.error(f"Failed to probe media. Error: {e}")
+        return None
+
+def read_media_bytes(source: MediaSource) -> bytes:
+    """Returns the bytes of an uploaded file given as bytes or a file-like object."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        # Streamlit's UploadedFile and BytesIO expose their buffer without a copy.
+        return source.getvalue()
+    source.seek(0)
+    return source.read()
+
+def _read_native_audio(
+    source: MediaSource,
+    sample_rate: int,
+    start_offset: float,
+    max_duration: Optional[float],
+) -> Optional[np.ndarray]:
+    """
+    Reads WAV/FLAC that is already mono at `sample_rate` with soundfile, skipping ffmpeg.
+
+    Returns None (so the caller decodes with ffmpeg) for any other input.
+    """
+    import soundfile as sf
+
+    handle = source if isinstance(source, str) else io.BytesIO(read_media_bytes(source))
+    try:
+        info = sf.info(handle)
+    except Exception:
+        return None
+    if info.format not in SOUNDFILE_FORMATS or info.samplerate != sample_rate or info.channels != 1:
+        return None
+    if not isinstance(handle, str):
+        handle.seek(0)
+    start = int(start_offset * sample_rate)
+    frames = int(max_duration * sample_rate) if max_duration is not None else -1
+    audio, _ = sf.read(handle, start=start, frames=frames, dtype="float32", always_2d=False)
+    logger.info(f"Read {audio.shape[0] / sample_rate:.1f}s of {info.format} audio directly (no decoding needed).")
+    return audio
+
+def load_media_audio(
+    source: MediaSource,
+    sample_rate: int = MODEL_SAMPLE_RATE,
+    start_offset: float = 0.0,
+    max_duration: Optional[float] = None,
+) -> Optional[np.ndarray]:
+    """
+    Turns a local media file or an uploaded file's bytes into mono float32 samples.
+
+    WAV/FLAC that is already mono at `sample_rate` is read as-is. Anything else is
+    probed with ffprobe (when available) and decoded by ffmpeg; uploads are fed to
+    ffmpeg through stdin, so no copy of the file is written. Containers that cannot
+    be decoded from a pipe (e.g. MP4 with its index at the end) fall back to a
+    temporary file.
+
+    Args:
+        source (Union[str, bytes, file-like]): A local path or the uploaded file.
+        sample_rate (int): The output sample rate in Hz.
+        start_offset (float): Seconds into the media to start at.
+        max_duration (Optional[float]): Stop after this many seconds.
+
+    Returns:
+        Optional[np.ndarray]: A 1-D float32 array of samples, or None on failure.
+    """
+    if isinstance(source, str) and not os.path.isfile(source):
+        logger.error(f"Media file not found at: {source}")
+        return None
+
+    with span("load_media", upload=not isinstance(source, str)) as s:
+        audio = _load_media_audio(source, sample_rate, start_offset, max_duration)
+        if audio is None:
+            s["status"] = "error"
+        else:
+            s["audio_seconds"] = audio.shape[0] / sample_rate
+        return audio
+
+def _load_media_audio(
+    source: MediaSource, sample_rate: int, start_offset: float, max_duration: Optional[float]
+) -> Optional[np.ndarray]:
+    try:
+        audio = _read_native_audio(source, sample_rate, start_offset, max_duration)
+        if audio is not None:
+            return audio if audio.shape[0] else None
+    except Exception as e:
+        logger.warning(f"Direct audio read failed; decoding with ffmpeg instead. Error: {e}")
+
+    probe = probe_media(source)
+    if probe is not None:
+        if not any(stream.get("codec_type") == "audio" for stream in probe.get("streams", [])):
+            logger.warning("The media has no audio stream.")
+            return None
+        logger.info(
+            f"Probed {probe.get('format', {}).get('format_name', 'unknown')} media, "
+            f"{float(probe.get('format', {}).get('duration', 0) or 0):.1f}s long."
+        )
+
+    if isinstance(source, str):
+        return extract_audio_array(source, sample_rate, start_offset, max_duration)
+
+    ffmpeg = _get_ffmpeg_binary()
+    if not ffmpeg:
+        return None
+    data = read_media_bytes(source)
+    command = _decode_command(ffmpeg, "pipe:0", sample_rate, start_offset, max_duration)
+    try:
+        logger.info(f"Decoding {len(data) / 1e6:.1f} MB upload from memory at {sample_rate} Hz")
+        audio = _pcm_to_array(_run_decoder(command, "the upload", input_bytes=data), sample_rate, "the upload")
+    except Exception as e:
+        logger.error(f"Failed to decode the upload. Error: {e}")
+        audio = None
+    if audio is not None:
+        return audio
+
+    # Some containers need random access (e.g. MP4 whose moov atom is at the end).
+    with tempfile.NamedTemporaryFile(suffix=".media") as spill:
+        spill.write(data)
+        spill.flush()
+        logger.info("Decoding from a pipe failed; retrying from a temporary file.")
+        return extract_audio_array(spill.name, sample_rate, start_offset, max_duration)
+
+def _trim_clip(clip, start_offset: float, max_duration: Optional[float]):
+    """Returns the [start_offset, start_offset + max_duration] part of a moviepy clip."""
+    if start_offset <= 0 and max_duration is None:
+        return clip
+    end = None
+    if max_duration is not None:
+        end = start_offset + max_duration
+        if clip.duration is not None:
+            end = min(end, clip.duration)
+    return clip.subclip(start_offset, end)
+
+def extract_audio(
+    video_path: str,
+    output_audio_path: str,
+    start_offset: float = 0.0,
+    max_duration: Optional[float] = None,
+) -> Optional[str]:
     """
     Extracts audio from a video file and saves it as a WAV file.
 
+    This is the fallback path for when `extract_audio_array` cannot be used.
+
     Args:
         video_path (str): The path to the input video file.
         output_audio_path (str): The path to save the output WAV file.
+        start_offset (float): Seconds into the file where the extracted audio starts.
+        max_duration (Optional[float]): Extract at most this many seconds.
 
     Returns:
         Optional[str]: The path to the extracted audio file, or None on failure.
@@ -20,27 +422,49 @@ def extract_audio(video_path: str, output_audio_path: str) -> Optional[str]:
     if not os.path.exists(video_path):
         logger.error(f"Video file not found at: {video_path}")
         return None
-        
+
+    with span("extract_audio_wav", bytes=_file_size(video_path)) as s:
+        output = _write_audio_file(video_path, output_audio_path, start_offset, max_duration)
+        if output is None:
+            s["status"] = "error"
+        return output
+
+def _write_audio_file(
+    video_path: str, output_audio_path: str, start_offset: float, max_duration: Optional[float]
+) -> Optional[str]:
     try:
+        # Imported here so the in-memory path never pays for moviepy's import.
+        from moviepy.editor import AudioFileClip, VideoFileClip
+
         logger.info(f"Extracting audio from {video_path}")
+        if os.path.splitext(video_path)[1].lower() in AUDIO_ONLY_EXTENSIONS:
+            # Audio-only downloads have no video stream for VideoFileClip to open.
+            audio_clip = _trim_clip(AudioFileClip(video_path), start_offset, max_duration)
+            audio_clip.write_audiofile(output_audio_path, codec='pcm_s16le', logger=None)
+            audio_clip.close()
+            logger.info(f"Successfully extracted audio to: {output_audio_path}")
+            return output_audio_path
+
         video_clip = VideoFileClip(video_path)
-        
+
         # Check if video has an audio track
         if video_clip.audio is None:
             logger.warning(f"The video at {video_path} has no audio track.")
             video_clip.close()
             return None
-            
-        audio_clip = video_clip.audio
+
+        audio_clip = _trim_clip(video_clip.audio, start_offset, max_duration)
         audio_clip.write_audiofile(output_audio_path, codec='pcm_s16le', logger=None)
-        
+
         video_clip.close()
         audio_clip.close()
-        
+
         logger.info(f"Successfully extracted audio to: {output_audio_path}")
         return output_audio_path
     except Exception as e:
         logger.error(f"Failed to extract audio from {video_path}. Error: {e}")
         if 'video_clip' in locals() and video_clip:
             video_clip.close()
-        return None
\ No newline at end of file
+        elif 'audio_clip' in locals() and audio_clip:
+            audio_clip.close()
+        return None
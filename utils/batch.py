@@ -0,0 +1,332 @@
+# rem_accent_checker/utils/batch.py
+"""
+Bulk analysis: a list of URLs or local media files in, a results file out.
+
+Sources are downloaded and decoded concurrently, classified in mini-batches, and
+each batch's rows are appended to the output as soon as it is scored. Sources that
+already have an 'ok' row in the output are skipped, so an interrupted run resumes
+where it stopped. Sources whose rows are all errors are tried again, and a retry
+appends a new row after the old error row.
+
+    python -m utils.batch urls.txt -o results.csv [--workers 4] [--batch-size 16]
+    python -m utils.batch urls.csv -o results.parquet --max-duration 60
+
+The input is a text file with one URL or path per line ('#' starts a comment) or a
+CSV file with a 'url' column (else the first column). A `.parquet` output is a
+directory of part files, one per batch, readable with `pandas.read_parquet`.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from .audio_utils import extract_audio_array, load_media_audio
+from .downloader import download_video
+from .scratch import get_scratch_space
+from .vad import MIN_SPEECH_SECONDS, trim_silence
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_DOWNLOAD_WORKERS = 4
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_MAX_DURATION = 60.0
+RESULT_COLUMNS = ["source", "status", "label", "score", "predictions", "speech_seconds", "error"]
+
+def read_sources(path: str) -> List[str]:
+    """
+    Reads the URLs/paths to analyze from a text or CSV file, dropping blanks and duplicates.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.reader(f))
+            if not rows:
+                return []
+            header = [cell.strip().lower() for cell in rows[0]]
+            column = header.index("url") if "url" in header else 0
+            has_header = "url" in header or not _looks_like_source(rows[0][0])
+            values = [row[column] for row in rows[1 if has_header else 0:] if len(row) > column]
+        else:
+            values = [line for line in f if not line.lstrip().startswith("#")]
+    sources = []
+    for value in (v.strip() for v in values):
+        if value and value not in sources:
+            sources.append(value)
+    return sources
+
+def _looks_like_source(value: str) -> bool:
+    value = value.strip()
+    return "://" in value or os.path.exists(value)
+
+class CsvResultWriter:
+    """Appends result rows to a CSV file, flushing after every batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        exists = os.path.isfile(path) and os.path.getsize(path) > 0
+        self._file = open(path, "a", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=RESULT_COLUMNS)
+        if not exists:
+            self._writer.writeheader()
+
+    @staticmethod
+    def completed_sources(path: str) -> Set[str]:
+        """The sources with an 'ok' row; failed ones are not done."""
+        if not os.path.isfile(path):
+            return set()
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return {row["source"] for row in csv.DictReader(f) if row.get("source") and row.get("status") == "ok"}
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._writer.writerows(rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+class ParquetResultWriter:
+    """Writes each batch of result rows as a new part file in a Parquet dataset directory."""
+
+    def __init__(self, path: str):
+        import pyarrow as pa
+
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._next_part = len(glob.glob(os.path.join(path, "part-*.parquet")))
+        self._schema = pa.schema([
+            ("source", pa.string()), ("status", pa.string()), ("label", pa.string()),
+            ("score", pa.float64()), ("predictions", pa.string()), ("speech_seconds", pa.float64()),
+            ("error", pa.string()),
+        ])
+
+    @staticmethod
+    def completed_sources(path: str) -> Set[str]:
+        """The sources with an 'ok' row; failed ones are not done."""
+        import pyarrow.parquet as pq
+
+        sources: Set[str] = set()
+        for part in glob.glob(os.path.join(path, "part-*.parquet")):
+            table = pq.read_table(part, columns=["source", "status"])
+            sources.update(
+                source for source, status in zip(table.column("source").to_pylist(), table.column("status").to_pylist())
+                if status == "ok"
+            )
+        return sources
+
+    def write(self, rows: List[Dict[str, Any]]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(rows, schema=self._schema)
+        part_path = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        # Written under a temporary name so a crash never leaves a truncated part behind.
+        pq.write_table(table, f"{part_path}.tmp")
+        os.replace(f"{part_path}.tmp", part_path)
+        self._next_part += 1
+
+    def close(self):
+        pass
+
+def _writer_class(output_path: str):
+    return ParquetResultWriter if output_path.lower().endswith(".parquet") else CsvResultWriter
+
+def _load_source(source: str, start_offset: float, max_duration: Optional[float]) -> Tuple[Any, Optional[str]]:
+    """
+    Fetches and decodes one source, then trims silence.
+
+    Returns:
+        Tuple[Optional[np.ndarray], Optional[str]]: The speech waveform, or None and an error message.
+    """
+    scratch = None
+    try:
+        if os.path.isfile(source):
+            waveform = load_media_audio(source, start_offset=start_offset, max_duration=max_duration)
+        else:
+            # Waits while other downloads (batch or interactive) use up the scratch quota.
+            scratch = get_scratch_space().acquire(prefix="accent_batch_")
+            media_path = download_video(
+                source, scratch.path, audio_only=True, start_offset=start_offset, max_duration=max_duration
+            )
+            if not media_path:
+                return None, "download failed"
+            # The download already starts at start_offset; decoding stops at the window end.
+            waveform = extract_audio_array(media_path, max_duration=max_duration)
+            scratch.release()
+        if waveform is None:
+            return None, "no audio track"
+        waveform, vad_stats = trim_silence(waveform)
+        if vad_stats["kept_seconds"] < MIN_SPEECH_SECONDS:
+            return None, f"too little speech ({vad_stats['kept_seconds']:.1f}s)"
+        return waveform, None
+    except Exception as e:
+        logger.error(f"Failed to load {source}. Error: {e}")
+        return None, str(e)
+    finally:
+        if scratch is not None:
+            scratch.release()
+
+def _error_row(source: str, error: str) -> Dict[str, Any]:
+    return {"source": source, "status": "error", "label": None, "score": None,
+            "predictions": None, "speech_seconds": None, "error": error}
+
+def run_batch(
+    sources: List[str],
+    classifier,
+    output_path: str,
+    download_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    top_k: int = 5,
+    start_offset: float = 0.0,
+    max_duration: Optional[float] = DEFAULT_MAX_DURATION,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Analyzes many sources, appending one result row per source to `output_path`.
+
+    Up to `download_workers` sources are fetched and decoded at once while the
+    model scores the ones that are ready, `batch_size` clips per `classify_batch`
+    call. Sources with an 'ok' row in the output are skipped; failed ones are retried.
+
+    Args:
+        sources (List[str]): URLs and/or local media paths.
+        classifier: An AccentClassifier or an InferenceClient.
+        output_path (str): A .csv file or a .parquet dataset directory.
+        download_workers (int): Concurrent downloads/decodes.
+        batch_size (int): Clips per inference call.
+        top_k (int): Predictions stored per source.
+        start_offset (float): Seconds skipped at the start of each source.
+        max_duration (Optional[float]): Seconds analyzed per source; None for all.
+        progress_callback (Optional[Callable[[int, int], None]]): Called with (rows written, rows to write).
+
+    Returns:
+        Dict[str, Any]: A summary with counts, elapsed seconds and throughput.
+    """
+    writer_class = _writer_class(output_path)
+    completed = writer_class.completed_sources(output_path)
+    pending = [s for s in sources if s not in completed]
+    skipped = len(sources) - len(pending)
+    if skipped:
+        logger.info(f"Resuming: {skipped} of {len(sources)} sources already have results.")
+
+    start = time.perf_counter()
+    summary = {"total": len(sources), "skipped": skipped, "succeeded": 0, "failed": 0, "speech_seconds": 0.0}
+    writer = writer_class(output_path)
+    ready: List[Tuple[str, Any]] = []
+
+    def flush(rows: List[Dict[str, Any]]):
+        writer.write(rows)
+        done = summary["succeeded"] + summary["failed"]
+        if progress_callback:
+            progress_callback(done, len(pending))
+
+    def classify_ready():
+        batch = ready[:batch_size]
+        del ready[:batch_size]
+        results = classifier.classify_batch([waveform for _, waveform in batch], top_k=top_k)
+        rows = []
+        for (source, waveform), predictions in zip(batch, results):
+            if not predictions:
+                summary["failed"] += 1
+                rows.append(_error_row(source, "classification failed"))
+                continue
+            speech_seconds = waveform.shape[0] / classifier.sample_rate
+            summary["succeeded"] += 1
+            summary["speech_seconds"] += speech_seconds
+            rows.append({
+                "source": source, "status": "ok", "label": predictions[0]["label"],
+                "score": predictions[0]["score"], "predictions": json.dumps(predictions),
+                "speech_seconds": round(speech_seconds, 2), "error": None,
+            })
+        flush(rows)
+
+    try:
+        with ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="batch-load") as executor:
+            queued = iter(pending)
+            in_flight: Dict[Future, str] = {}
+            # Keep a bounded number of decoded clips in memory: the loads running plus one batch.
+            while True:
+                while len(in_flight) + len(ready) < download_workers + batch_size:
+                    source = next(queued, None)
+                    if source is None:
+                        break
+                    in_flight[executor.submit(_load_source, source, start_offset, max_duration)] = source
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                errors = []
+                for future in finished:
+                    source = in_flight.pop(future)
+                    waveform, error = future.result()
+                    if waveform is None:
+                        summary["failed"] += 1
+                        errors.append(_error_row(source, error))
+                    else:
+                        ready.append((source, waveform))
+                if errors:
+                    flush(errors)
+                # Several loads can finish together; never send more than batch_size clips.
+                while len(ready) >= batch_size:
+                    classify_ready()
+            while ready:
+                classify_ready()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    processed = summary["succeeded"] + summary["failed"]
+    summary.update({
+        "elapsed_seconds": elapsed,
+        "sources_per_second": processed / elapsed if elapsed else 0.0,
+        "realtime_factor": summary["speech_seconds"] / elapsed if elapsed else 0.0,
+    })
+    logger.info(
+        f"Batch finished: {summary['succeeded']} ok, {summary['failed']} failed, "
+        f"{skipped} skipped in {elapsed:.1f}s."
+    )
+    return summary
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """Renders a `run_batch` summary as a short human-readable report."""
+    return (
+        f"Sources: {summary['total']} ({summary['skipped']} already done)\n"
+        f"Succeeded: {summary['succeeded']}  Failed: {summary['failed']}\n"
+        f"Elapsed: {summary['elapsed_seconds']:.1f}s  "
+        f"Throughput: {summary['sources_per_second']:.2f} sources/s, "
+        f"{summary['realtime_factor']:.1f}x realtime ({summary['speech_seconds']:.0f}s of speech)"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="A .txt (one URL/path per line) or .csv file of sources.")
+    parser.add_argument("-o", "--output", required=True, help="A .csv file or a .parquet dataset directory.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_DOWNLOAD_WORKERS, help="Concurrent downloads.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Clips per inference call.")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--start-offset", type=float, default=0.0)
+    parser.add_argument("--max-duration", type=float, default=DEFAULT_MAX_DURATION, help="0 analyzes everything.")
+    args = parser.parse_args()
+
+    inference_url = os.environ.get("ACCENT_INFERENCE_URL")
+    if inference_url:
+        from .inference_client import InferenceClient
+        classifier = InferenceClient(inference_url, max_pending=args.batch_size)
+    else:
+        from .classifier import AccentClassifier
+        classifier = AccentClassifier()
+
+    sources = read_sources(args.input)
+    summary = run_batch(
+        sources, classifier, args.output,
+        download_workers=args.workers, batch_size=args.batch_size, top_k=args.top_k,
+        start_offset=args.start_offset, max_duration=args.max_duration or None,
+        progress_callback=lambda done, total: print(f"\r{done}/{total} done", end="", flush=True),
+    )
+    print()
+    print(format_summary(summary))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# rem_accent_checker/utils/bundle.py
+"""
+Builds and loads a single-file, offline model bundle.
+
+`hyperparams.yaml` makes SpeechBrain's pretrainer fetch the ECAPA embedding model
+from Hugging Face on first start. The bundle instead holds the merged weights of
+every module, the label map and the hyperparameters in one `torch.save` file. It
+loads with `mmap=True`, so weights are paged in lazily from disk (and shared
+between processes) with no network access.
+
+Build it once, on a machine with network access:
+    python -m utils.bundle [--model-dir utils/accent_id_model_clean] [--output PATH]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import torch
+from typing import Dict, Optional, Tuple
+from hyperpyyaml import load_hyperpyyaml
+from speechbrain.inference import EncoderClassifier
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "accent_id_model_clean")
+BUNDLE_FILENAME = "accent_id_bundle.pt"
+BUNDLE_FORMAT_VERSION = 1
+# Modules with learned weights; features and sentence normalization have none.
+BUNDLED_MODULES = ("embedding_model", "classifier")
+
+def default_bundle_path(model_dir: str = MODEL_DIR) -> str:
+    """Returns where the bundle for `model_dir` is written and looked up by default."""
+    return os.path.join(model_dir, BUNDLE_FILENAME)
+
+def write_bundle(
+    modules: Dict[str, torch.nn.Module],
+    ind2lab: Dict[int, str],
+    hyperparams_text: str,
+    output_path: str,
+) -> str:
+    """
+    Saves module weights, labels and hyperparameters as one bundle file.
+
+    Args:
+        modules (Dict[str, torch.nn.Module]): Must contain BUNDLED_MODULES.
+        ind2lab (Dict[int, str]): The label encoder's index -> label map.
+        hyperparams_text (str): The hyperparams.yaml used to rebuild the modules.
+        output_path (str): Where to write the bundle.
+
+    Returns:
+        str: The output path.
+    """
+    labels = {int(i): str(label) for i, label in ind2lab.items()}
+    state_dicts = {
+        name: {k: v.detach().cpu().contiguous() for k, v in modules[name].state_dict().items()}
+        for name in BUNDLED_MODULES
+    }
+
+    # Hashed once here so loading never has to read the whole file to identify the model.
+    digest = hashlib.sha256(hyperparams_text.encode("utf-8"))
+    digest.update(json.dumps(labels, sort_keys=True).encode("utf-8"))
+    for name in BUNDLED_MODULES:
+        for key, tensor in sorted(state_dicts[name].items()):
+            digest.update(f"{name}.{key}".encode("utf-8"))
+            digest.update(tensor.numpy().tobytes())
+
+    bundle = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "model_version": digest.hexdigest()[:16],
+        "hyperparams": hyperparams_text,
+        "labels": labels,
+        "state_dicts": state_dicts,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    temp_path = f"{output_path}.tmp"
+    torch.save(bundle, temp_path)
+    os.replace(temp_path, output_path)
+    logger.info(f"Wrote model bundle ({os.path.getsize(output_path) / 1e6:.1f} MB) to: {output_path}")
+    return output_path
+
+def build_bundle(model_dir: str = MODEL_DIR, output_path: Optional[str] = None) -> str:
+    """
+    Loads the SpeechBrain model the usual way (fetching pretrained weights if needed)
+    and writes it out as a bundle.
+    """
+    output_path = output_path or default_bundle_path(model_dir)
+    logger.info(f"Loading SpeechBrain model from: {model_dir}")
+    classifier = EncoderClassifier.from_hparams(source=model_dir, savedir=model_dir)
+    with open(os.path.join(model_dir, "hyperparams.yaml"), "r", encoding="utf-8") as f:
+        hyperparams_text = f.read()
+    return write_bundle(classifier.mods, classifier.hparams.label_encoder.ind2lab, hyperparams_text, output_path)
+
+def load_bundle(path: str) -> Tuple[EncoderClassifier, Dict[int, str], str]:
+    """
+    Rebuilds the classifier from a bundle without any network access.
+
+    Returns:
+        Tuple[EncoderClassifier, Dict[int, str], str]: The ready-to-use model, its
+        label map and the model version recorded when the bundle was built.
+    """
+    bundle = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    if bundle.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model bundle format: {bundle.get('format_version')}")
+
+    hparams = load_hyperpyyaml(bundle["hyperparams"])
+    for name in BUNDLED_MODULES:
+        # assign=True keeps the memory-mapped tensors instead of copying into fresh ones.
+        hparams[name].load_state_dict(bundle["state_dicts"][name], assign=True)
+    classifier = EncoderClassifier(modules=hparams["modules"], hparams=hparams)
+    return classifier, bundle["labels"], bundle["model_version"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="SpeechBrain model directory with hyperparams.yaml.")
+    parser.add_argument("--output", default=None, help=f"Bundle path (default: <model-dir>/{BUNDLE_FILENAME}).")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = build_bundle(args.model_dir, args.output)
+    print(f"Bundle written to {path} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
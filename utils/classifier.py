@@ -1,40 +1,203 @@
 # rem_accent_checker/utils/classifier.py
+"""
+Accent classification with the local SpeechBrain model.
+
+Batching, windowing and scoring work on NumPy arrays; only the engine touches its
+framework. torch, torchaudio and SpeechBrain are imported when the torch engine
+loads, so a process running the onnx engine needs just NumPy and onnxruntime.
+"""
+import hashlib
 import os
-import torch
-from speechbrain.inference import EncoderClassifier
-from typing import Dict, List, Any
+import threading
+import time
+import numpy as np
+from typing import TYPE_CHECKING, Dict, Iterator, List, Any, Optional, Sequence, Tuple, Union
+from .audio_utils import load_media_audio, stream_audio_chunks
+from .embedding_store import EmbeddingStore, audio_content_hash
+from .metrics import span
+from .onnx_engine import OnnxEngine, default_onnx_dir
 from .logger import get_logger
 
+if TYPE_CHECKING:
+    import torch
+
 logger = get_logger(__name__)
 
+# An item accepted by the batch API: a path to an audio file, or a mono
+# waveform (tensor or float32 array) already sampled at the model's rate (16 kHz).
+AudioInput = Union[str, "torch.Tensor", np.ndarray]
+
+# Inference engines: "torch" runs the SpeechBrain modules, "onnx" an export made with
+# `python -m utils.onnx_export` through onnxruntime (see utils/onnx_engine.py).
+ENGINES = ("torch", "onnx")
+
 class AccentClassifier:
     """
     A class to handle accent classification using a local SpeechBrain model.
     """
-    def __init__(self):
+    # Upper bound on the padded audio (in seconds) sent through the model in a
+    # single forward pass. Keeps batch memory predictable regardless of clip count.
+    DEFAULT_MAX_BATCH_SECONDS = 120.0
+
+    # How many forward passes may run at once on the shared model. Requests beyond
+    # this wait for a free slot instead of oversubscribing the CPU.
+    DEFAULT_MAX_CONCURRENT_INFERENCES = 2
+
+    # Sliding-window defaults for `classify_segments`.
+    DEFAULT_WINDOW_SECONDS = 6.0
+    DEFAULT_HOP_SECONDS = 3.0
+    DEFAULT_SEGMENT_BATCH_SIZE = 16
+
+    # Files whose contents define the model's predictions; hashed into `model_version`.
+    MODEL_FILES = ("hyperparams.yaml", "embedding_model.ckpt", "classifier.ckpt", "label_encoder.ckpt")
+
+    def __init__(
+        self,
+        max_concurrent_inferences: int = DEFAULT_MAX_CONCURRENT_INFERENCES,
+        embedding_store: Optional[EmbeddingStore] = None,
+        bundle_path: Optional[str] = None,
+        quantize: Optional[str] = None,
+        num_threads: Optional[int] = None,
+        engine: Optional[str] = None,
+        onnx_dir: Optional[str] = None,
+    ):
         """
         Initializes the classifier by loading the local SpeechBrain model.
+
+        If an offline model bundle exists (see `utils.bundle`), it is memory-mapped
+        and used without any network access. Otherwise the model is loaded through
+        `EncoderClassifier.from_hparams`, which may fetch pretrained weights.
+
+        Args:
+            max_concurrent_inferences (int): Number of threads allowed to run the model
+                at the same time. The instance is safe to share across threads.
+            embedding_store (Optional[EmbeddingStore]): If given, embeddings are looked
+                up by audio content hash before running the TDNN, and new ones are saved.
+            bundle_path (Optional[str]): The bundle to load. Defaults to $ACCENT_MODEL_BUNDLE,
+                then to the bundle inside the model directory if present. Set
+                ACCENT_MODEL_BUNDLE=off to always load from hyperparams.yaml.
+            quantize (Optional[str]): "int8" runs the ECAPA-TDNN with dynamically quantized
+                int8 weights (CPU only). Defaults to $ACCENT_CLASSIFIER_QUANTIZE; unset means fp32.
+            num_threads (Optional[int]): Intra-op threads for torch. Defaults to
+                $ACCENT_CLASSIFIER_THREADS; unset keeps torch's default. Note this is process-wide.
+            engine (Optional[str]): "torch" (default) or "onnx". Defaults to $ACCENT_CLASSIFIER_ENGINE.
+                The onnx engine loads no SpeechBrain modules and cannot be combined with `quantize`.
+            onnx_dir (Optional[str]): The ONNX export to run. Defaults to $ACCENT_ONNX_DIR,
+                then to the `onnx` directory inside the model directory.
         """
+        self.max_concurrent_inferences = max_concurrent_inferences
+        self._inference_slots = threading.BoundedSemaphore(max_concurrent_inferences)
+        self.embedding_store = embedding_store
+        self.engine = engine or os.environ.get("ACCENT_CLASSIFIER_ENGINE") or "torch"
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{self.engine}'. Supported: {', '.join(ENGINES)}.")
+        self.onnx_engine: Optional[OnnxEngine] = None
+        # Set when the weights are memory-mapped from an offline bundle.
+        self.bundle_path: Optional[str] = None
+
+        num_threads = num_threads or int(os.environ.get("ACCENT_CLASSIFIER_THREADS", 0)) or None
+
         model_dir = os.path.join(os.path.dirname(__file__), "accent_id_model_clean")
-        
+
         if not os.path.isdir(model_dir):
             error_msg = f"Model directory not found at '{model_dir}'. Please ensure it is in 'utils/accent_id_model_clean'."
             logger.error(error_msg)
             raise FileNotFoundError(error_msg)
-            
+
+        if self.engine == "onnx":
+            onnx_dir = onnx_dir or os.environ.get("ACCENT_ONNX_DIR") or default_onnx_dir(model_dir)
+            self._load_onnx_engine(onnx_dir, quantize, num_threads)
+            return
+        self._load_torch_model(model_dir, bundle_path, quantize, num_threads)
+
+    def _load_torch_model(
+        self, model_dir: str, bundle_path: Optional[str], quantize: Optional[str], num_threads: Optional[int],
+    ):
+        """Loads the SpeechBrain modules, from the offline bundle if there is one."""
+        import torch
+        from speechbrain.inference import EncoderClassifier
+        from .bundle import default_bundle_path, load_bundle
+        from .quantization import quantize_module
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+            logger.info(f"Using {num_threads} intra-op threads for inference.")
+
+        bundle_path = bundle_path or os.environ.get("ACCENT_MODEL_BUNDLE") or default_bundle_path(model_dir)
+        use_bundle = bundle_path.lower() != "off" and os.path.isfile(bundle_path)
+
         try:
-            logger.info(f"Loading SpeechBrain model from: {model_dir}")
-            self.classifier = EncoderClassifier.from_hparams(source=model_dir, savedir=model_dir)
-            self.ind2lab = self.classifier.hparams.label_encoder.ind2lab
-            logger.info("SpeechBrain model loaded successfully.")
+            if use_bundle:
+                logger.info(f"Loading offline model bundle from: {bundle_path}")
+                self.classifier, self.ind2lab, self.model_version = load_bundle(bundle_path)
+                self.bundle_path = bundle_path
+            else:
+                logger.info(f"Loading SpeechBrain model from: {model_dir}")
+                self.classifier = EncoderClassifier.from_hparams(source=model_dir, savedir=model_dir)
+                self.ind2lab = self.classifier.hparams.label_encoder.ind2lab
+                self.model_version = self._hash_model_files(model_dir)
+            self.quantize = quantize or os.environ.get("ACCENT_CLASSIFIER_QUANTIZE") or None
+            if self.quantize:
+                self.classifier.mods.embedding_model = quantize_module(
+                    self.classifier.mods.embedding_model, self.quantize
+                )
+                self.model_version = f"{self.model_version}-{self.quantize}"
+            logger.info(f"SpeechBrain model loaded successfully (version {self.model_version}).")
         except Exception as e:
             logger.error(f"Failed to load SpeechBrain model. Error: {e}")
             raise RuntimeError(f"Could not initialize AccentClassifier: {e}")
 
+    def _load_onnx_engine(self, onnx_dir: str, quantize: Optional[str], num_threads: Optional[int]):
+        """Sets the classifier up to run an ONNX export instead of the SpeechBrain modules."""
+        if quantize or os.environ.get("ACCENT_CLASSIFIER_QUANTIZE"):
+            raise ValueError("The onnx engine does not support quantization; use the torch engine.")
+        try:
+            logger.info(f"Loading ONNX model from: {onnx_dir}")
+            self.onnx_engine = OnnxEngine(onnx_dir, num_threads=num_threads)
+        except Exception as e:
+            logger.error(f"Failed to load ONNX model. Error: {e}")
+            raise RuntimeError(f"Could not initialize AccentClassifier: {e}")
+        self.classifier = None
+        self.quantize = None
+        self.ind2lab = self.onnx_engine.labels
+        self.model_version = f"{self.onnx_engine.model_version}-onnx"
+        logger.info(f"ONNX model loaded successfully (version {self.model_version}).")
+
+    @classmethod
+    def _hash_model_files(cls, model_dir: str) -> str:
+        """Returns a short content hash of the checkpoint files present in `model_dir`."""
+        digest = hashlib.sha256()
+        for name in cls.MODEL_FILES:
+            path = os.path.join(model_dir, name)
+            if not os.path.isfile(path):
+                continue
+            digest.update(name.encode("utf-8"))
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        return digest.hexdigest()[:16]
+
+    @property
+    def embedding_dim(self) -> int:
+        """The size of the ECAPA embedding (`emb_dim` in hyperparams.yaml)."""
+        if self.onnx_engine is not None:
+            return self.onnx_engine.embedding_dim
+        return self.classifier.hparams.emb_dim
+
+    @property
+    def sample_rate(self) -> int:
+        """The sample rate (Hz) the model expects its input waveforms at."""
+        if self.onnx_engine is not None:
+            return self.onnx_engine.sample_rate
+        return self.classifier.audio_normalizer.sample_rate
+
     def classify_audio(self, audio_path: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Classifies the accent from an audio file.
 
+        The file is decoded and resampled in-process, so the working directory is never
+        touched and concurrent calls from different sessions cannot interfere.
+
         Args:
             audio_path (str): The full, absolute path to the audio file (.wav).
             top_k (int): The number of top predictions to return.
@@ -45,40 +208,406 @@ class AccentClassifier:
         if not os.path.isfile(audio_path):
             logger.error(f"Audio file not found for classification: {audio_path}")
             return []
-            
-        # --- START: ROBUST PATH HANDLING FIX FOR WINDOWS ---
-        original_cwd = os.getcwd()  # Save the current working directory
-        audio_dir = os.path.dirname(audio_path)
-        audio_filename = os.path.basename(audio_path)
-        
-        try:
-            os.chdir(audio_dir)  # Temporarily change to the audio file's directory
-            logger.info(f"Classifying audio file: {audio_filename} (from directory: {audio_dir})")
-            
-            # Now, classify using only the filename. SpeechBrain will look in the current directory.
-            out_prob, score, index, text_lab = self.classifier.classify_file(audio_filename)
-            
-            # --- END: ROBUST PATH HANDLING FIX ---
-
-            probabilities = out_prob.squeeze()
-            top_k_scores, top_k_indices = torch.topk(probabilities, k=top_k)
-
-            results = []
-            for i in range(top_k):
-                label_index = top_k_indices[i].item()
-                label_score = top_k_scores[i].item()
-                label_name = self.ind2lab[label_index]
-                
-                results.append({
-                    "label": label_name.replace("_", " ").title(),
-                    "score": label_score,
-                })
-            
+
+        logger.info(f"Classifying audio file: {audio_path}")
+        with span("classify_audio", bytes=os.path.getsize(audio_path)) as s:
+            results = self.classify_batch([audio_path], top_k=top_k)[0]
+            if not results:
+                s["status"] = "error"
+        if results:
+            logger.info(f"Classification successful. Top prediction: {results[0]['label']} ({results[0]['score']:.2f})")
+        return results
+
+    def classify_waveform(self, waveform: Union["torch.Tensor", np.ndarray], top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Classifies the accent from an in-memory mono waveform sampled at 16 kHz.
+
+        Args:
+            waveform (Union[torch.Tensor, np.ndarray]): 1-D float samples, e.g. from
+                `extract_audio_array`. float32 NumPy input is used without copying.
+            top_k (int): The number of top predictions to return.
+
+        Returns:
+            A list of dictionaries with 'label' and 'score'.
+        """
+        results = self.classify_batch([waveform], top_k=top_k)[0]
+        if results:
             logger.info(f"Classification successful. Top prediction: {results[0]['label']} ({results[0]['score']:.2f})")
-            return results
+        return results
+
+    def classify_batch(
+        self,
+        items: Sequence[AudioInput],
+        top_k: int = 5,
+        max_batch_seconds: float = DEFAULT_MAX_BATCH_SECONDS,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Classifies many clips, running the model once per mini-batch instead of once per file.
+
+        Clips are sorted by length and grouped so that the padded audio in each
+        mini-batch stays under `max_batch_seconds`. Padding is masked out through
+        SpeechBrain's relative lengths (`wav_lens`).
+
+        Args:
+            items (Sequence[Union[str, torch.Tensor, np.ndarray]]): Audio file paths
+                and/or mono 16 kHz waveforms (1-D tensors or float32 arrays).
+            top_k (int): The number of top predictions to return per clip.
+            max_batch_seconds (float): Budget of padded audio seconds per forward pass.
+
+        Returns:
+            One list of {'label', 'score'} dictionaries per input, in input order.
+            An input that could not be loaded or classified gets an empty list.
+        """
+        results: List[List[Dict[str, Any]]] = [[] for _ in items]
+        embeddings = self.embed(items, max_batch_seconds=max_batch_seconds)
+        embedded = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+        if embedded:
+            try:
+                scored = self.classify_embeddings(np.stack([embeddings[i] for i in embedded]), top_k=top_k)
+                for i, item_results in zip(embedded, scored):
+                    results[i] = item_results
+            except Exception as e:
+                logger.error(f"An error occurred while scoring embeddings: {e}")
+
+        logger.info(f"Batch classification finished: {len(embedded)}/{len(items)} clips classified.")
+        return results
+
+    def embed(
+        self,
+        items: Sequence[AudioInput],
+        max_batch_seconds: float = DEFAULT_MAX_BATCH_SECONDS,
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Computes the ECAPA embedding of each clip, batched like `classify_batch`.
+
+        If an `embedding_store` is attached, clips are looked up by audio content hash
+        first and only unseen audio goes through the TDNN; new embeddings are stored.
+
+        Args:
+            items (Sequence[Union[str, torch.Tensor, np.ndarray]]): Audio file paths
+                and/or mono 16 kHz waveforms.
+            max_batch_seconds (float): Budget of padded audio seconds per forward pass.
+
+        Returns:
+            One 1-D float32 array of size `embedding_dim` per input, in input order, or
+            None for an input that could not be loaded or embedded.
+        """
+        embeddings: List[Optional[np.ndarray]] = [None] * len(items)
+        store_keys: Dict[int, str] = {}
 
+        waveforms: Dict[int, np.ndarray] = {}
+        for i, item in enumerate(items):
+            waveform = self._prepare_waveform(item)
+            if waveform is None or waveform.size == 0:
+                continue
+            if self.embedding_store is not None:
+                key = audio_content_hash(waveform)
+                stored = self.embedding_store.get(key)
+                if stored is not None:
+                    embeddings[i] = stored
+                    continue
+                store_keys[i] = key
+            waveforms[i] = waveform
+
+        max_batch_samples = int(max_batch_seconds * self.sample_rate)
+        for batch_indices in self._plan_batches(waveforms, max_batch_samples):
+            try:
+                wavs, wav_lens = self._pad_batch([waveforms[i] for i in batch_indices])
+                batch_embeddings = self._encode(wavs, wav_lens)
+                for row, i in enumerate(batch_indices):
+                    embeddings[i] = batch_embeddings[row]
+                    if i in store_keys:
+                        self.embedding_store.put(store_keys[i], batch_embeddings[row])
+            except Exception as e:
+                logger.error(f"An error occurred during batched SpeechBrain embedding: {e}")
+
+        if self.embedding_store is not None:
+            reused = sum(1 for e in embeddings if e is not None) - len(waveforms)
+            logger.info(f"Embedding store reused {max(reused, 0)} embeddings and computed {len(waveforms)}.")
+        return embeddings
+
+    def classify_embeddings(
+        self,
+        embeddings: Union["torch.Tensor", np.ndarray],
+        top_k: int = 5,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Scores precomputed embeddings with the classifier head only (no audio, no TDNN).
+
+        Args:
+            embeddings (Union[torch.Tensor, np.ndarray]): An [n, embedding_dim] matrix,
+                e.g. from `embed` or `EmbeddingStore.matrix()`, or a single 1-D embedding.
+            top_k (int): The number of top predictions to return per embedding.
+
+        Returns:
+            One list of {'label', 'score'} dictionaries per embedding row.
+        """
+        # Copied: store matrices are read-only views that torch cannot share.
+        embeddings = np.array(embeddings, dtype=np.float32)
+        scores = self._score(embeddings.reshape(-1, embeddings.shape[-1]))
+        return [self._top_k_results(row, top_k) for row in scores]
+
+    def classify_segments(
+        self,
+        audio: AudioInput,
+        top_k: int = 5,
+        window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        hop_seconds: float = DEFAULT_HOP_SECONDS,
+        aggregation: str = "mean_log_prob",
+        batch_size: int = DEFAULT_SEGMENT_BATCH_SIZE,
+    ) -> Dict[str, Any]:
+        """
+        Classifies fixed-length sliding windows of a clip and aggregates them.
+
+        Only `batch_size` windows go through the model at once, and a file is decoded
+        in blocks as the windows are needed (see `_iter_windows`), so peak memory does
+        not grow with the clip length. A timeline shows where the accent changes.
+
+        Args:
+            audio (Union[str, torch.Tensor, np.ndarray]): An audio file path or a mono 16 kHz waveform.
+            top_k (int): The number of overall predictions to return.
+            window_seconds (float): Length of each window.
+            hop_seconds (float): Step between window starts.
+            aggregation (str): "mean_log_prob" ranks labels by their mean log-probability
+                across windows. It differs from the mean score only by a per-window
+                constant, so the mean score is reported to keep `classify_audio`'s scale.
+                "vote" gives each window one vote for its top label, weighted by that
+                label's score, and reports each label's share of the votes.
+            batch_size (int): Windows per forward pass.
+
+        Returns:
+            A dictionary with 'top_k' (overall [{'label', 'score'}]) and 'segments'
+            (one {'start', 'end', 'label', 'score', 'scores'} per window, times in
+            seconds, 'scores' holding the overall top-k labels). Empty lists on failure.
+        """
+        if aggregation not in ("mean_log_prob", "vote"):
+            raise ValueError(f"Unknown aggregation '{aggregation}'. Use 'mean_log_prob' or 'vote'.")
+
+        window = max(1, int(window_seconds * self.sample_rate))
+        hop = max(1, int(hop_seconds * self.sample_rate))
+        spans: List[Tuple[int, int]] = []
+        try:
+            segment_scores = []
+            batch: List[np.ndarray] = []
+            for start, samples in self._iter_windows(audio, window, hop):
+                spans.append((start, start + samples.shape[0]))
+                batch.append(samples)
+                if len(batch) == batch_size:
+                    segment_scores.append(self._score(self._encode(np.stack(batch), np.ones(len(batch), np.float32))))
+                    batch = []
+            if batch:
+                segment_scores.append(self._score(self._encode(np.stack(batch), np.ones(len(batch), np.float32))))
         except Exception as e:
-            logger.error(f"An error occurred during SpeechBrain classification: {e}")
-            return []
-        finally:
-            os.chdir(original_cwd) # IMPORTANT: Always change back to the original directory
\ No newline at end of file
+            logger.error(f"An error occurred during segmented SpeechBrain classification: {e}")
+            return {"top_k": [], "segments": []}
+        if not segment_scores:
+            return {"top_k": [], "segments": []}
+        scores = np.concatenate(segment_scores)
+
+        if aggregation == "mean_log_prob":
+            shifted = scores - scores.max(axis=-1, keepdims=True)
+            log_probs = shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+            ranking = log_probs.mean(axis=0)
+            reported = scores.mean(axis=0)
+        else:
+            best_indices = scores.argmax(axis=-1)
+            reported = np.zeros(scores.shape[-1], dtype=np.float32)
+            np.add.at(reported, best_indices, np.clip(scores[np.arange(len(scores)), best_indices], 0, None))
+            reported = reported / max(reported.sum(), 1e-12)
+            ranking = reported
+
+        top_indices = self._top_indices(ranking, top_k)
+        overall = [{"label": self._display_label(i), "score": reported[i].item()} for i in top_indices]
+
+        segments = []
+        for (start, end), row in zip(spans, scores):
+            best = int(np.argmax(row))
+            segments.append({
+                "start": start / self.sample_rate,
+                "end": end / self.sample_rate,
+                "label": self._display_label(best),
+                "score": row[best].item(),
+                "scores": {self._display_label(i): row[i].item() for i in top_indices},
+            })
+
+        logger.info(
+            f"Segmented classification of {len(segments)} windows finished. "
+            f"Top prediction: {overall[0]['label']} ({overall[0]['score']:.2f})"
+        )
+        return {"top_k": overall, "segments": segments}
+
+    def _iter_windows(self, audio: AudioInput, window: int, hop: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yields (start sample, samples) for each sliding window, in order, with the starts
+        of `_window_starts`. A clip shorter than one window is one shorter window.
+
+        A file is decoded by ffmpeg in hop-sized blocks and only the samples a later
+        window still needs are kept, so memory stays about one window however long
+        the file is. If ffmpeg cannot decode it, and for an in-memory waveform, windows
+        are views of the whole waveform.
+        """
+        if isinstance(audio, str) and os.path.isfile(audio):
+            try:
+                yield from self._stream_windows(audio, window, hop)
+                return
+            except RuntimeError as e:
+                # Raised before any audio was decoded (e.g. no ffmpeg): load the file whole.
+                logger.warning(f"Could not stream {audio}; loading it whole. Error: {e}")
+        waveform = self._prepare_waveform(audio)
+        if waveform is None or waveform.size == 0:
+            return
+        for start in self._window_starts(waveform.shape[0], window, hop):
+            yield start, waveform[start:start + window]
+
+    def _stream_windows(self, path: str, window: int, hop: int) -> Iterator[Tuple[int, np.ndarray]]:
+        buffer = np.zeros(0, dtype=np.float32)
+        # Absolute position of buffer[0], and the next window's start.
+        offset = 0
+        next_start = 0
+        last_start = None
+        for block in stream_audio_chunks(path, chunk_seconds=hop / self.sample_rate, sample_rate=self.sample_rate):
+            buffer = np.concatenate([buffer, block])
+            while offset + buffer.shape[0] >= next_start + window:
+                begin = next_start - offset
+                yield next_start, buffer[begin:begin + window].copy()
+                last_start = next_start
+                next_start += hop
+            # Keep what the next window needs, and the last window's worth for a tail window.
+            keep_from = min(next_start, offset + buffer.shape[0] - window)
+            if keep_from > offset:
+                buffer = buffer[keep_from - offset:]
+                offset = keep_from
+        total = offset + buffer.shape[0]
+        if total == 0:
+            return
+        if last_start is None:
+            # Shorter than one window: buffer still holds the whole clip.
+            yield 0, buffer.copy()
+        elif last_start + window < total:
+            yield total - window, buffer[buffer.shape[0] - window:].copy()
+
+    @staticmethod
+    def _window_starts(n_samples: int, window: int, hop: int) -> List[int]:
+        """Start offsets of sliding windows; a final window is aligned to the clip end."""
+        if n_samples <= window:
+            return [0]
+        starts = list(range(0, n_samples - window + 1, hop))
+        if starts[-1] + window < n_samples:
+            starts.append(n_samples - window)
+        return starts
+
+    def _prepare_waveform(self, item: AudioInput) -> Optional[np.ndarray]:
+        """Loads a path into a mono model-rate float32 waveform, or flattens an in-memory one."""
+        if isinstance(item, np.ndarray):
+            return np.asarray(item, dtype=np.float32).reshape(-1)
+        if not isinstance(item, str):
+            # A torch tensor; checked by duck typing so the onnx engine never imports torch.
+            return item.detach().cpu().reshape(-1).float().numpy()
+
+        if not os.path.isfile(item):
+            logger.error(f"Audio file not found for classification: {item}")
+            return None
+        if self.onnx_engine is not None:
+            # Read directly (WAV/FLAC at the model rate) or decoded and resampled by ffmpeg.
+            return load_media_audio(item, sample_rate=self.sample_rate)
+        try:
+            import torchaudio
+
+            # channels_first=False gives [time, channels], the layout AudioNormalizer expects.
+            signal, sr = torchaudio.load(item, channels_first=False)
+            return self.classifier.audio_normalizer(signal, sr).numpy()
+        except Exception as e:
+            logger.error(f"Failed to load audio file {item}. Error: {e}")
+            return None
+
+    @staticmethod
+    def _plan_batches(waveforms: Dict[int, np.ndarray], max_batch_samples: int) -> List[List[int]]:
+        """
+        Groups clip indices into mini-batches whose padded size fits the sample budget.
+
+        Clips are visited from longest to shortest, so each batch's padded length is
+        set by its first clip and similar lengths end up together (little padding).
+        A single clip longer than the budget still gets a batch of its own.
+        """
+        order = sorted(waveforms, key=lambda i: waveforms[i].shape[0], reverse=True)
+        batches: List[List[int]] = []
+        current: List[int] = []
+        padded_len = 0
+        for i in order:
+            if current and padded_len * (len(current) + 1) > max_batch_samples:
+                batches.append(current)
+                current = []
+            if not current:
+                padded_len = waveforms[i].shape[0]
+            current.append(i)
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _pad_batch(waveforms: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-pads waveforms to a [batch, time] array with relative lengths in (0, 1]."""
+        lengths = np.array([w.shape[0] for w in waveforms], dtype=np.float32)
+        max_len = int(lengths.max())
+        wavs = np.zeros((len(waveforms), max_len), dtype=np.float32)
+        for row, waveform in enumerate(waveforms):
+            wavs[row, : waveform.shape[0]] = waveform
+        return wavs, lengths / max_len
+
+    def _encode(self, wavs: np.ndarray, wav_lens: np.ndarray) -> np.ndarray:
+        """
+        Runs features -> normalization -> ECAPA embedding for a padded batch.
+
+        Returns:
+            np.ndarray: Embeddings of shape [batch, embedding_dim].
+        """
+        audio_seconds = float(wav_lens.sum()) * wavs.shape[1] / self.sample_rate
+        engine = "onnx" if self.onnx_engine is not None else "torch"
+        with span("inference", engine=engine, batch_size=wavs.shape[0], audio_seconds=audio_seconds) as s:
+            # Time spent waiting for a free inference slot is the queue wait.
+            wait_start = time.perf_counter()
+            with self._inference_slots:
+                s["queue_wait_seconds"] = time.perf_counter() - wait_start
+                if self.onnx_engine is not None:
+                    lengths = np.round(wav_lens * wavs.shape[1]).astype(np.int64).tolist()
+                    return self.onnx_engine.encode(wavs, lengths)
+                import torch
+
+                with torch.no_grad():
+                    # encode_batch runs compute_features, mean_var_norm and embedding_model.
+                    embeddings = self.classifier.encode_batch(torch.from_numpy(wavs), torch.from_numpy(wav_lens))
+                    return embeddings.squeeze(1).numpy()
+
+    def _score(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Runs the cosine classifier head on [batch, embedding_dim] embeddings.
+
+        Returns:
+            np.ndarray: Class scores of shape [batch, n_labels].
+        """
+        if self.onnx_engine is not None:
+            return self.onnx_engine.score(embeddings)
+        import torch
+
+        with torch.no_grad():
+            scores = self.classifier.mods.classifier(torch.from_numpy(embeddings).unsqueeze(1))
+            return scores.squeeze(1).numpy()
+
+    @staticmethod
+    def _top_indices(scores: np.ndarray, top_k: int) -> List[int]:
+        """Indices of the `top_k` highest scores, best first."""
+        return np.argsort(-scores, kind="stable")[:top_k].tolist()
+
+    def _top_k_results(self, probabilities: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        """Converts one row of class scores into the [{'label', 'score'}] result format."""
+        results = []
+        for label_index in self._top_indices(probabilities, top_k):
+            results.append({
+                "label": self._display_label(label_index),
+                "score": probabilities[label_index].item(),
+            })
+        return results
+
+    def _display_label(self, label_index: int) -> str:
+        """Turns a label index into its display name, e.g. 'us_english' -> 'Us English'."""
+        return self.ind2lab[label_index].replace("_", " ").title()
@@ -1,24 +1,77 @@
 # rem_accent_checker/utils/downloader.py
 import os
+import re
 import sys
-import yt_dlp
 from typing import Optional, Callable, Dict, Any
+from .metrics import span
 from .logger import get_logger
 
 logger = get_logger(__name__)
 
+# Smallest audio-only stream that is still comfortably above 16 kHz speech quality,
+# falling back to any audio stream, then to the smallest muxed file.
+AUDIO_ONLY_FORMAT = 'bestaudio[abr<=64]/bestaudio/worst'
+
+def __getattr__(name: str):
+    # yt-dlp takes a noticeable fraction of a second to import, so it is only loaded
+    # when a download starts; `utils.downloader.yt_dlp` still resolves for callers.
+    if name == "yt_dlp":
+        import yt_dlp
+        return yt_dlp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_clean_youtube_url(url: str) -> Optional[str]:
+    """
+    Takes various YouTube URL formats and returns a standard, embeddable URL.
+    Handles:
+    - youtu.be/VIDEO_ID
+    - youtube.com/watch?v=VIDEO_ID
+    - youtube.com/shorts/VIDEO_ID
+    - And removes extra parameters like ?si=..., &t=...
+    """
+    # Regex to find the 11-character video ID from common YouTube URL patterns
+    match = re.search(r"(?:v=|\/|youtu\.be\/|shorts\/)([a-zA-Z0-9_-]{11})", url)
+    if match:
+        video_id = match.group(1)
+        # Return the standard, clean URL format
+        return f"https://www.youtube.com/watch?v={video_id}"
+    return None # Return None if no valid YouTube ID is found
+
 def download_video(
     url: str,
     output_dir: str,
-    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    audio_only: bool = False,
+    start_offset: float = 0.0,
+    max_duration: Optional[float] = None,
+    format_selector: Optional[str] = None,
 ) -> Optional[str]:
     """
     Downloads a video from a public URL, with retries for network resilience.
+
+    Args:
+        url (str): The public video URL.
+        output_dir (str): Directory to save the downloaded file in.
+        progress_callback (Optional[Callable]): Receives yt-dlp progress dictionaries.
+        audio_only (bool): Fetch only a small audio stream and skip the video
+            download and ffmpeg merge. The returned file (e.g. .m4a/.webm) can be
+            passed to `extract_audio_array` or `extract_audio` as-is.
+        start_offset (float): Seconds into the media to start downloading from.
+        max_duration (Optional[float]): Download at most this many seconds. When a
+            window is set, yt-dlp only fetches that time range (`download_ranges`),
+            so the saved file starts at `start_offset`.
+        format_selector (Optional[str]): A yt-dlp format to use instead of the default,
+            e.g. the cheaper audio format picked by `utils.preflight.AdmissionPolicy`.
+
+    Returns:
+        Optional[str]: The path to the downloaded file, or None on failure.
     """
     if not url:
         logger.error("No URL provided.")
         return None
 
+    import yt_dlp
+
     def hook(d: Dict[str, Any]):
         if progress_callback:
             progress_callback(d)
@@ -26,8 +79,6 @@ def download_video(
     output_template = os.path.join(output_dir, '%(title)s.%(ext)s')
 
     ydl_opts = {
-        'format': 'bestvideo+bestaudio/best',
-        'merge_output_format': 'mp4',
         'outtmpl': output_template,
         'quiet': True,
         'progress_hooks': [hook],
@@ -39,21 +90,82 @@ def download_video(
         'fragment_retries': 10,
         'retries': 10,
     }
+    # Merging streams and cutting a window need ffmpeg; use the one audio_utils decodes with,
+    # which may be imageio-ffmpeg's bundled binary rather than one on PATH.
+    from .audio_utils import _get_ffmpeg_binary
+    ffmpeg = _get_ffmpeg_binary()
+    if ffmpeg:
+        ydl_opts['ffmpeg_location'] = ffmpeg
+    if start_offset > 0 or max_duration is not None:
+        end = start_offset + max_duration if max_duration is not None else float('inf')
+        ydl_opts['download_ranges'] = yt_dlp.utils.download_range_func(None, [(start_offset, end)])
+        logger.info(f"Limiting download to the window {start_offset:.1f}s - {end:.1f}s")
+    if format_selector:
+        ydl_opts['format'] = format_selector
+    elif audio_only:
+        ydl_opts['format'] = AUDIO_ONLY_FORMAT
+    else:
+        ydl_opts['format'] = 'bestvideo+bestaudio/best'
+        ydl_opts['merge_output_format'] = 'mp4'
 
-    try:
-        logger.info(f"Attempting to download video from URL: {url}")
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url, download=True)
-            filename = ydl.prepare_filename(info_dict)
-            logger.info(f"Successfully downloaded video to: {filename}")
-            return filename
-            
-    except yt_dlp.utils.DownloadError as e:
-        logger.warning(f"Could not download video. It may be private, unavailable, or a network issue occurred. Error: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"An unexpected error occurred during download: {e}")
-        return None
+    with span("download", audio_only=audio_only) as s:
+        try:
+            logger.info(f"Attempting to download {'audio' if audio_only else 'video'} from URL: {url}")
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info_dict = ydl.extract_info(url, download=True)
+                filename = ydl.prepare_filename(info_dict)
+                logger.info(f"Successfully downloaded video to: {filename}")
+                if os.path.isfile(filename):
+                    s["bytes"] = os.path.getsize(filename)
+                return filename
+
+        except yt_dlp.utils.DownloadError as e:
+            logger.warning(f"Could not download video. It may be private, unavailable, or a network issue occurred. Error: {e}")
+            s["status"] = "error"
+            return None
+        except Exception as e:
+            logger.error(f"An unexpected error occurred during download: {e}")
+            s["status"] = "error"
+            return None
+
+def resolve_stream_url(url: str, format_selector: str = AUDIO_ONLY_FORMAT) -> Optional[Dict[str, Any]]:
+    """
+    Finds the direct media URL of one audio format without downloading anything.
+
+    ffmpeg can then read that URL incrementally (see `audio_utils.stream_audio_chunks`)
+    and stop the transfer as soon as enough audio has been seen.
+
+    Args:
+        url (str): The public video URL.
+        format_selector (str): The yt-dlp format to resolve; must be a single stream
+            (not a video+audio merge).
+
+    Returns:
+        Optional[Dict[str, Any]]: 'url' (the media URL) and 'http_headers' (to send
+        with it), or None if it could not be resolved.
+    """
+    import yt_dlp
+
+    ydl_opts = {
+        'quiet': True,
+        'skip_download': True,
+        'noplaylist': True,
+        'nocolor': True,
+        'format': format_selector,
+    }
+    with span("resolve_stream") as s:
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False)
+        except Exception as e:
+            logger.warning(f"Could not resolve a stream URL for {url}. Error: {e}")
+            s["status"] = "error"
+            return None
+        if not info.get("url"):
+            logger.warning(f"No single media stream matches '{format_selector}' for {url}.")
+            s["status"] = "error"
+            return None
+        return {"url": info["url"], "http_headers": info.get("http_headers") or {}}
 
 # Standalone testing block can remain the same
 if __name__ == '__main__':
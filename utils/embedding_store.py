@@ -0,0 +1,212 @@
+# rem_accent_checker/utils/embedding_store.py
+import hashlib
+import os
+import re
+import threading
+from contextlib import contextmanager
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+from .logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: one writing process per store only
+    fcntl = None
+
+logger = get_logger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "accent_classifier", "embeddings")
+VECTORS_FILE = "embeddings.f32"
+INDEX_FILE = "index.txt"
+MODEL_FILE = "model_version.txt"
+LOCK_FILE = "store.lock"
+
+def model_store_dir(root: str, model_version: str) -> str:
+    """The store directory for one model version under `root`; every backend and checkpoint gets its own."""
+    return os.path.join(root, re.sub(r"[^A-Za-z0-9._-]", "_", model_version))
+
+def audio_content_hash(waveform: np.ndarray) -> str:
+    """
+    Returns a SHA-256 hex digest of a waveform's float32 samples.
+
+    Hash the waveform as it is fed to the model (mono, 16 kHz), so the same audio
+    maps to the same key regardless of the container it was decoded from.
+    """
+    samples = np.ascontiguousarray(waveform, dtype=np.float32)
+    return hashlib.sha256(samples.tobytes()).hexdigest()
+
+class EmbeddingStore:
+    """
+    A persistent store of fixed-size embeddings keyed by audio content hash.
+
+    Vectors live in a float32 numpy memmap (`embeddings.f32`, one row per clip) and
+    keys in an append-only index (`index.txt`, the key of row i on line i). Rows are
+    never rewritten, so a crash can at worst lose the last unindexed row. The whole
+    store can be read back as one matrix with `matrix()`, e.g. to re-score every
+    stored clip with a new classifier head without touching any audio.
+
+    Embeddings from different models must not mix: open a store per model with
+    `for_model`, which keeps each `model_version` in its own directory and refuses a
+    directory written by another version. Several processes (the app and an inference
+    worker) may write to one store: appends hold an exclusive file lock and first read
+    the rows other processes have added.
+    """
+
+    def __init__(self, directory: str, dim: int, initial_capacity: int = 1024, model_version: Optional[str] = None):
+        """
+        Args:
+            directory (str): Where the vector and index files are kept.
+            dim (int): The embedding size (`emb_dim` in hyperparams.yaml).
+            initial_capacity (int): Rows allocated when creating a new store.
+            model_version (Optional[str]): The model the embeddings come from. Recorded in
+                a new store; a store recorded for another version is refused.
+
+        Raises:
+            ValueError: If the files do not match `dim`, or the store belongs to another model version.
+        """
+        self.directory = directory
+        self.dim = dim
+        self.model_version = model_version
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(directory, VECTORS_FILE)
+        self._index_path = os.path.join(directory, INDEX_FILE)
+        self._lock_path = os.path.join(directory, LOCK_FILE)
+        os.makedirs(directory, exist_ok=True)
+        if model_version is not None:
+            self._check_model_version(model_version)
+
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        # How far into the index file this process has read.
+        self._index_offset = 0
+        self._vectors: Optional[np.memmap] = None
+        with self._file_lock():
+            if not os.path.exists(self._vectors_path):
+                self._resize_file(max(initial_capacity, 1))
+            self._refresh()
+        logger.info(f"Embedding store opened at {directory} with {len(self._keys)} embeddings.")
+
+    @classmethod
+    def for_model(cls, root: str, model_version: str, dim: int, initial_capacity: int = 1024) -> "EmbeddingStore":
+        """Opens the store for `model_version` under `root` (see `model_store_dir`)."""
+        return cls(model_store_dir(root, model_version), dim, initial_capacity, model_version=model_version)
+
+    def _check_model_version(self, model_version: str):
+        path = os.path.join(self.directory, MODEL_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                recorded = f.read().strip()
+            if recorded != model_version:
+                raise ValueError(
+                    f"Embedding store {self.directory} holds embeddings of model {recorded}, not {model_version}."
+                )
+        elif os.path.exists(os.path.join(self.directory, INDEX_FILE)):
+            raise ValueError(f"Embedding store {self.directory} does not record its model version.")
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(model_version + "\n")
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Holds the store's exclusive cross-process lock (a no-op without fcntl)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a+") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """
+        Reads index lines appended since the last read (by any process) and re-maps the
+        vector file if it has grown. The caller holds the thread lock or is the constructor.
+        """
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "rb") as f:
+                f.seek(self._index_offset)
+                appended = f.read()
+            # A line without its newline is still being written; it is read next time.
+            complete = appended[: appended.rfind(b"\n") + 1]
+            self._index_offset += len(complete)
+            for line in complete.decode("utf-8").splitlines():
+                key = line.strip()
+                if key:
+                    self._rows.setdefault(key, len(self._keys))
+                    self._keys.append(key)
+
+        row_bytes = self.dim * 4
+        file_size = os.path.getsize(self._vectors_path)
+        if file_size % row_bytes:
+            raise ValueError(f"Embedding file {self._vectors_path} does not hold {self.dim}-dim float32 rows.")
+        capacity = file_size // row_bytes
+        if capacity < len(self._keys):
+            raise ValueError(f"Embedding index lists {len(self._keys)} rows but the vector file holds {capacity}.")
+        if self._vectors is None or self._vectors.shape[0] != capacity:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _resize_file(self, capacity: int):
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+
+    def _grow(self):
+        """Doubles the vector file and re-maps it. The caller holds both locks."""
+        self._resize_file(self._vectors.shape[0] * 2)
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Returns a copy of the embedding stored under `key` (by this or another process), or None."""
+        with self._lock:
+            if key not in self._rows:
+                # Another process may have stored it since; its index line follows its vector.
+                self._refresh()
+            row = self._rows.get(key)
+            return None if row is None else np.array(self._vectors[row])
+
+    def put(self, key: str, vector: np.ndarray) -> int:
+        """
+        Stores an embedding under `key` (no-op if the key already exists).
+
+        Returns:
+            int: The row the embedding is stored at.
+        """
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Expected a {self.dim}-dim embedding, got {vector.shape[0]}.")
+        with self._lock, self._file_lock():
+            # Rows other processes appended come first; ours goes after them.
+            self._refresh()
+            if key in self._rows:
+                return self._rows[key]
+            row = len(self._keys)
+            if row >= self._vectors.shape[0]:
+                self._grow()
+            self._vectors[row] = vector
+            self._vectors.flush()
+            # The key is indexed only once its vector is on disk.
+            with open(self._index_path, "ab") as f:
+                f.write(key.encode("utf-8") + b"\n")
+                self._index_offset = f.tell()
+            self._rows[key] = row
+            self._keys.append(key)
+            return row
+
+    def matrix(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Returns every stored key and a read-only [n, dim] view of their embeddings.
+        """
+        with self._lock:
+            self._refresh()
+            view = self._vectors[: len(self._keys)].view(np.ndarray)
+            view.flags.writeable = False
+            return list(self._keys), view
@@ -0,0 +1,138 @@
+# rem_accent_checker/utils/inference_client.py
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+class InferenceClient:
+    """
+    Talks to a `utils.inference_server` worker with the same calls as AccentClassifier.
+
+    Only NumPy and the standard library are used, so a web process holding a client
+    never imports torch or loads the model. The `submit_*` methods return futures,
+    so the caller's thread is free while the worker runs the model.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 300.0, max_pending: int = 4):
+        """
+        Args:
+            base_url (str): The worker's address, e.g. http://127.0.0.1:8765.
+            timeout (float): Seconds to wait for one request.
+            max_pending (int): Requests this client may have in flight at once.
+
+        Raises:
+            RuntimeError: If the worker cannot be reached.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        # Callers (e.g. the pipeline's inference stage) may keep this many requests busy.
+        self.max_concurrent_inferences = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_pending, thread_name_prefix="inference-client")
+        health = self.health()
+        if health is None:
+            raise RuntimeError(f"Inference worker at {self.base_url} is not reachable.")
+        self.model_version = health["model_version"]
+        self.sample_rate = health["sample_rate"]
+        self.embedding_dim = health["embedding_dim"]
+        logger.info(f"Connected to inference worker at {self.base_url} (model {self.model_version}).")
+
+    def _request(self, path: str, body: Optional[bytes] = None, **params: Any) -> Dict[str, Any]:
+        url = f"{self.base_url}{path}"
+        if params:
+            url = f"{url}?{urllib.parse.urlencode(params)}"
+        request = urllib.request.Request(url, data=body, method="POST" if body is not None else "GET")
+        if body is not None:
+            request.add_header("Content-Type", "application/octet-stream")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            message = json.loads(e.read() or b"{}").get("error", e.reason)
+            raise RuntimeError(f"Inference worker returned {e.code}: {message}") from e
+
+    @staticmethod
+    def _encode_waveform(waveform) -> bytes:
+        return np.ascontiguousarray(np.asarray(waveform).reshape(-1), dtype="<f4").tobytes()
+
+    def health(self) -> Optional[Dict[str, Any]]:
+        """Returns the worker's status (model version, queue depth, batch counters), or None."""
+        try:
+            return self._request("/v1/health")
+        except Exception as e:
+            logger.error(f"Inference worker health check failed. Error: {e}")
+            return None
+
+    def submit_waveform(self, waveform: np.ndarray, top_k: int = 5) -> Future:
+        """Sends a mono 16 kHz waveform for classification; resolves like `classify_waveform`."""
+        body = self._encode_waveform(waveform)
+        return self._executor.submit(lambda: self._request("/v1/classify", body, top_k=top_k)["results"])
+
+    def submit_segments(self, waveform: np.ndarray, top_k: int = 5, **options: Any) -> Future:
+        """Sends a waveform for sliding-window analysis; resolves like `classify_segments`."""
+        body = self._encode_waveform(waveform)
+        return self._executor.submit(lambda: self._request("/v1/segments", body, top_k=top_k, **options))
+
+    def classify_waveform(self, waveform: np.ndarray, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Classifies a mono 16 kHz waveform on the worker.
+
+        Returns:
+            A list of dictionaries with 'label' and 'score', or [] on failure.
+        """
+        try:
+            return self.submit_waveform(waveform, top_k).result()
+        except Exception as e:
+            logger.error(f"Remote classification failed. Error: {e}")
+            return []
+
+    def classify_batch(self, waveforms: List[np.ndarray], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Sends every waveform at once, so the worker can micro-batch them together.
+
+        Returns:
+            One list of {'label', 'score'} dictionaries per input ([] for a failed one).
+        """
+        futures = [self.submit_waveform(waveform, top_k) for waveform in waveforms]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"Remote classification failed. Error: {e}")
+                results.append([])
+        return results
+
+    def classify_segments(self, audio, top_k: int = 5, **options: Any) -> Dict[str, Any]:
+        """
+        Runs `AccentClassifier.classify_segments` on the worker. A path is decoded locally first.
+
+        Returns:
+            A dictionary with 'top_k' and 'segments' (empty lists on failure).
+        """
+        waveform = self._load(audio) if isinstance(audio, str) else audio
+        if waveform is None:
+            return {"top_k": [], "segments": []}
+        try:
+            return self.submit_segments(waveform, top_k, **options).result()
+        except Exception as e:
+            logger.error(f"Remote segmented classification failed. Error: {e}")
+            return {"top_k": [], "segments": []}
+
+    def classify_audio(self, audio_path: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Decodes an audio file locally and classifies it on the worker."""
+        waveform = self._load(audio_path)
+        return [] if waveform is None else self.classify_waveform(waveform, top_k)
+
+    def _load(self, audio_path: str) -> Optional[np.ndarray]:
+        # Imported here; only the file fallback path needs ffmpeg.
+        from .audio_utils import extract_audio_array
+        return extract_audio_array(audio_path, sample_rate=self.sample_rate)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
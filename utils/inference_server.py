@@ -0,0 +1,312 @@
+# rem_accent_checker/utils/inference_server.py
+"""
+A standalone inference worker: owns the model and serves it over localhost HTTP.
+
+Concurrent /v1/classify requests are collected into micro-batches (up to
+`--max-batch-size` clips, or whatever arrived within `--max-wait-ms` of the first),
+run through one batched forward pass and fanned back out. Web processes talk to it
+with `utils.inference_client.InferenceClient`, so web and model processes scale
+separately.
+
+    python -m utils.inference_server [--host 127.0.0.1] [--port 8765] [--max-batch-size 16] [--max-wait-ms 10]
+    python -m utils.inference_server --workers 4     # pre-forked workers sharing one model (see utils.prefork)
+
+Endpoints (audio is the raw little-endian float32 mono 16 kHz samples as the body):
+    GET  /v1/health
+    GET  /metrics                  (Prometheus text format, see utils.metrics)
+    POST /v1/classify?top_k=5
+    POST /v1/segments?top_k=5&window_seconds=6&hop_seconds=3&aggregation=mean_log_prob
+
+Add `profile=1` to a POST to write a cProfile and torch.profiler trace of that one
+request to ACCENT_PROFILE_DIR; a profiled /v1/classify skips the micro-batcher so
+the model runs on the profiled thread.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+import numpy as np
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from .metrics import REGISTRY, profiled, span
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 10.0
+# Upper bound on a request body (~10 minutes of 16 kHz float32 audio).
+MAX_BODY_BYTES = 16000 * 4 * 600
+
+class MicroBatcher:
+    """
+    Groups single-clip requests into batched `classify_batch` calls on a background thread.
+
+    The first queued request opens a batch; the batch is closed when it holds
+    `max_batch_size` clips or `max_wait_ms` has passed, whichever comes first. Under
+    light load a request waits at most `max_wait_ms`; under heavy load every forward
+    pass is full.
+    """
+
+    def __init__(self, classifier, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        """
+        Args:
+            classifier: An AccentClassifier (anything with `classify_batch`).
+            max_batch_size (int): Most clips per forward pass.
+            max_wait_ms (float): Longest time a batch stays open for more clips.
+        """
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches_run = 0
+        self.clips_run = 0
+        self._queue: "queue.Queue[Tuple[np.ndarray, int, Future, float]]" = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, waveform: np.ndarray, top_k: int = 5) -> Future:
+        """
+        Queues one clip for classification.
+
+        Returns:
+            Future: Resolves to the clip's list of {'label', 'score'} dictionaries.
+        """
+        future: Future = Future()
+        self._queue.put((waveform, top_k, future, time.perf_counter()))
+        return future
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stop(self):
+        """Stops the batching thread after the current batch."""
+        self._stopped.set()
+        self._thread.join()
+
+    def _collect(self) -> List[Tuple[np.ndarray, int, Future, float]]:
+        """Blocks for the first request, then gathers more until the batch is full or times out."""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            batch = [(w, k, f, t) for w, k, f, t in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            # The oldest clip in the batch waited longest.
+            queue_wait = time.perf_counter() - min(t for _, _, _, t in batch)
+            try:
+                with span("micro_batch", batch_size=len(batch), queue_wait_seconds=queue_wait):
+                    top_k = max(k for _, k, _, _ in batch)
+                    results = self.classifier.classify_batch([w for w, _, _, _ in batch], top_k=top_k)
+                for (_, k, future, _), item_results in zip(batch, results):
+                    future.set_result(item_results[:k])
+            except Exception as e:
+                logger.error(f"Micro-batch of {len(batch)} clips failed. Error: {e}")
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+            self.batches_run += 1
+            self.clips_run += len(batch)
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """Serves the JSON API; `self.server` carries the classifier and the batcher."""
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            return self._send_metrics()
+        if path != "/v1/health":
+            return self._send_json(404, {"error": "Not found."})
+        classifier, batcher = self.server.classifier, self.server.batcher
+        self._send_json(200, {
+            "status": "ok",
+            "pid": os.getpid(),
+            "model_version": classifier.model_version,
+            "sample_rate": classifier.sample_rate,
+            "embedding_dim": classifier.embedding_dim,
+            "queue_depth": batcher.queue_depth,
+            "batches_run": batcher.batches_run,
+            "clips_run": batcher.clips_run,
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            waveform = self._read_waveform()
+            top_k = int(params.get("top_k", 5))
+            profile = params.get("profile") in ("1", "true")
+            with profiled(f"request-{uuid.uuid4().hex}", profile, torch_trace=True):
+                if url.path == "/v1/classify":
+                    if profile:
+                        results = self.server.classifier.classify_batch([waveform], top_k=top_k)[0]
+                    else:
+                        results = self.server.batcher.submit(waveform, top_k).result(timeout=self.server.request_timeout)
+                    return self._send_json(200, {"results": results})
+                if url.path == "/v1/segments":
+                    with span("segments", audio_seconds=waveform.shape[0] / self.server.classifier.sample_rate):
+                        analysis = self.server.classifier.classify_segments(
+                            waveform,
+                            top_k=top_k,
+                            window_seconds=float(params.get("window_seconds", 6.0)),
+                            hop_seconds=float(params.get("hop_seconds", 3.0)),
+                            aggregation=params.get("aggregation", "mean_log_prob"),
+                        )
+                    return self._send_json(200, analysis)
+            return self._send_json(404, {"error": "Not found."})
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            logger.error(f"Inference request failed. Error: {e}")
+            return self._send_json(500, {"error": str(e)})
+
+    def _read_waveform(self) -> np.ndarray:
+        length = int(self.headers.get("Content-Length", 0))
+        if length <= 0 or length % 4 or length > MAX_BODY_BYTES:
+            raise ValueError("The body must hold 1 to 10 minutes of float32 samples.")
+        # bytearray keeps the array writable, so the classifier can wrap it without a copy.
+        return np.frombuffer(bytearray(self.rfile.read(length)), dtype="<f4")
+
+    def _send_metrics(self):
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+class InferenceServer(ThreadingHTTPServer):
+    """A threaded HTTP server holding one classifier and its micro-batcher."""
+    daemon_threads = True
+
+    def __init__(
+        self,
+        classifier,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        request_timeout: float = 300.0,
+        listen_socket: Optional[socket.socket] = None,
+    ):
+        """
+        Args:
+            listen_socket (Optional[socket.socket]): An already listening socket to accept
+                on instead of binding `host`:`port`; pre-forked workers share the parent's.
+        """
+        super().__init__((host, port), InferenceRequestHandler, bind_and_activate=listen_socket is None)
+        if listen_socket is not None:
+            self.socket.close()
+            self.socket = listen_socket
+            self.server_address = listen_socket.getsockname()
+        self.classifier = classifier
+        self.batcher = MicroBatcher(classifier, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.request_timeout = request_timeout
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def server_close(self):
+        self.batcher.stop()
+        super().server_close()
+
+def load_classifier(with_embedding_store: bool = True):
+    """The worker's model: an AccentClassifier with the embedding store attached when available."""
+    from .classifier import AccentClassifier
+
+    classifier = AccentClassifier()
+    if with_embedding_store:
+        attach_embedding_store(classifier)
+    return classifier
+
+def attach_embedding_store(classifier):
+    """Opens the embedding store for the classifier's model in this process; logs and goes on without it on failure."""
+    from .embedding_store import DEFAULT_STORE_DIR, EmbeddingStore
+
+    try:
+        store_dir = os.environ.get("ACCENT_EMBEDDING_STORE", DEFAULT_STORE_DIR)
+        classifier.embedding_store = EmbeddingStore.for_model(
+            store_dir, classifier.model_version, classifier.embedding_dim
+        )
+    except Exception as e:
+        logger.warning(f"Embedding store disabled. Error: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind; keep it local.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument("--workers", type=int, default=1, help="Pre-forked worker processes sharing one model.")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Torch threads per worker (default: CPU cores divided by --workers).")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Load the model in every worker instead of once before forking.")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        from .prefork import PreforkServer
+        # Every worker opens the store itself after the fork: it is safe for several
+        # writers (file lock, index re-read), but its open files and memory maps are per process.
+        server = PreforkServer(
+            lambda: load_classifier(with_embedding_store=False), workers=args.workers, host=args.host, port=args.port,
+            threads_per_worker=args.threads_per_worker, preload=not args.no_preload,
+            max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms, init_worker=attach_embedding_store,
+        )
+        server.start()
+        logger.info(f"{args.workers} inference workers listening on {server.url}")
+        server.serve_forever()
+        return
+
+    classifier = load_classifier()
+    server = InferenceServer(
+        classifier, args.host, args.port, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms
+    )
+    logger.info(f"Inference worker listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+# rem_accent_checker/utils/metrics.py
+"""
+Per-stage latency instrumentation.
+
+Wrap a unit of work in `span(stage, **attributes)` to time it. Every span feeds
+Prometheus-style histograms in the process-wide `REGISTRY`: its duration, plus the
+well-known size attributes (bytes, audio_seconds, batch_size, queue_wait_seconds)
+when it carries them. `start_metrics_server` serves `REGISTRY.render()` on a local
+/metrics endpoint, and setting ACCENT_TRACE_PATH also appends each span to that
+file as a JSON-lines trace event.
+
+`profiled` is the profiling toggle: it dumps a cProfile (and, optionally, a
+torch.profiler Chrome trace) for the block it wraps into ACCENT_PROFILE_DIR
+(default ~/.cache/accent_classifier/profiles).
+
+Only the standard library is used, so importing this module is cheap.
+"""
+import contextvars
+import cProfile
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+TRACE_PATH_ENV = "ACCENT_TRACE_PATH"
+PROFILE_DIR_ENV = "ACCENT_PROFILE_DIR"
+# Per user, like the metadata cache, so dumps never land in whatever directory the process started in.
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "accent_classifier", "profiles")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+BYTES_BUCKETS = tuple(float(4 ** i * 1024) for i in range(1, 11))  # 4 KiB .. 1 GiB
+AUDIO_SECONDS_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+BATCH_SIZE_BUCKETS = (1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """A thread-safe Prometheus histogram with one series per label combination."""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float]):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        """Adds one observation to the series with these labels."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            # Per-bucket counts, then the sum and the count.
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self, **labels: str) -> Optional[Dict[str, Any]]:
+        """Returns {'buckets', 'sum', 'count'} for one series, or None if it was never observed."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                return None
+            return {
+                "buckets": dict(zip(self.buckets, series[:-2])),
+                "sum": series[-2],
+                "count": int(series[-1]),
+            }
+
+    def render(self) -> List[str]:
+        """The histogram in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets, values[:-2]):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {int(count)}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {int(values[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {int(values[-1])}")
+        return lines
+
+class Gauge:
+    """A thread-safe Prometheus gauge (a value that goes up and down) with one series per label combination."""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._series: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str):
+        """Sets the current value of the series with these labels."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            self._series[key] = float(value)
+
+    def value(self, **labels: str) -> Optional[float]:
+        """The series' current value, or None if it was never set."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            return self._series.get(key)
+
+    def render(self) -> List[str]:
+        """The gauge in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            series = dict(self._series)
+        for key, value in sorted(series.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    """Holds the process's histograms and gauges and renders them for a scrape."""
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._gauges: Dict[str, Gauge] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        """Returns the histogram with this name, creating it on first use."""
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, description, buckets)
+            return self._histograms[name]
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        """Returns the gauge with this name, creating it on first use."""
+        with self._lock:
+            if name not in self._gauges:
+                self._gauges[name] = Gauge(name, description)
+            return self._gauges[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._histograms.values()) + list(self._gauges.values())
+        lines = [line for metric in metrics for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "accent_stage_duration_seconds", "Wall-clock time spent in a processing stage.", DURATION_BUCKETS
+)
+JOB_SECONDS = REGISTRY.histogram(
+    "accent_job_duration_seconds", "End-to-end time from submitting an analysis to its final status.", DURATION_BUCKETS
+)
+# Span attributes that are also recorded as histograms, labelled by stage.
+ATTRIBUTE_HISTOGRAMS = {
+    "bytes": REGISTRY.histogram("accent_stage_bytes", "Bytes handled by a processing stage.", BYTES_BUCKETS),
+    "audio_seconds": REGISTRY.histogram(
+        "accent_stage_audio_seconds", "Seconds of audio handled by a processing stage.", AUDIO_SECONDS_BUCKETS
+    ),
+    "batch_size": REGISTRY.histogram(
+        "accent_stage_batch_size", "Clips per model call in a processing stage.", BATCH_SIZE_BUCKETS
+    ),
+    "queue_wait_seconds": REGISTRY.histogram(
+        "accent_stage_queue_wait_seconds", "Time spent waiting before a processing stage started.", DURATION_BUCKETS
+    ),
+}
+
+_trace_id: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("accent_trace_id", default=None)
+_trace_lock = threading.Lock()
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value))
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    pairs = []
+    for k, v in key:
+        v = v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{k}="{v}"')
+    return "{" + ",".join(pairs) + "}"
+
+@contextmanager
+def trace(trace_id: str) -> Iterator[None]:
+    """Tags every span opened in this block (on this thread) with `trace_id`, e.g. a job ID."""
+    token = _trace_id.set(trace_id)
+    try:
+        yield
+    finally:
+        _trace_id.reset(token)
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Times the wrapped block as one stage and records it.
+
+    Yields the attribute dictionary, so the block can add values it only learns
+    while running (e.g. `s["bytes"] = os.path.getsize(path)`). Setting
+    `s["status"] = "error"` marks a span failed without raising; an exception
+    marks it failed automatically.
+
+    Args:
+        stage (str): The stage name, used as the `stage` label.
+        **attributes: Extra values for the trace event. `bytes`, `audio_seconds`,
+            `batch_size` and `queue_wait_seconds` also feed histograms.
+    """
+    started_at = time.time()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        status = attributes.pop("status", status)
+        STAGE_SECONDS.observe(duration, stage=stage, status=status)
+        for name, histogram in ATTRIBUTE_HISTOGRAMS.items():
+            value = attributes.get(name)
+            if isinstance(value, (int, float)):
+                histogram.observe(float(value), stage=stage)
+        _write_trace_event({
+            "stage": stage,
+            "trace_id": _trace_id.get(),
+            "start": started_at,
+            "duration": duration,
+            "status": status,
+            "thread": threading.current_thread().name,
+            "attributes": attributes,
+        })
+
+def _write_trace_event(event: Dict[str, Any]):
+    path = os.environ.get(TRACE_PATH_ENV)
+    if not path:
+        return
+    try:
+        line = json.dumps(event, default=str)
+        with _trace_lock, open(path, "a") as f:
+            f.write(line + "\n")
+    except Exception as e:
+        logger.warning(f"Could not write a trace event to {path}. Error: {e}")
+
+@contextmanager
+def profiled(name: str, enabled: bool = True, torch_trace: bool = False) -> Iterator[Optional[str]]:
+    """
+    Profiles the wrapped block with cProfile and writes `<name>.prof` to ACCENT_PROFILE_DIR.
+
+    cProfile only sees the calling thread, so wrap the work of one request on the
+    thread that runs it. Open the dump with `python -m pstats` or snakeviz.
+
+    Args:
+        name (str): The file name stem, e.g. "<job id>-inference".
+        enabled (bool): When False the block runs unprofiled, so callers can pass a toggle.
+        torch_trace (bool): Also record a torch.profiler Chrome trace (`<name>.json`);
+            skipped if torch is not installed.
+
+    Yields:
+        Optional[str]: The path of the .prof file that will be written, or None if disabled.
+    """
+    if not enabled:
+        yield None
+        return
+
+    directory = os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    prof_path = os.path.join(directory, f"{name}.prof")
+
+    torch_profiler = None
+    if torch_trace:
+        try:
+            import torch.profiler
+            torch_profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True
+            )
+        except ImportError:
+            logger.warning("torch is not installed; recording the cProfile dump only.")
+
+    profiler = cProfile.Profile()
+    if torch_profiler is not None:
+        torch_profiler.__enter__()
+    profiler.enable()
+    try:
+        yield prof_path
+    finally:
+        profiler.disable()
+        profiler.dump_stats(prof_path)
+        logger.info(f"Wrote a cProfile dump to {prof_path}")
+        if torch_profiler is not None:
+            torch_profiler.__exit__(None, None, None)
+            trace_path = os.path.join(directory, f"{name}.json")
+            torch_profiler.export_chrome_trace(trace_path)
+            logger.info(f"Wrote a torch.profiler trace to {trace_path}")
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves GET /metrics from `server.registry`."""
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+def start_metrics_server(host: str = "127.0.0.1", port: int = 9464, registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serves the registry on http://host:port/metrics from a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call `shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,85 @@
+# rem_accent_checker/utils/onnx_engine.py
+"""
+Runs an exported accent model (see `utils.onnx_export`) with onnxruntime.
+
+Only NumPy and onnxruntime are needed at inference time: no SpeechBrain modules
+and no torch weights are loaded, and ORT's CPU kernels are usually faster per clip.
+"""
+import os
+import numpy as np
+from typing import Dict, List, Optional
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+ENCODER_FILENAME = "encoder.onnx"
+CLASSIFIER_FILENAME = "classifier.onnx"
+
+def default_onnx_dir(model_dir: str) -> str:
+    """Returns where the ONNX export of `model_dir` is written and looked up by default."""
+    return os.path.join(model_dir, "onnx")
+
+class OnnxEngine:
+    """
+    Computes embeddings and class scores with two ONNX graphs.
+
+    `encoder.onnx` maps a zero-padded [batch, time] batch of waveforms and their
+    [batch] relative lengths to [batch, emb_dim] embeddings (Fbank -> sentence mean
+    normalization -> ECAPA-TDNN), with dynamic batch and time axes. Exports from
+    before the batch axis was dynamic take one unpadded [1, time] clip per run and
+    are still supported. `classifier.onnx` maps embeddings to [batch, n_labels] scores. The
+    label map, sample rate and source model version are stored in the encoder's
+    metadata. Sessions are thread-safe, so one engine can serve every thread.
+    """
+
+    def __init__(self, directory: str, num_threads: Optional[int] = None):
+        """
+        Args:
+            directory (str): The directory written by `utils.onnx_export`.
+            num_threads (Optional[int]): Intra-op threads per session; ORT's default if None.
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        providers = ["CPUExecutionProvider"]
+        self.encoder = ort.InferenceSession(os.path.join(directory, ENCODER_FILENAME), options, providers=providers)
+        self.head = ort.InferenceSession(os.path.join(directory, CLASSIFIER_FILENAME), options, providers=providers)
+
+        metadata = self.encoder.get_modelmeta().custom_metadata_map
+        labels = metadata.get("labels", "")
+        self.labels: Dict[int, str] = {i: label for i, label in enumerate(labels.split("\n")) if label}
+        self.sample_rate = int(metadata.get("sample_rate", 16000))
+        self.model_version = metadata.get("model_version", "unknown")
+        self.embedding_dim = self.head.get_inputs()[0].shape[-1]
+        self.batched = any(i.name == "wav_lens" for i in self.encoder.get_inputs())
+        logger.info(f"ONNX engine loaded from {directory} ({len(self.labels)} labels).")
+
+    def encode(self, wavs: np.ndarray, lengths: Optional[List[int]] = None) -> np.ndarray:
+        """
+        Embeds a batch of waveforms in one encoder run (one run per unpadded clip
+        with an older, single-clip export).
+
+        Args:
+            wavs (np.ndarray): A zero-padded [batch, time] float32 array.
+            lengths (Optional[List[int]]): Each row's valid length in samples; all full if None.
+
+        Returns:
+            np.ndarray: Embeddings of shape [batch, embedding_dim].
+        """
+        wavs = np.ascontiguousarray(wavs, dtype=np.float32)
+        if lengths is None:
+            lengths = [wavs.shape[1]] * wavs.shape[0]
+        if self.batched:
+            wav_lens = np.asarray(lengths, dtype=np.float32) / max(wavs.shape[1], 1)
+            return self.encoder.run(None, {"wavs": wavs, "wav_lens": wav_lens})[0]
+        return np.concatenate([
+            self.encoder.run(None, {"wavs": wavs[row:row + 1, :length]})[0]
+            for row, length in enumerate(lengths)
+        ])
+
+    def score(self, embeddings: np.ndarray) -> np.ndarray:
+        """Returns class scores of shape [batch, n_labels] for [batch, embedding_dim] embeddings."""
+        return self.head.run(None, {"embeddings": np.ascontiguousarray(embeddings, dtype=np.float32)})[0]
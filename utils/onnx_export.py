@@ -0,0 +1,180 @@
+# rem_accent_checker/utils/onnx_export.py
+"""
+Exports the accent model to ONNX for `utils.onnx_engine`.
+
+Two graphs are written: the encoder (waveform -> Fbank -> sentence mean
+normalization -> ECAPA-TDNN embedding) and the cosine classifier head. The model is
+taken from the offline bundle if there is one, else from hyperparams.yaml.
+
+    python -m utils.onnx_export [--model-dir utils/accent_id_model_clean] [--output-dir DIR]
+"""
+import argparse
+import contextlib
+import math
+import os
+import time
+import torch
+from typing import Dict, Iterator, Optional
+from .bundle import default_bundle_path, load_bundle
+from .onnx_engine import CLASSIFIER_FILENAME, ENCODER_FILENAME, default_onnx_dir
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "accent_id_model_clean")
+ONNX_OPSET = 17
+
+class ExportableEncoder(torch.nn.Module):
+    """
+    The SpeechBrain feature/embedding pipeline rewritten with ONNX-exportable ops.
+
+    `torch.stft` (complex output) cannot be exported, so the STFT is a strided
+    Conv1d over a fixed windowed DFT basis, giving the same power spectrum as
+    SpeechBrain's STFT (centered, zero padded) + `spectral_magnitude`. The Filterbank
+    and ECAPA modules are reused as they are. Like `EncoderClassifier.encode_batch`,
+    it takes a zero-padded batch with each row's relative length: sentence mean
+    normalization averages only the valid frames, and ECAPA masks its pooling and
+    SE statistics with the lengths.
+    """
+
+    def __init__(self, mods: torch.nn.ModuleDict):
+        super().__init__()
+        stft = mods.compute_features.compute_STFT
+        frequencies = torch.arange(stft.n_fft // 2 + 1, dtype=torch.float64).unsqueeze(1)
+        times = torch.arange(stft.n_fft, dtype=torch.float64).unsqueeze(0)
+        angles = 2 * math.pi * frequencies * times / stft.n_fft
+        window = torch.nn.functional.pad(stft.window.double(), (0, stft.n_fft - stft.win_length))
+        basis = torch.cat([torch.cos(angles), -torch.sin(angles)]) * window
+        self.register_buffer("dft_basis", basis.float().unsqueeze(1))
+        self.hop_length = stft.hop_length
+        self.padding = stft.n_fft // 2
+        self.compute_fbanks = mods.compute_features.compute_fbanks
+        self.embedding_model = mods.embedding_model
+
+    def forward(self, wavs: torch.Tensor, wav_lens: torch.Tensor) -> torch.Tensor:
+        frames = torch.nn.functional.pad(wavs.unsqueeze(1), (self.padding, self.padding))
+        spectrum = torch.nn.functional.conv1d(frames, self.dft_basis, stride=self.hop_length)
+        real, imag = spectrum.chunk(2, dim=1)
+        feats = self.compute_fbanks((real ** 2 + imag ** 2).transpose(1, 2))
+        # InputNormalization(norm_type="sentence"): the mean of each row's round(len * T) frames.
+        valid_frames = torch.round(wav_lens * feats.shape[1]).unsqueeze(1)
+        mask = (torch.arange(feats.shape[1], dtype=feats.dtype).unsqueeze(0) < valid_frames).unsqueeze(2).to(feats.dtype)
+        feats = feats - (feats * mask).sum(dim=1, keepdim=True) / mask.sum(dim=1, keepdim=True)
+        return self.embedding_model(feats, wav_lens).squeeze(1)
+
+def _traceable_length_to_mask(length, max_len=None, dtype=None, device=None):
+    """`speechbrain.dataio.dataio.length_to_mask` without `len(length)`, which tracing freezes."""
+    if max_len is None:
+        max_len = length.max().long().item()
+    mask = torch.arange(max_len, device=length.device, dtype=length.dtype).unsqueeze(0) < length.unsqueeze(1)
+    return mask.to(dtype=dtype or length.dtype, device=device)
+
+@contextlib.contextmanager
+def _dynamic_batch_masks() -> Iterator[None]:
+    """Lets ECAPA-TDNN's masks follow the batch size while it is traced for export."""
+    from speechbrain.lobes.models import ECAPA_TDNN
+
+    original = ECAPA_TDNN.length_to_mask
+    ECAPA_TDNN.length_to_mask = _traceable_length_to_mask
+    try:
+        yield
+    finally:
+        ECAPA_TDNN.length_to_mask = original
+
+class ExportableClassifier(torch.nn.Module):
+    """The cosine classifier head on [batch, emb_dim] embeddings."""
+
+    def __init__(self, mods: torch.nn.ModuleDict):
+        super().__init__()
+        self.classifier = mods.classifier
+
+    def forward(self, embeddings: torch.Tensor) -> torch.Tensor:
+        return self.classifier(embeddings.unsqueeze(1)).squeeze(1)
+
+def export_onnx(
+    mods: torch.nn.ModuleDict,
+    ind2lab: Dict[int, str],
+    model_version: str,
+    output_dir: str,
+    sample_rate: int = 16000,
+) -> str:
+    """
+    Exports the encoder and classifier head of a loaded model to `output_dir`.
+
+    Args:
+        mods (torch.nn.ModuleDict): The EncoderClassifier's modules.
+        ind2lab (Dict[int, str]): The label encoder's index -> label map.
+        model_version (str): The source model's version, recorded in the metadata.
+        output_dir (str): Where to write encoder.onnx and classifier.onnx.
+        sample_rate (int): The sample rate the model expects.
+
+    Returns:
+        str: The output directory.
+    """
+    import onnx
+
+    os.makedirs(output_dir, exist_ok=True)
+    encoder = ExportableEncoder(mods).eval()
+    head = ExportableClassifier(mods).eval()
+    encoder_path = os.path.join(output_dir, ENCODER_FILENAME)
+    head_path = os.path.join(output_dir, CLASSIFIER_FILENAME)
+
+    with torch.no_grad(), _dynamic_batch_masks():
+        # Two rows of different lengths, so no shape is specialized to the example.
+        example_wavs = torch.zeros(2, sample_rate)
+        example_lens = torch.tensor([1.0, 0.5])
+        torch.onnx.export(
+            encoder, (example_wavs, example_lens), encoder_path, dynamo=False, opset_version=ONNX_OPSET,
+            input_names=["wavs", "wav_lens"], output_names=["embeddings"],
+            dynamic_axes={"wavs": {0: "batch", 1: "time"}, "wav_lens": {0: "batch"}, "embeddings": {0: "batch"}},
+        )
+        torch.onnx.export(
+            head, (encoder(example_wavs, example_lens),), head_path, dynamo=False, opset_version=ONNX_OPSET,
+            input_names=["embeddings"], output_names=["scores"],
+            dynamic_axes={"embeddings": {0: "batch"}, "scores": {0: "batch"}},
+        )
+
+    labels = [ind2lab[i] for i in sorted(ind2lab)]
+    model = onnx.load(encoder_path)
+    onnx.helper.set_model_props(model, {
+        "labels": "\n".join(labels),
+        "sample_rate": str(sample_rate),
+        "model_version": model_version,
+    })
+    onnx.save(model, encoder_path)
+    logger.info(f"Exported ONNX encoder and classifier to: {output_dir}")
+    return output_dir
+
+def build_onnx(model_dir: str = MODEL_DIR, output_dir: Optional[str] = None) -> str:
+    """
+    Loads the model (from its offline bundle if present) and exports it to ONNX.
+    """
+    output_dir = output_dir or default_onnx_dir(model_dir)
+    bundle_path = default_bundle_path(model_dir)
+    if os.path.isfile(bundle_path):
+        logger.info(f"Loading offline model bundle from: {bundle_path}")
+        classifier, ind2lab, model_version = load_bundle(bundle_path)
+    else:
+        from speechbrain.inference import EncoderClassifier
+        from .classifier import AccentClassifier
+
+        logger.info(f"Loading SpeechBrain model from: {model_dir}")
+        classifier = EncoderClassifier.from_hparams(source=model_dir, savedir=model_dir)
+        ind2lab = classifier.hparams.label_encoder.ind2lab
+        model_version = AccentClassifier._hash_model_files(model_dir)
+    return export_onnx(
+        classifier.mods, ind2lab, model_version, output_dir, classifier.audio_normalizer.sample_rate
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="SpeechBrain model directory with hyperparams.yaml.")
+    parser.add_argument("--output-dir", default=None, help="Export directory (default: <model-dir>/onnx).")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = build_onnx(args.model_dir, args.output_dir)
+    print(f"ONNX model written to {path} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
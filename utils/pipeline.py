@@ -0,0 +1,702 @@
+# rem_accent_checker/utils/pipeline.py
+"""
+A staged, asynchronous analysis pipeline: download -> extract -> classify.
+
+Each stage has its own workers and bounded queues sit between the stages, so job
+N+1 downloads while job N is decoded or classified. A full queue holds back the
+stage before it, which caps the downloads on disk and the decoded audio in memory.
+Jobs are tracked by ID with a status, a log of status events and a result that a UI
+can poll. The pipeline lives for the whole process, so a job outlives the Streamlit
+rerun that submitted it.
+
+Submissions are single-flight: a request identical to an unfinished job (same
+normalized URL or media and the same options) joins that job instead of starting
+another download, so every session polls the same job and sees its progress.
+With a shared `lock_dir`, pipelines in different processes also take a
+`FlightLock` per request before downloading; the ones that find it taken wait for
+the holder and then read its result from the shared result cache. A waiting job is
+parked off the download workers and a watcher thread re-checks its lock, so it
+never holds up other jobs' downloads. A request with `use_cache=False` or `profile`
+never joins another job: it would get neither a fresh result nor its profile.
+
+Progressive jobs (`progressive=True`) classify the audio chunk by chunk and stop
+once the `EarlyExitPolicy` is satisfied. For URLs the download stage only resolves
+the audio stream's URL (reusing the preflight's, if it just read them). The extract
+stage starts decoding the stream on a thread of its own, a few chunks ahead, and the
+inference stage only runs the model on the chunks; an early stop also ends the
+decode and the download.
+
+Downloads and extracted WAVs go to a job `ScratchDir` from the process-wide
+`ScratchSpace`: a download waits while the scratch quota is used up, the media file
+is deleted as soon as its audio is decoded, and the rest when the job ends.
+"""
+import hashlib
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+from .audio_utils import (
+    MediaSource, read_media_bytes, extract_audio, extract_audio_array, load_media_audio, stream_audio_chunks,
+)
+from .downloader import AUDIO_ONLY_FORMAT, download_video, get_clean_youtube_url, resolve_stream_url
+from .metrics import JOB_SECONDS, profiled, span, trace
+from .preflight import REJECT, TRIM, AdmissionPolicy, Preflight
+from .progressive import EarlyExitPolicy, PrefetchedChunks, chunk_waveform, classify_progressive
+from .result_cache import make_cache_key
+from .scratch import ScratchDir, ScratchSpace, get_scratch_space
+from .single_flight import DEFAULT_POLL_SECONDS, FlightLock, cross_process_locks_supported
+from .vad import MIN_SPEECH_SECONDS, to_source_time, trim_silence
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Job statuses, in pipeline order. REJECTED means the input is unusable (e.g. no
+# speech); FAILED means something went wrong while processing it.
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+EXTRACTING = "extracting"
+CLASSIFYING = "classifying"
+DONE = "done"
+REJECTED = "rejected"
+FAILED = "failed"
+FINISHED_STATUSES = (DONE, REJECTED, FAILED)
+# What moviepy's fallback WAV takes per second of audio (44.1 kHz, 16-bit stereo).
+WAV_BYTES_PER_SECOND = 44100 * 2 * 2
+# Longest wait for room for that WAV; two jobs waiting to grow at once would otherwise wait on each other forever.
+WAV_SPACE_TIMEOUT_SECONDS = 300.0
+
+class Job:
+    """
+    One analysis request moving through the pipeline.
+
+    Stage workers update it through `update`; readers use the attributes or `events`.
+    `result` is set when `status` is DONE: a dictionary with 'top_k' (the predictions),
+    'segments' (None unless segmented) and 'cached'. Progressive jobs also get
+    'progressive': how much audio was used and why classification stopped (see
+    `classify_progressive`).
+    """
+
+    def __init__(self, url: str, options: Dict[str, Any], profile: bool = False, use_cache: bool = True):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.options = options
+        # Dump a cProfile per stage for this job (see `utils.metrics.profiled`).
+        self.profile = profile
+        # False to analyze again even if another job or process has the result.
+        self.use_cache = use_cache
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting to start..."
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.vad_stats: Optional[Dict[str, float]] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        # Working state handed from stage to stage.
+        self.scratch: Optional[ScratchDir] = None
+        # Set for uploads and local files, which skip the download stage.
+        self.media_source: Optional[MediaSource] = None
+        self.media_path: Optional[str] = None
+        self.waveform = None
+        self.audio_path: Optional[str] = None
+        # For progressive URL jobs: the resolved audio stream, and its chunks, decoded
+        # ahead on a thread of their own from the extract stage on.
+        self.stream: Optional[Dict[str, Any]] = None
+        self.chunks: Optional[PrefetchedChunks] = None
+        self.cache_key: Optional[str] = None
+        # The media identity in the cache key, and whether the audio went through the VAD
+        # (the WAV fallback classifies untrimmed audio, which is cached under its own key).
+        self.source_id: Optional[str] = None
+        self.vad = True
+        # Preflight metadata and the admission decision, when the pipeline runs a preflight.
+        self.metadata: Optional[Dict[str, Any]] = None
+        self.admission: Optional[Dict[str, Any]] = None
+        self.enqueued_at: Optional[float] = None
+        # Identical requests that joined this job instead of starting their own.
+        self.joined = 0
+        # Held while a URL job does the work, when the pipeline has a lock directory.
+        self.flight_lock: Optional[FlightLock] = None
+        # Set once the job stops waiting for another process, with or without its lock.
+        self.flight_checked = False
+        self.update(QUEUED, 0.0, self.message)
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def update(self, status: Optional[str] = None, progress: Optional[float] = None, message: Optional[str] = None):
+        """Records a status event and makes it the job's current state."""
+        with self._lock:
+            self.status = status or self.status
+            self.progress = self.progress if progress is None else progress
+            self.message = message or self.message
+            self._events.append({
+                "time": time.time(), "status": self.status, "progress": self.progress, "message": self.message,
+            })
+            if self.status in FINISHED_STATUSES:
+                self.finished_at = time.time()
+                self._finished.set()
+                JOB_SECONDS.observe(self.finished_at - self.created_at, status=self.status)
+
+    def events(self, since: int = 0) -> List[Dict[str, Any]]:
+        """Returns the status events from index `since` on (poll with the count seen so far)."""
+        with self._lock:
+            return list(self._events[since:])
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the job is finished; returns False on timeout."""
+        return self._finished.wait(timeout)
+
+class AnalysisPipeline:
+    """
+    Runs analysis jobs through download, extraction and inference stages.
+
+    Downloads and extraction run in small thread pools (they wait on the network and
+    ffmpeg). Inference runs in as many threads as the classifier can serve at once
+    (its `max_concurrent_inferences`), so its inference slots, or an inference
+    worker's micro-batcher, see concurrent requests.
+    """
+
+    def __init__(
+        self,
+        classifier,
+        result_cache=None,
+        download_workers: int = 2,
+        extract_workers: int = 2,
+        inference_workers: Optional[int] = None,
+        queue_size: int = 2,
+        max_jobs: int = 100,
+        top_k: int = 5,
+        preflight: Optional[Preflight] = None,
+        admission_policy: Optional[AdmissionPolicy] = None,
+        lock_dir: Optional[str] = None,
+        lock_timeout: float = 600.0,
+        early_exit_policy: Optional[EarlyExitPolicy] = None,
+        scratch: Optional[ScratchSpace] = None,
+    ):
+        """
+        Args:
+            classifier: An AccentClassifier or an InferenceClient.
+            result_cache (Optional[ResultCache]): Looked up on submit, filled when a job is done.
+            preflight (Optional[Preflight]): If given, URL jobs read the video's metadata first
+                and `admission_policy` may reject them, trim their window or pick a cheaper
+                audio format before anything is downloaded.
+            admission_policy (Optional[AdmissionPolicy]): Defaults to `AdmissionPolicy()`.
+            lock_dir (Optional[str]): A directory shared with other processes' pipelines (and
+                `result_cache` file); URL jobs then take a cross-process lock before downloading.
+            lock_timeout (float): Longest wait in seconds for another process's identical job
+                before doing the work anyway.
+            early_exit_policy (Optional[EarlyExitPolicy]): When progressive jobs stop.
+                Defaults to `EarlyExitPolicy()`.
+            scratch (Optional[ScratchSpace]): Where downloads are written, within its quota.
+                Defaults to the process-wide `get_scratch_space()`.
+            download_workers (int): Concurrent downloads.
+            extract_workers (int): Concurrent ffmpeg decodes.
+            inference_workers (Optional[int]): Concurrent classifications. Defaults to the
+                classifier's `max_concurrent_inferences` (1 if it has none).
+            queue_size (int): Capacity of each queue between stages.
+            max_jobs (int): Finished jobs kept for polling; the oldest are forgotten first.
+            top_k (int): The number of predictions per job.
+        """
+        self.classifier = classifier
+        self.result_cache = result_cache
+        self.max_jobs = max_jobs
+        self.top_k = top_k
+        self.preflight = preflight
+        self.admission_policy = admission_policy or AdmissionPolicy()
+        self.early_exit_policy = early_exit_policy or EarlyExitPolicy()
+        self.scratch = scratch or get_scratch_space()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        # Unfinished jobs by cache key, for single-flight submissions.
+        self._inflight: Dict[str, Job] = {}
+        if lock_dir and not cross_process_locks_supported():
+            logger.warning("Cross-process single-flight is not supported on this platform; using in-process only.")
+            lock_dir = None
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        # Jobs waiting for another process's identical job: (job, its lock, give-up time).
+        self._parked: List[Any] = []
+        self._parked_changed = threading.Condition()
+        if lock_dir:
+            threading.Thread(target=self._watch_parked, name="pipeline-flight-watcher", daemon=True).start()
+        # Intake is unbounded so submitting never blocks a UI thread; the stages are bounded.
+        self._download_queue: "queue.Queue[Job]" = queue.Queue()
+        self._extract_queue: "queue.Queue[Job]" = queue.Queue(maxsize=queue_size)
+        self._inference_queue: "queue.Queue[Job]" = queue.Queue(maxsize=queue_size)
+        if inference_workers is None:
+            inference_workers = getattr(classifier, "max_concurrent_inferences", 1)
+
+        stages = [
+            ("download", self._download_queue, self._download, self._extract_queue, download_workers),
+            ("extract", self._extract_queue, self._extract, self._inference_queue, extract_workers),
+            ("inference", self._inference_queue, self._classify, None, inference_workers),
+        ]
+        for name, inbox, handler, outbox, workers in stages:
+            for i in range(workers):
+                threading.Thread(
+                    target=self._stage_worker, args=(name, inbox, handler, outbox),
+                    name=f"pipeline-{name}-{i}", daemon=True,
+                ).start()
+
+    def submit(
+        self,
+        url: str,
+        start_offset: float = 0.0,
+        max_duration: Optional[float] = None,
+        segmented: bool = False,
+        use_cache: bool = True,
+        profile: bool = False,
+        progressive: bool = False,
+    ) -> str:
+        """
+        Queues an analysis of the [start_offset, start_offset + max_duration] window of `url`.
+
+        Set `profile` to write a cProfile dump of each stage (and a torch.profiler
+        trace of inference) for this job to ACCENT_PROFILE_DIR. Set `progressive` to
+        stop classifying (and streaming) once the early exit policy is satisfied.
+
+        Returns:
+            str: The job ID to poll with `get`; an identical unfinished job's ID if there is one.
+        """
+        options = self._options(start_offset, max_duration, segmented, progressive)
+        job = Job(url, options, profile, use_cache)
+        return self._start(job, get_clean_youtube_url(url) or url, self._download_queue)
+
+    def submit_media(
+        self,
+        media: MediaSource,
+        name: str,
+        start_offset: float = 0.0,
+        max_duration: Optional[float] = None,
+        segmented: bool = False,
+        use_cache: bool = True,
+        profile: bool = False,
+        progressive: bool = False,
+    ) -> str:
+        """
+        Queues an analysis of an uploaded file (its bytes) or a local media path.
+
+        The job skips the download stage and goes straight to extraction, where the
+        media is decoded from memory (see `load_media_audio`).
+
+        Returns:
+            str: The job ID to poll with `get`; an identical unfinished job's ID if there is one.
+        """
+        options = self._options(start_offset, max_duration, segmented, progressive)
+        job = Job(name, options, profile, use_cache)
+        if isinstance(media, str):
+            stat = os.stat(media)
+            source_id = f"file:{os.path.abspath(media)}:{stat.st_size}:{stat.st_mtime_ns}"
+            job.media_source = media
+        else:
+            job.media_source = read_media_bytes(media)
+            source_id = f"upload:{hashlib.sha256(job.media_source).hexdigest()}"
+        return self._start(job, source_id, self._extract_queue)
+
+    def _options(
+        self, start_offset: float, max_duration: Optional[float], segmented: bool, progressive: bool
+    ) -> Dict[str, Any]:
+        """The job options, which are also part of its result cache key."""
+        if segmented and progressive:
+            raise ValueError("A job can be segmented or progressive, not both.")
+        options = {"start_offset": start_offset, "max_duration": max_duration, "segmented": segmented}
+        if progressive:
+            # Only set for progressive jobs, so the cache keys of full analyses stay as they were.
+            options["progressive"] = self.early_exit_policy.as_dict()
+        return options
+
+    def _start(self, job: Job, source_id: str, first_stage: "queue.Queue[Job]") -> str:
+        """
+        Joins an identical unfinished job, or finishes the job from the result cache,
+        or else queues it at `first_stage`. Jobs that skip the cache or are profiled
+        always run on their own (later identical requests may still join them).
+
+        Returns:
+            str: The ID of the job the caller should poll.
+        """
+        job.source_id = source_id
+        job.cache_key = self._result_key(job)
+        may_join = job.use_cache and not job.profile
+        with self._jobs_lock:
+            leader = self._inflight.get(job.cache_key)
+            if may_join and leader is not None and not leader.finished:
+                leader.joined += 1
+                logger.info(f"Request for {job.url} joined in-flight job {leader.id} ({leader.joined} joined)")
+                return leader.id
+
+        cached = self.result_cache.get(job.cache_key) if self.result_cache is not None and job.use_cache else None
+        if cached and self._finish_from_cache(job, cached):
+            self._remember(job)
+            return job.id
+
+        with self._jobs_lock:
+            # Another thread may have started the same request while the cache was read.
+            leader = self._inflight.get(job.cache_key)
+            if may_join and leader is not None and not leader.finished:
+                leader.joined += 1
+                return leader.id
+            self._inflight[job.cache_key] = job
+        self._remember(job)
+
+        # May block while extraction is full; uploads are few and already in memory.
+        job.enqueued_at = time.perf_counter()
+        first_stage.put(job)
+        logger.info(f"Queued analysis job {job.id} for {job.url}")
+        return job.id
+
+    def _result_key(self, job: Job) -> str:
+        """The result cache key of the job's media, options and whether VAD ran."""
+        return make_cache_key(job.source_id, self.classifier.model_version, self.top_k, vad=job.vad, **job.options)
+
+    def _finish_from_cache(self, job: Job, cached: Any) -> bool:
+        """Completes the job with a result cache entry; False if the entry has the wrong shape."""
+        if job.options["segmented"] or job.options.get("progressive"):
+            if not isinstance(cached, dict):
+                return False
+            result = {"top_k": cached["top_k"], "segments": cached.get("segments"), "cached": True}
+            if job.options.get("progressive"):
+                result["progressive"] = cached["progressive"]
+        else:
+            result = {"top_k": cached, "segments": None, "cached": True}
+        job.media_source = None
+        self._finish(job, DONE, "Loaded a cached result for this media.", result)
+        return True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Returns the job with this ID, or None if it is unknown or was forgotten."""
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Jobs waiting in front of each stage."""
+        return {
+            "download": self._download_queue.qsize(),
+            "extract": self._extract_queue.qsize(),
+            "inference": self._inference_queue.qsize(),
+        }
+
+    def _remember(self, job: Job):
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            finished = [job_id for job_id, j in self._jobs.items() if j.finished]
+            for job_id in finished[: max(0, len(self._jobs) - self.max_jobs)]:
+                del self._jobs[job_id]
+
+    def _stage_worker(
+        self,
+        name: str,
+        inbox: "queue.Queue[Job]",
+        handler: Callable[[Job], bool],
+        outbox: Optional["queue.Queue[Job]"],
+    ):
+        while True:
+            job = inbox.get()
+            queue_wait = time.perf_counter() - job.enqueued_at if job.enqueued_at else None
+            try:
+                with trace(job.id), span(f"pipeline_{name}", queue_wait_seconds=queue_wait) as s, \
+                        profiled(f"{job.id}-{name}", job.profile, torch_trace=name == "inference"):
+                    passed_on = handler(job)
+                    if job.finished and job.status != DONE:
+                        s["status"] = job.status
+            except Exception as e:
+                logger.error(f"Job {job.id} failed during {job.status}. Error: {e}")
+                self._finish(job, FAILED, "An unexpected error occurred. Please try a different video.")
+                continue
+            if passed_on and outbox is not None:
+                # Blocks while the next stage is full, holding this stage back.
+                job.enqueued_at = time.perf_counter()
+                outbox.put(job)
+
+    def _finish(self, job: Job, status: str, message: str, result: Optional[Dict[str, Any]] = None):
+        """Ends a job and drops its working files and audio."""
+        if job.scratch is not None:
+            job.scratch.release()
+            job.scratch = None
+        if job.chunks is not None:
+            job.chunks.close()
+            job.chunks = None
+        job.waveform = None
+        job.result = result
+        if status != DONE:
+            job.error = message
+        job.update(status, 1.0 if status == DONE else None, message)
+        # After the result is stored, so a process waiting on the lock finds it in the cache.
+        if job.flight_lock is not None:
+            job.flight_lock.release()
+            job.flight_lock = None
+        with self._jobs_lock:
+            if self._inflight.get(job.cache_key) is job:
+                del self._inflight[job.cache_key]
+
+    def _admit(self, job: Job) -> bool:
+        """Runs the preflight and applies the admission policy; False if the job was rejected."""
+        job.update(DOWNLOADING, 0.0, "Checking the video...")
+        job.metadata = self.preflight.probe(job.url)
+        job.admission = self.admission_policy.decide(
+            job.metadata, start_offset=job.options["start_offset"], max_duration=job.options["max_duration"]
+        )
+        if job.admission["action"] == REJECT:
+            self._finish(job, REJECTED, job.admission["reason"])
+            return False
+        if job.admission["action"] == TRIM:
+            logger.info(f"Job {job.id}: {job.admission['reason']}")
+        return True
+
+    def _window(self, job: Job):
+        """The (start_offset, max_duration) to fetch and decode, after any admission trim."""
+        if job.admission is not None:
+            return job.admission["start_offset"], job.admission["max_duration"]
+        return job.options["start_offset"], job.options["max_duration"]
+
+    def _lead(self, job: Job) -> bool:
+        """
+        Takes the cross-process lock for the job. If another process holds it (it is
+        running the same request), parks the job for `_watch_parked` and returns False.
+        """
+        lock = FlightLock(self.lock_dir, job.cache_key)
+        if lock.acquire(blocking=False):
+            job.flight_lock = lock
+            job.flight_checked = True
+            return True
+        job.update(DOWNLOADING, 0.0, "Another server is already analyzing this video; waiting for its result...")
+        with self._parked_changed:
+            self._parked.append((job, lock, time.monotonic() + self.lock_timeout))
+            self._parked_changed.notify()
+        return False
+
+    def _watch_parked(self):
+        """Re-checks parked jobs' locks and sends each back to the download stage when it is free."""
+        while True:
+            with self._parked_changed:
+                while not self._parked:
+                    self._parked_changed.wait()
+                parked = list(self._parked)
+            for entry in parked:
+                job, lock, give_up_at = entry
+                acquired = lock.acquire(blocking=False)
+                if not acquired and time.monotonic() < give_up_at:
+                    continue
+                with self._parked_changed:
+                    self._parked.remove(entry)
+                try:
+                    with trace(job.id):
+                        self._resume(job, lock, acquired)
+                except Exception as e:
+                    logger.error(f"Job {job.id} failed while waiting for another process. Error: {e}")
+                    lock.release()
+                    self._finish(job, FAILED, "An unexpected error occurred. Please try a different video.")
+            time.sleep(DEFAULT_POLL_SECONDS)
+
+    def _resume(self, job: Job, lock: FlightLock, acquired: bool):
+        """Finishes a parked job with the other process's result, or queues it to do the work here."""
+        if acquired:
+            cached = self.result_cache.get(job.cache_key) if self.result_cache is not None and job.use_cache else None
+            if cached and self._finish_from_cache(job, cached):
+                lock.release()
+                return
+            # The other process failed or has no shared cache: do the work here.
+            job.flight_lock = lock
+        else:
+            logger.warning(f"Job {job.id}: gave up waiting for another process after {self.lock_timeout:.0f}s")
+        job.flight_checked = True
+        job.enqueued_at = time.perf_counter()
+        self._download_queue.put(job)
+
+    def _download(self, job: Job) -> bool:
+        if self.lock_dir and not job.flight_checked and not self._lead(job):
+            return False
+        if self.preflight is not None and not self._admit(job):
+            return False
+        job.update(DOWNLOADING, 0.0, "Downloading...")
+
+        def progress_hook(d: Dict[str, Any]):
+            if d.get("status") == "downloading":
+                percent_str = d.get("_percent_str", "0.0%").strip().replace("%", "")
+                try:
+                    progress = float(percent_str) / 100.0
+                except ValueError:
+                    progress = None
+                job.update(progress=progress, message=f"Downloading... (ETA: {d.get('_eta_str', 'N/A')})")
+            elif d.get("status") == "finished":
+                job.update(progress=1.0, message="Download complete.")
+
+        start_offset, max_duration = self._window(job)
+        chosen_format = job.admission["format"] if job.admission else None
+        if job.options.get("progressive"):
+            job.update(DOWNLOADING, 0.0, "Finding the audio stream...")
+            # The preflight has just read the format URLs, unless its metadata came from the cache.
+            job.stream = self.preflight.stream(job.url, chosen_format) if self.preflight is not None else None
+            if job.stream is None:
+                job.stream = resolve_stream_url(
+                    job.url, f"{chosen_format}/{AUDIO_ONLY_FORMAT}" if chosen_format else AUDIO_ONLY_FORMAT
+                )
+            if job.stream is not None:
+                job.update(progress=1.0, message="Audio stream found. Waiting for the model...")
+                return True
+            # Some hosts only work through a full download; classify that progressively instead.
+        # Waits while other jobs' files fill the scratch quota.
+        job.scratch = self.scratch.acquire(
+            job.admission["estimated_bytes"] if job.admission else None,
+            on_wait=lambda: job.update(DOWNLOADING, 0.0, "Waiting for other analyses to free up space..."),
+        )
+        job.media_path = download_video(
+            job.url, job.scratch.path, progress_callback=progress_hook, audio_only=True,
+            start_offset=start_offset, max_duration=max_duration,
+            # Fall back to the default selection if the format has gone since the metadata was cached.
+            format_selector=f"{chosen_format}/{AUDIO_ONLY_FORMAT}" if chosen_format else None,
+        )
+        if not job.media_path:
+            self._finish(job, FAILED, "Could not download the video. Please check if the URL is public and valid.")
+            return False
+        job.update(progress=1.0, message="Download complete. Waiting for extraction...")
+        return True
+
+    def _extract(self, job: Job) -> bool:
+        if job.stream is not None:
+            # Starts the decode (and download) now, while the job waits for the model.
+            start_offset, max_duration = self._window(job)
+            job.chunks = PrefetchedChunks(
+                stream_audio_chunks(
+                    job.stream["url"], chunk_seconds=self.early_exit_policy.chunk_seconds, start_offset=start_offset,
+                    max_duration=max_duration, http_headers=job.stream["http_headers"],
+                ),
+                name=f"pipeline-stream-{job.id[:8]}",
+            )
+            job.update(EXTRACTING, 0.0, "Streaming audio. Waiting for the model...")
+            return True
+        job.update(EXTRACTING, 0.0, "Extracting audio...")
+        max_duration = self._window(job)[1]
+        if job.media_source is not None:
+            waveform = load_media_audio(
+                job.media_source, start_offset=job.options["start_offset"], max_duration=max_duration
+            )
+            job.media_source = None
+            if waveform is None:
+                self._finish(job, REJECTED, "Could not read any audio from this file.")
+                return False
+            return self._trim(job, waveform)
+
+        # The download already starts at start_offset; decoding stops at the window end.
+        waveform = extract_audio_array(job.media_path, max_duration=max_duration)
+        if waveform is None:
+            audio_filename = f"{os.path.basename(job.media_path)}.wav"
+            seconds = max_duration or (job.metadata or {}).get("duration")
+            if seconds and not job.scratch.expect(
+                seconds * WAV_BYTES_PER_SECOND, timeout=WAV_SPACE_TIMEOUT_SECONDS,
+                on_wait=lambda: job.update(message="Waiting for other analyses to free up space..."),
+            ):
+                self._finish(job, FAILED, "The server is out of space for this analysis. Please try again later.")
+                return False
+            job.audio_path = extract_audio(
+                job.media_path, os.path.join(job.scratch.path, audio_filename), max_duration=max_duration
+            )
+            if not job.audio_path:
+                self._finish(job, REJECTED, "Failed to extract audio. The video might not have an audio track.")
+                return False
+            # Only the WAV is needed from here on.
+            job.scratch.discard(job.media_path)
+            job.media_path = None
+            # classify_audio reads the WAV as it is: no VAD, so not the result the cache key promises.
+            job.vad = False
+            job.update(progress=1.0, message="Audio extracted. Waiting for the model...")
+            return True
+
+        return self._trim(job, waveform)
+
+    def _trim(self, job: Job, waveform) -> bool:
+        # Drop silence and music beds so they neither dilute the prediction nor cost compute.
+        job.waveform, job.vad_stats = trim_silence(waveform)
+        if job.vad_stats["kept_seconds"] < MIN_SPEECH_SECONDS:
+            self._finish(
+                job, REJECTED,
+                f"Too little speech: only {job.vad_stats['kept_seconds']:.1f}s found "
+                f"(at least {MIN_SPEECH_SECONDS:.0f}s needed). Try a later start time or a longer window."
+            )
+            return False
+        # The decoded audio is all the next stage needs.
+        if job.scratch is not None:
+            job.scratch.release()
+            job.scratch = None
+        job.update(progress=1.0, message="Audio extracted. Waiting for the model...")
+        return True
+
+    def _classify(self, job: Job) -> bool:
+        job.update(CLASSIFYING, 0.0, "Analyzing accent...")
+        if job.options.get("progressive") and (job.stream is not None or job.waveform is not None):
+            return self._classify_progressive(job)
+        audio = job.waveform if job.waveform is not None else job.audio_path
+        segments = None
+        if job.options["segmented"]:
+            analysis = self.classifier.classify_segments(audio, top_k=self.top_k)
+            results, segments = analysis["top_k"], self._source_times(job, analysis["segments"])
+            analysis = {"top_k": results, "segments": segments}
+        elif job.waveform is not None:
+            results = self.classifier.classify_waveform(job.waveform, top_k=self.top_k)
+        else:
+            results = self.classifier.classify_audio(job.audio_path, top_k=self.top_k)
+
+        if not results:
+            self._finish(job, REJECTED, "Could not classify accent. Audio may be too short or silent.")
+            return False
+        if self.result_cache is not None:
+            key = job.cache_key if job.vad else self._result_key(job)
+            self.result_cache.put(key, analysis if job.options["segmented"] else results)
+        self._finish(job, DONE, "Analysis complete.", {"top_k": results, "segments": segments, "cached": False})
+        logger.info(f"Analysis job {job.id} finished in {job.finished_at - job.created_at:.1f}s")
+        return False
+
+    def _source_times(self, job: Job, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Moves segment times from the classified audio to the media's timeline: through the
+        VAD's kept intervals (segments of trimmed audio skip the dropped silence) and
+        then past the start offset the audio was decoded from.
+        """
+        start_offset = self._window(job)[0]
+        intervals = job.vad_stats["intervals"] if job.vad and job.vad_stats else None
+        mapped = []
+        for segment in segments:
+            start, end = segment["start"], segment["end"]
+            if intervals:
+                start, end = to_source_time(start, intervals), to_source_time(end, intervals, end=True)
+            mapped.append(dict(segment, start=start_offset + start, end=start_offset + end))
+        return mapped
+
+    def _classify_progressive(self, job: Job) -> bool:
+        policy = self.early_exit_policy
+        chunks = job.chunks if job.chunks is not None else chunk_waveform(job.waveform, chunk_seconds=policy.chunk_seconds)
+        window = self._window(job)[1]
+
+        def on_update(partial: Dict[str, Any]):
+            best = partial["top_k"][0]
+            job.update(
+                progress=min(partial["audio_seconds"] / window, 1.0) if window else None,
+                message=f"Analyzed {partial['audio_seconds']:.0f}s: {best['label']} "
+                        f"(confidence {partial['confidence']:.0%})",
+            )
+
+        analysis = classify_progressive(
+            self.classifier, chunks, policy, top_k=self.top_k,
+            # Audio decoded in the extract stage has already been through the VAD.
+            vad=job.stream is not None, on_update=on_update,
+        )
+        if not analysis["top_k"]:
+            self._finish(job, REJECTED, "Could not classify accent. The audio may have too little speech.")
+            return False
+        details = {key: value for key, value in analysis.items() if key != "top_k"}
+        if self.result_cache is not None:
+            self.result_cache.put(job.cache_key, {"top_k": analysis["top_k"], "progressive": details})
+        self._finish(job, DONE, "Analysis complete.", {
+            "top_k": analysis["top_k"], "segments": None, "cached": False, "progressive": details,
+        })
+        logger.info(
+            f"Progressive job {job.id} used {analysis['audio_seconds']:.0f}s of audio "
+            f"({analysis['stop_reason']}) and finished in {job.finished_at - job.created_at:.1f}s"
+        )
+        return False
@@ -0,0 +1,382 @@
+# rem_accent_checker/utils/preflight.py
+"""
+Metadata preflight and admission control, run before any media bytes are fetched.
+
+`Preflight.probe` asks yt-dlp for a video's metadata only (`extract_info(download=False)`)
+and condenses it to what the admission decision needs: duration, live status and
+the available audio formats with their estimated sizes. Results are cached by the
+normalized video ID, so previewing a URL and then analyzing it costs one extractor
+round trip. Failures and live streams are not settled, so they are only remembered
+in memory for a short while; that still saves a UI from re-probing a bad URL (up to
+the socket timeout each time) on every rerun. `start_probe` runs the probe in the
+background, and concurrent probes of one video share a single extractor call.
+The audio formats' direct URLs from the last probe are kept in memory for a while
+(`stream`), so a progressive analysis can stream one without another extractor call.
+
+`AdmissionPolicy.decide` turns that metadata and a requested analysis window into
+accept / trim / reject, and picks the cheapest audio-only format that is still good
+enough for 16 kHz speech.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from .downloader import get_clean_youtube_url
+from .metrics import span
+from .result_cache import ResultCache
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_METADATA_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "accent_classifier", "metadata.sqlite3")
+# Titles, durations and formats rarely change, but format URLs and live status do.
+DEFAULT_METADATA_TTL_SECONDS = 6 * 3600
+# How long a failed probe or a live stream's metadata is reused (in memory only).
+DEFAULT_RECENT_TTL_SECONDS = 60.0
+# How long a probe's direct format URLs are reused; hosts expire them after a few hours.
+DEFAULT_STREAM_TTL_SECONDS = 30 * 60.0
+
+# Admission outcomes.
+ACCEPT = "accept"
+TRIM = "trim"
+REJECT = "reject"
+
+def metadata_key(url: str) -> str:
+    """A cache key that is the same for every URL form of one video (youtu.be, shorts, ?si=...)."""
+    clean_url = get_clean_youtube_url(url)
+    if clean_url:
+        return f"youtube:{clean_url.rsplit('=', 1)[-1]}"
+    # Direct links: the fragment never reaches the server.
+    return f"url:{url.strip().split('#', 1)[0]}"
+
+def _format_bytes(fmt: Dict[str, Any], duration: Optional[float]) -> Optional[float]:
+    """The format's size, or an estimate from its bitrate (kbit/s) and the duration."""
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return float(size)
+    bitrate = fmt.get("abr") or fmt.get("tbr")
+    if bitrate and duration:
+        return bitrate * 1000 / 8 * duration
+    return None
+
+def summarize_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Condenses a yt-dlp info dictionary to the fields the admission policy uses.
+
+    Returns:
+        Dict[str, Any]: 'id', 'title', 'duration' (None if unknown), 'is_live',
+        'has_audio' (None if unknown) and 'audio_formats', a list of audio-only
+        formats with 'format_id', 'ext', 'acodec', 'abr' and 'estimated_bytes'.
+    """
+    duration = info.get("duration")
+    formats = info.get("formats") or [info]
+    audio_formats: List[Dict[str, Any]] = []
+    for fmt in formats:
+        acodec, vcodec = fmt.get("acodec"), fmt.get("vcodec")
+        if acodec not in (None, "none") and vcodec == "none":
+            audio_formats.append({
+                "format_id": fmt.get("format_id"),
+                "ext": fmt.get("ext"),
+                "acodec": acodec,
+                "abr": fmt.get("abr"),
+                "estimated_bytes": _format_bytes(fmt, duration),
+            })
+
+    # Generic extractors (direct file links) often leave the codecs unknown.
+    codecs_known = any(fmt.get("acodec") is not None for fmt in formats)
+    has_audio = any(fmt.get("acodec") not in (None, "none") for fmt in formats) if codecs_known else None
+    return {
+        "id": info.get("id"),
+        "title": info.get("title"),
+        "duration": float(duration) if duration else None,
+        "is_live": bool(info.get("is_live")) or info.get("live_status") in ("is_live", "is_upcoming"),
+        "has_audio": has_audio,
+        "audio_formats": audio_formats,
+    }
+
+class Preflight:
+    """Fetches and caches video metadata without downloading any media."""
+
+    def __init__(
+        self,
+        cache: Optional[ResultCache] = None,
+        timeout: float = 30.0,
+        recent_ttl_seconds: float = DEFAULT_RECENT_TTL_SECONDS,
+        background_workers: int = 2,
+    ):
+        """
+        Args:
+            cache (Optional[ResultCache]): Where summaries are kept, keyed by `metadata_key`.
+                Use a separate file from the result cache (see DEFAULT_METADATA_CACHE_PATH).
+            timeout (float): Socket timeout for the extractor's requests.
+            recent_ttl_seconds (float): How long failures and live streams' summaries,
+                which are never written to `cache`, are reused from memory.
+            background_workers (int): Concurrent `start_probe` probes.
+        """
+        self.cache = cache
+        self.timeout = timeout
+        self.recent_ttl_seconds = recent_ttl_seconds
+        self.background_workers = background_workers
+        # Unsettled results by key: (expiry on the monotonic clock, summary or None).
+        self._recent: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        # Direct audio stream URLs by key and format ID: (expiry, {format_id: stream}).
+        self._streams: Dict[str, Tuple[float, Dict[Optional[str], Dict[str, Any]]]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def probe(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the `summarize_info` summary for `url`, from the cache when possible.
+        Waits for a probe of the same video that is already running instead of starting another.
+
+        Returns:
+            Optional[Dict[str, Any]]: The summary, or None if the extractor failed.
+        """
+        key = metadata_key(url)
+        future, owner = self._claim(key)
+        if owner:
+            self._run(url, key, future)
+        return future.result()
+
+    def start_probe(self, url: str) -> "Future[Optional[Dict[str, Any]]]":
+        """
+        Like `probe`, but returns at once with a future of the summary; the extractor
+        runs on a background thread. A cached summary gives a future that is already done.
+        """
+        key = metadata_key(url)
+        future, owner = self._claim(key)
+        if owner:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.background_workers, thread_name_prefix="preflight")
+            self._executor.submit(self._run, url, key, future)
+        return future
+
+    def stream(self, url: str, format_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        The direct URL of one of the video's formats, if a probe read it in the last
+        DEFAULT_STREAM_TTL_SECONDS; never calls the extractor.
+
+        Args:
+            url (str): The video URL.
+            format_id (Optional[str]): The format; None for the media URL of a single-file
+                source (a direct link).
+
+        Returns:
+            Optional[Dict[str, Any]]: 'url' and 'http_headers', like `downloader.resolve_stream_url`.
+        """
+        with self._lock:
+            streams = self._streams.get(metadata_key(url))
+        if streams is None or streams[0] <= time.monotonic():
+            return None
+        return streams[1].get(format_id)
+
+    def _claim(self, key: str) -> Tuple[Future, bool]:
+        """A future for `key`'s summary, and whether the caller must run the probe to fill it."""
+        cached = self.cache.get(key) if self.cache is not None else None
+        with self._lock:
+            recent = self._recent.get(key)
+            if cached is None and recent is not None and recent[0] > time.monotonic():
+                cached = recent[1]
+            elif cached is None and key in self._inflight:
+                return self._inflight[key], False
+            elif cached is None:
+                future = self._inflight[key] = Future()
+                return future, True
+        # A settled summary, or a recent failure (None) or live stream.
+        future = Future()
+        future.set_result(cached)
+        return future, False
+
+    def _run(self, url: str, key: str, future: Future):
+        metadata = None
+        try:
+            info = self._extract(url)
+            if info is not None:
+                metadata = summarize_info(info)
+                self._remember_streams(key, info)
+        finally:
+            # Live status changes, so only settled videos go to the cache.
+            if metadata is not None and not metadata["is_live"]:
+                if self.cache is not None:
+                    self.cache.put(key, metadata)
+            with self._lock:
+                now = time.monotonic()
+                if metadata is None or metadata["is_live"]:
+                    self._recent = {k: v for k, v in self._recent.items() if v[0] > now}
+                    self._recent[key] = (now + self.recent_ttl_seconds, metadata)
+                del self._inflight[key]
+            future.set_result(metadata)
+
+    def _extract(self, url: str) -> Optional[Dict[str, Any]]:
+        import yt_dlp
+        ydl_opts = {
+            'quiet': True,
+            'skip_download': True,
+            'noplaylist': True,
+            'nocolor': True,
+            'socket_timeout': self.timeout,
+        }
+        with span("preflight") as s:
+            try:
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info = ydl.extract_info(url, download=False)
+            except Exception as e:
+                logger.warning(f"Could not read metadata for {url}. Error: {e}")
+                s["status"] = "error"
+                return None
+        return info
+
+    def _remember_streams(self, key: str, info: Dict[str, Any]):
+        """Keeps the direct URLs of the info's audio-only formats (and of a single-file source)."""
+        headers = info.get("http_headers") or {}
+        formats = info.get("formats") or [info]
+        streams: Dict[Optional[str], Dict[str, Any]] = {}
+        for fmt in formats:
+            if fmt.get("url") and fmt.get("vcodec") == "none" and fmt.get("acodec") not in (None, "none"):
+                streams[fmt.get("format_id")] = {"url": fmt["url"], "http_headers": fmt.get("http_headers") or headers}
+        if len(formats) == 1 and formats[0].get("url"):
+            streams[None] = {"url": formats[0]["url"], "http_headers": formats[0].get("http_headers") or headers}
+        with self._lock:
+            now = time.monotonic()
+            self._streams = {k: v for k, v in self._streams.items() if v[0] > now}
+            self._streams[key] = (now + DEFAULT_STREAM_TTL_SECONDS, streams)
+
+class AdmissionPolicy:
+    """
+    Decides, from preflight metadata, whether and how a video is downloaded.
+
+    Unknown facts never cause a rejection: direct links often report no duration or
+    codecs, and those downloads go ahead as before.
+    """
+
+    def __init__(
+        self,
+        max_analysis_seconds: Optional[float] = 600.0,
+        max_source_seconds: Optional[float] = None,
+        max_download_bytes: Optional[float] = 200e6,
+        min_audio_abr: float = 32.0,
+        allow_live: bool = False,
+    ):
+        """
+        Args:
+            max_analysis_seconds (Optional[float]): Longest window analyzed; longer or
+                open-ended requests are trimmed to it.
+            max_source_seconds (Optional[float]): Reject videos longer than this outright,
+                even though only a window would be fetched. None disables the check.
+            max_download_bytes (Optional[float]): Reject when the chosen format's estimated
+                size for the window is larger.
+            min_audio_abr (float): Lowest audio bitrate (kbit/s) worth using for speech.
+            allow_live (bool): Accept live and upcoming streams.
+        """
+        self.max_analysis_seconds = max_analysis_seconds
+        self.max_source_seconds = max_source_seconds
+        self.max_download_bytes = max_download_bytes
+        self.min_audio_abr = min_audio_abr
+        self.allow_live = allow_live
+
+    @classmethod
+    def from_env(cls) -> "AdmissionPolicy":
+        """Builds a policy from ACCENT_MAX_ANALYSIS_SECONDS, ACCENT_MAX_SOURCE_SECONDS,
+        ACCENT_MAX_DOWNLOAD_MB, ACCENT_MIN_AUDIO_ABR and ACCENT_ALLOW_LIVE; unset keeps the defaults."""
+        policy = cls()
+        env = os.environ
+        if env.get("ACCENT_MAX_ANALYSIS_SECONDS"):
+            policy.max_analysis_seconds = float(env["ACCENT_MAX_ANALYSIS_SECONDS"]) or None
+        if env.get("ACCENT_MAX_SOURCE_SECONDS"):
+            policy.max_source_seconds = float(env["ACCENT_MAX_SOURCE_SECONDS"]) or None
+        if env.get("ACCENT_MAX_DOWNLOAD_MB"):
+            policy.max_download_bytes = float(env["ACCENT_MAX_DOWNLOAD_MB"]) * 1e6 or None
+        if env.get("ACCENT_MIN_AUDIO_ABR"):
+            policy.min_audio_abr = float(env["ACCENT_MIN_AUDIO_ABR"])
+        if env.get("ACCENT_ALLOW_LIVE"):
+            policy.allow_live = env["ACCENT_ALLOW_LIVE"].lower() in ("1", "true", "yes")
+        return policy
+
+    def choose_format(self, metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The lowest-bitrate audio-only format at or above `min_audio_abr`, or None if none qualifies."""
+        candidates = [f for f in metadata["audio_formats"] if f.get("abr") and f["abr"] >= self.min_audio_abr]
+        return min(candidates, key=lambda f: f["abr"]) if candidates else None
+
+    def decide(
+        self,
+        metadata: Optional[Dict[str, Any]],
+        start_offset: float = 0.0,
+        max_duration: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Applies the policy to a requested window.
+
+        Args:
+            metadata (Optional[Dict[str, Any]]): From `Preflight.probe`; None accepts as requested.
+            start_offset (float): The requested window start.
+            max_duration (Optional[float]): The requested window length (None: to the end).
+
+        Returns:
+            Dict[str, Any]: 'action' (ACCEPT, TRIM or REJECT), 'reason' (a message for the
+            user when not accepted as-is), the 'start_offset' and 'max_duration' to download,
+            'format' (a yt-dlp format ID, or None for the default) and 'estimated_bytes'.
+        """
+        decision = {
+            "action": ACCEPT, "reason": None, "start_offset": start_offset, "max_duration": max_duration,
+            "format": None, "estimated_bytes": None,
+        }
+        if metadata is None:
+            return decision
+
+        def reject(reason: str) -> Dict[str, Any]:
+            decision.update(action=REJECT, reason=reason)
+            return decision
+
+        duration = metadata["duration"]
+        if metadata["is_live"] and not self.allow_live:
+            return reject("Live streams and premieres cannot be analyzed. Try again once the video has ended.")
+        if metadata["has_audio"] is False:
+            return reject("This video has no audio track.")
+        if duration is not None:
+            if start_offset >= duration:
+                return reject(f"The start time is past the end of the video ({duration:.0f}s long).")
+            if self.max_source_seconds and duration > self.max_source_seconds:
+                return reject(
+                    f"The video is {duration / 60:.0f} minutes long; "
+                    f"the limit is {self.max_source_seconds / 60:.0f} minutes."
+                )
+
+        if self.max_analysis_seconds and (max_duration is None or max_duration > self.max_analysis_seconds):
+            decision.update(
+                action=TRIM, max_duration=self.max_analysis_seconds,
+                reason=f"Only the first {self.max_analysis_seconds:.0f}s after the start time will be analyzed.",
+            )
+
+        chosen = self.choose_format(metadata)
+        if chosen is not None:
+            decision["format"] = chosen["format_id"]
+            if chosen["estimated_bytes"] and duration:
+                window = duration - start_offset
+                if decision["max_duration"] is not None:
+                    window = min(window, decision["max_duration"])
+                decision["estimated_bytes"] = chosen["estimated_bytes"] * window / duration
+        if (
+            self.max_download_bytes and decision["estimated_bytes"]
+            and decision["estimated_bytes"] > self.max_download_bytes
+        ):
+            return reject(
+                f"The download would be about {decision['estimated_bytes'] / 1e6:.0f} MB; "
+                f"the limit is {self.max_download_bytes / 1e6:.0f} MB. Try a shorter window."
+            )
+        return decision
+
+def format_metadata(metadata: Dict[str, Any]) -> str:
+    """A one-line description for previews, e.g. 'Talk title · 12:34 · audio from 48 kbps'."""
+    parts = [metadata.get("title") or "Untitled"]
+    if metadata.get("duration"):
+        minutes, seconds = divmod(int(metadata["duration"]), 60)
+        parts.append(f"{minutes}:{seconds:02d}")
+    if metadata.get("is_live"):
+        parts.append("live")
+    bitrates = sorted(f["abr"] for f in metadata.get("audio_formats", []) if f.get("abr"))
+    if bitrates:
+        parts.append(f"audio from {bitrates[0]:.0f} kbps")
+    return " · ".join(parts)
@@ -0,0 +1,229 @@
+# rem_accent_checker/utils/prefork.py
+"""
+Pre-fork serving: several inference worker processes sharing one copy of the model.
+
+`PreforkServer` loads the classifier once in the parent, moves its weights into
+shared memory (a bundle's weights are already a shared, memory-mapped file) and
+freezes the garbage collector's view of the loaded objects, then forks the
+workers. Every worker runs an `InferenceServer` with its own micro-batcher on the
+parent's listening socket, so the kernel spreads connections across them while
+the weight pages are mapped once for all of them. Each worker gets
+`cores // workers` torch threads so the workers together do not oversubscribe
+the CPU.
+
+The parent only supervises: it restarts a worker that dies and stops them all on
+SIGTERM/SIGINT. Metrics (/metrics) are per worker.
+
+POSIX only (fork). The torch engine is supported; onnxruntime sessions own
+thread pools that do not survive a fork, so with the onnx engine use
+`preload=False` (every worker loads its own session).
+"""
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from .inference_server import DEFAULT_HOST, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS, DEFAULT_PORT, InferenceServer
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# A worker that exits within this many seconds of starting is restarted only after a pause.
+RESTART_BACKOFF_SECONDS = 1.0
+
+def worker_thread_count(workers: int, cpus: Optional[int] = None) -> int:
+    """Torch intra-op threads for each of `workers` processes so that together they use each core once."""
+    cpus = cpus or os.cpu_count() or 1
+    return max(1, cpus // max(1, workers))
+
+def share_model_memory(classifier) -> int:
+    """
+    Moves the classifier's torch weights into shared memory before forking.
+
+    Forked workers would share the pages copy-on-write anyway, but weights in shared
+    memory can never be copied into a worker by a stray write, and they show up as
+    shared (not private) memory per worker. Weights from a bundle are memory-mapped
+    from the file already and are left where they are.
+
+    Returns:
+        int: The bytes of weights moved.
+
+    Raises:
+        ValueError: For the onnx engine, whose sessions cannot be shared across a fork.
+    """
+    if getattr(classifier, "onnx_engine", None) is not None:
+        raise ValueError("ONNX sessions cannot be shared across a fork; use preload=False with the onnx engine.")
+    model = getattr(classifier, "classifier", None)
+    if model is None or getattr(classifier, "bundle_path", None):
+        return 0
+    tensors = list(model.mods.parameters()) + list(model.mods.buffers())
+    moved = sum(t.numel() * t.element_size() for t in tensors if not t.is_shared())
+    model.mods.share_memory()
+    logger.info(f"Moved {moved / 1e6:.1f} MB of model weights into shared memory.")
+    return moved
+
+def _set_worker_threads(threads: int):
+    """Limits the math libraries of a worker process to `threads` threads."""
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "ACCENT_CLASSIFIER_THREADS"):
+        os.environ[name] = str(threads)
+    # Only if it is already loaded; a worker that loads the model itself picks up the environment.
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+class PreforkServer:
+    """A listening socket, a preloaded classifier and N forked inference workers serving it."""
+
+    def __init__(
+        self,
+        load_classifier: Callable[[], Any],
+        workers: int = 2,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        threads_per_worker: Optional[int] = None,
+        preload: bool = True,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        init_worker: Optional[Callable[[Any], None]] = None,
+    ):
+        """
+        Args:
+            load_classifier (Callable[[], Any]): Builds the classifier (an AccentClassifier
+                or anything with the same calls).
+            workers (int): Worker processes to fork.
+            threads_per_worker (Optional[int]): Torch threads per worker. Defaults to
+                `worker_thread_count(workers)`.
+            preload (bool): Load the model once in the parent and share it. With False
+                every worker loads its own copy after the fork (the memory baseline).
+            max_batch_size (int): Passed to each worker's micro-batcher.
+            max_wait_ms (float): Passed to each worker's micro-batcher.
+            init_worker (Optional[Callable]): Called with the classifier in every worker
+                after the fork, for per-process state such as open files (e.g. the
+                embedding store), which must not be inherited from the parent.
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Pre-fork serving needs os.fork, which this platform does not have.")
+        self.load_classifier = load_classifier
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or worker_thread_count(workers)
+        self.preload = preload
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.init_worker = init_worker
+        self.classifier = None
+        self._address = (host, port)
+        self._socket: Optional[socket.socket] = None
+        # Worker pid -> (slot, start time).
+        self._children: Dict[int, tuple] = {}
+        self._stopping = threading.Event()
+
+    @property
+    def url(self) -> str:
+        host, port = self._socket.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def worker_pids(self) -> List[int]:
+        return sorted(self._children)
+
+    def start(self):
+        """Binds the socket, loads and shares the model (if preloading) and forks the workers."""
+        self._socket = socket.create_server(self._address, backlog=128)
+        if self.preload:
+            _set_worker_threads(self.threads_per_worker)
+            self.classifier = self.load_classifier()
+            share_model_memory(self.classifier)
+            # Objects that exist now are never scanned by the workers' collectors, so
+            # their reference counts and GC headers stay untouched and their pages shared.
+            gc.collect()
+            gc.freeze()
+        for slot in range(self.workers):
+            self._spawn(slot)
+        logger.info(
+            f"Started {self.workers} inference workers ({self.threads_per_worker} threads each, "
+            f"{'shared' if self.preload else 'per-worker'} model) on {self.url}"
+        )
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._run_worker(slot)
+                code = 0
+            except BaseException as e:
+                logger.error(f"Inference worker {slot} failed. Error: {e}")
+            finally:
+                os._exit(code)
+        self._children[pid] = (slot, time.monotonic())
+
+    def _run_worker(self, slot: int):
+        """The body of a forked worker: serves until SIGTERM or SIGINT."""
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        _set_worker_threads(self.threads_per_worker)
+        classifier = self.classifier if self.preload else self.load_classifier()
+        if self.init_worker is not None:
+            self.init_worker(classifier)
+        server = InferenceServer(
+            classifier, max_batch_size=self.max_batch_size, max_wait_ms=self.max_wait_ms, listen_socket=self._socket,
+        )
+        # serve_forever runs on a thread so this one can wait for the signal and shut it down.
+        thread = threading.Thread(target=server.serve_forever, name=f"inference-worker-{slot}", daemon=True)
+        thread.start()
+        logger.info(f"Inference worker {slot} (pid {os.getpid()}) serving.")
+        while not stop.wait(0.5):
+            pass
+        server.shutdown()
+        server.server_close()
+
+    def serve_forever(self):
+        """Supervises the workers in the calling (main) thread until SIGTERM or SIGINT, then stops them."""
+        signal.signal(signal.SIGTERM, lambda *_: self._stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self._stopping.set())
+        try:
+            while not self._stopping.is_set():
+                self.reap_and_restart()
+                self._stopping.wait(0.5)
+        finally:
+            self.stop()
+
+    def reap_and_restart(self):
+        """Restarts workers that have exited (unless stopping)."""
+        for pid, (slot, started) in list(self._children.items()):
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done == 0:
+                continue
+            del self._children[pid]
+            if self._stopping.is_set():
+                continue
+            logger.warning(f"Inference worker {slot} (pid {pid}) exited with status {status}; restarting it.")
+            if time.monotonic() - started < RESTART_BACKOFF_SECONDS:
+                time.sleep(RESTART_BACKOFF_SECONDS)
+            self._spawn(slot)
+
+    def stop(self, timeout: float = 10.0):
+        """Asks every worker to finish, waits up to `timeout` seconds, then kills the rest."""
+        self._stopping.set()
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + timeout
+        while self._children and time.monotonic() < deadline:
+            for pid in list(self._children):
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    del self._children[pid]
+            time.sleep(0.05)
+        for pid in list(self._children):
+            logger.warning(f"Inference worker pid {pid} did not stop in {timeout:.0f}s; killing it.")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            del self._children[pid]
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
@@ -0,0 +1,293 @@
+# rem_accent_checker/utils/progressive.py
+"""
+Progressive classification with early exit.
+
+Instead of running the model over the whole clip, `classify_progressive` classifies
+successive chunks (6 s by default), keeps a running aggregate of the scores and
+stops as soon as the aggregate is confident enough (`EarlyExitPolicy`). When the
+chunks come from a streaming decoder (`utils.audio_utils.stream_audio_chunks`),
+stopping also ends the decode, and for a stream URL the download, so a clear
+speaker costs a fraction of the audio, latency and CPU.
+
+The aggregate is the same as `AccentClassifier.classify_segments`' "mean_log_prob":
+labels are ranked by their mean score (weighted by each chunk's speech seconds),
+and the posterior used for the stopping rule is the softmax of the mean cosine
+score times SCORE_SCALE, the scale the model's angular-margin softmax was trained
+with.
+
+`PrefetchedChunks` moves a streaming decode onto a thread of its own, a few chunks
+ahead of the classifier, so the thread running the model never waits on the network
+or ffmpeg.
+"""
+import os
+import queue
+import threading
+import time
+import numpy as np
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+from .metrics import span
+from .vad import trim_silence
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_SECONDS = 6.0
+# Scale of the additive angular margin softmax the CommonAccent ECAPA head was trained with.
+SCORE_SCALE = 30.0
+# Chunks with less speech than this after VAD are skipped.
+MIN_CHUNK_SPEECH_SECONDS = 1.0
+# More than any label set has; classify_batch caps top_k at the number of labels.
+ALL_LABELS = 1024
+# Chunks a PrefetchedChunks decodes ahead of its consumer.
+DEFAULT_PREFETCH_CHUNKS = 4
+
+# Why a progressive classification stopped.
+STOP_CONFIDENT = "confident"
+STOP_MARGIN = "margin"
+STOP_TIME_BUDGET = "time_budget"
+STOP_END_OF_AUDIO = "end_of_audio"
+
+class EarlyExitPolicy:
+    """When a progressive classification may stop before the end of the audio."""
+
+    def __init__(
+        self,
+        min_confidence: Optional[float] = 0.9,
+        min_margin: Optional[float] = None,
+        min_seconds: float = 12.0,
+        time_budget_seconds: Optional[float] = None,
+        chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+    ):
+        """
+        Args:
+            min_confidence (Optional[float]): Stop once the top label's posterior reaches this.
+            min_margin (Optional[float]): Stop once the top label's posterior leads the
+                runner-up's by this much.
+            min_seconds (float): Speech to classify before either threshold may stop it.
+            time_budget_seconds (Optional[float]): Stop with the current answer after this
+                much wall time, confident or not.
+            chunk_seconds (float): Audio per chunk (and per forward pass).
+        """
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.min_seconds = min_seconds
+        self.time_budget_seconds = time_budget_seconds
+        self.chunk_seconds = chunk_seconds
+
+    @classmethod
+    def from_env(cls) -> "EarlyExitPolicy":
+        """Builds a policy from ACCENT_EARLY_EXIT_CONFIDENCE, ACCENT_EARLY_EXIT_MARGIN,
+        ACCENT_EARLY_EXIT_MIN_SECONDS, ACCENT_EARLY_EXIT_BUDGET_SECONDS and ACCENT_EARLY_EXIT_CHUNK_SECONDS;
+        unset keeps the defaults, 0 disables a threshold."""
+        policy = cls()
+        env = os.environ
+        if env.get("ACCENT_EARLY_EXIT_CONFIDENCE"):
+            policy.min_confidence = float(env["ACCENT_EARLY_EXIT_CONFIDENCE"]) or None
+        if env.get("ACCENT_EARLY_EXIT_MARGIN"):
+            policy.min_margin = float(env["ACCENT_EARLY_EXIT_MARGIN"]) or None
+        if env.get("ACCENT_EARLY_EXIT_MIN_SECONDS"):
+            policy.min_seconds = float(env["ACCENT_EARLY_EXIT_MIN_SECONDS"])
+        if env.get("ACCENT_EARLY_EXIT_BUDGET_SECONDS"):
+            policy.time_budget_seconds = float(env["ACCENT_EARLY_EXIT_BUDGET_SECONDS"]) or None
+        if env.get("ACCENT_EARLY_EXIT_CHUNK_SECONDS"):
+            policy.chunk_seconds = float(env["ACCENT_EARLY_EXIT_CHUNK_SECONDS"])
+        return policy
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The settings, e.g. for a result cache key (they change the result)."""
+        return {
+            "min_confidence": self.min_confidence,
+            "min_margin": self.min_margin,
+            "min_seconds": self.min_seconds,
+            "time_budget_seconds": self.time_budget_seconds,
+            "chunk_seconds": self.chunk_seconds,
+        }
+
+    def stop_reason(self, confidence: float, margin: float, speech_seconds: float, elapsed: float) -> Optional[str]:
+        """Why to stop now, or None to keep going."""
+        if self.time_budget_seconds is not None and elapsed >= self.time_budget_seconds:
+            return STOP_TIME_BUDGET
+        if speech_seconds < self.min_seconds:
+            return None
+        if self.min_confidence is not None and confidence >= self.min_confidence:
+            return STOP_CONFIDENT
+        if self.min_margin is not None and margin >= self.min_margin:
+            return STOP_MARGIN
+        return None
+
+def chunk_waveform(waveform: np.ndarray, chunk_seconds: float = DEFAULT_CHUNK_SECONDS, sample_rate: int = 16000) -> Iterator[np.ndarray]:
+    """Yields successive `chunk_seconds` views of an in-memory waveform (the last one may be shorter)."""
+    chunk = max(1, int(chunk_seconds * sample_rate))
+    for start in range(0, waveform.shape[0], chunk):
+        yield waveform[start:start + chunk]
+
+class PrefetchedChunks:
+    """
+    Iterates a chunk source (e.g. `stream_audio_chunks`) on a background thread, up
+    to `max_chunks` ahead of the consumer, which blocks only when none is ready.
+
+    Iterate it like the source; an exception the source raises is raised by the
+    iteration. `close` (called by `classify_progressive` when it stops early) stops
+    the thread, which then closes the source, ending its decode and download.
+    """
+
+    _END = object()
+
+    def __init__(self, chunks: Iterable[np.ndarray], max_chunks: int = DEFAULT_PREFETCH_CHUNKS, name: str = "prefetch"):
+        """
+        Args:
+            chunks (Iterable[np.ndarray]): The chunk source; iterated only on the background thread.
+            max_chunks (int): Chunks kept ready at most.
+            name (str): The thread name.
+        """
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_chunks)
+        self._stopped = threading.Event()
+        self._exhausted = False
+        threading.Thread(target=self._run, args=(chunks,), name=name, daemon=True).start()
+
+    def _run(self, chunks: Iterable[np.ndarray]):
+        iterator = iter(chunks)
+        try:
+            for chunk in iterator:
+                if not self._put(chunk):
+                    break
+            else:
+                self._put(self._END)
+        except Exception as e:
+            self._put(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    def _put(self, item: Any) -> bool:
+        """Waits for room in the queue; False if the consumer closed it meanwhile."""
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self) -> "PrefetchedChunks":
+        return self
+
+    def __next__(self) -> np.ndarray:
+        if self._exhausted:
+            raise StopIteration
+        item = self._queue.get()
+        if item is self._END or isinstance(item, Exception):
+            self._exhausted = True
+            if isinstance(item, Exception):
+                raise item
+            raise StopIteration
+        return item
+
+    def close(self):
+        """Stops the background iteration; chunks not yet consumed are dropped."""
+        self._exhausted = True
+        self._stopped.set()
+
+def _posterior(mean_scores: np.ndarray) -> np.ndarray:
+    logits = SCORE_SCALE * mean_scores
+    exp = np.exp(logits - logits.max())
+    return exp / exp.sum()
+
+def classify_progressive(
+    classifier,
+    chunks: Iterable[np.ndarray],
+    policy: Optional[EarlyExitPolicy] = None,
+    top_k: int = 5,
+    sample_rate: int = 16000,
+    vad: bool = True,
+    on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Classifies chunks one at a time until the policy says the answer is settled.
+
+    Args:
+        classifier: An AccentClassifier or an InferenceClient (anything with `classify_batch`).
+        chunks (Iterable[np.ndarray]): Mono waveforms at `sample_rate`, in order, e.g. from
+            `chunk_waveform` or `stream_audio_chunks`. A generator is closed when
+            classification stops early, which stops a streaming decoder.
+        policy (Optional[EarlyExitPolicy]): Defaults to `EarlyExitPolicy()`.
+        top_k (int): The number of predictions to return.
+        sample_rate (int): The chunks' sample rate.
+        vad (bool): Drop silence from each chunk before classifying it (skip this if the
+            audio was already trimmed).
+        on_update (Optional[Callable]): Called after every classified chunk with the
+            running result, e.g. to report progress.
+
+    Returns:
+        Dict[str, Any]: 'top_k' ([{'label', 'score'}] on classify_audio's scale; empty
+        if no chunk had enough speech), 'audio_seconds' (audio decoded and looked at),
+        'speech_seconds' (audio classified), 'chunks' (chunks classified),
+        'confidence' and 'margin' (of the posterior), 'stop_reason' and 'elapsed_seconds'.
+    """
+    policy = policy or EarlyExitPolicy()
+    start = time.perf_counter()
+    labels: Dict[str, int] = {}
+    weighted_sum = np.zeros(0)
+    result = {
+        "top_k": [], "audio_seconds": 0.0, "speech_seconds": 0.0, "chunks": 0,
+        "confidence": 0.0, "margin": 0.0, "stop_reason": STOP_END_OF_AUDIO, "elapsed_seconds": 0.0,
+    }
+    iterator = iter(chunks)
+    with span("progressive_classify") as s:
+        try:
+            for chunk in iterator:
+                chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+                result["audio_seconds"] += chunk.shape[0] / sample_rate
+                if vad:
+                    chunk, _ = trim_silence(chunk, sample_rate=sample_rate)
+                speech_seconds = chunk.shape[0] / sample_rate
+                if speech_seconds < MIN_CHUNK_SPEECH_SECONDS:
+                    continue
+                scores = classifier.classify_batch([chunk], top_k=ALL_LABELS)[0]
+                if not scores:
+                    continue
+
+                for item in scores:
+                    labels.setdefault(item["label"], len(labels))
+                if weighted_sum.shape[0] < len(labels):
+                    weighted_sum = np.pad(weighted_sum, (0, len(labels) - weighted_sum.shape[0]))
+                for item in scores:
+                    weighted_sum[labels[item["label"]]] += speech_seconds * item["score"]
+                result["speech_seconds"] += speech_seconds
+                result["chunks"] += 1
+
+                mean_scores = weighted_sum / result["speech_seconds"]
+                posterior = np.sort(_posterior(mean_scores))[::-1]
+                result["confidence"] = float(posterior[0])
+                result["margin"] = float(posterior[0] - posterior[1]) if posterior.shape[0] > 1 else float(posterior[0])
+                names = list(labels)
+                ranked = np.argsort(-mean_scores)[:top_k]
+                result["top_k"] = [{"label": names[i], "score": float(mean_scores[i])} for i in ranked]
+                result["elapsed_seconds"] = time.perf_counter() - start
+                if on_update:
+                    on_update(dict(result))
+
+                reason = policy.stop_reason(
+                    result["confidence"], result["margin"], result["speech_seconds"], result["elapsed_seconds"]
+                )
+                if reason:
+                    result["stop_reason"] = reason
+                    break
+        finally:
+            # Ends a streaming decode (and its download) that is no longer needed.
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+        result["elapsed_seconds"] = time.perf_counter() - start
+        s["audio_seconds"] = result["audio_seconds"]
+        s["stop_reason"] = result["stop_reason"]
+        if not result["top_k"]:
+            s["status"] = "error"
+
+    if result["top_k"]:
+        logger.info(
+            f"Progressive classification stopped ({result['stop_reason']}) after {result['audio_seconds']:.1f}s "
+            f"of audio: {result['top_k'][0]['label']} (confidence {result['confidence']:.2f})"
+        )
+    return result
@@ -0,0 +1,70 @@
+# rem_accent_checker/utils/quantization.py
+import torch
+import torch.ao.nn.quantized.dynamic as nnqd
+from torch.ao.quantization import per_channel_dynamic_qconfig, quantize_dynamic
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+QUANTIZATION_MODES = ("int8",)
+
+# Only Linear layers are quantized: PyTorch's dynamic int8 Conv1d is numerically poor
+# (it flips top-1 predictions of the ECAPA-TDNN). ECAPA-TDNN has no Linear layers, but
+# its largest layers (the 3072-channel aggregation, attention and output projections)
+# are kernel-size-1 convolutions, i.e. a Linear applied per frame, and are run as such.
+_INT8_QCONFIG = {torch.nn.Linear: per_channel_dynamic_qconfig}
+
+class PointwiseLinear(torch.nn.Module):
+    """A kernel-size-1 Conv1d as a Linear over the channel axis of [batch, channels, time] input."""
+
+    def __init__(self, conv: torch.nn.Conv1d):
+        super().__init__()
+        self.linear = torch.nn.Linear(conv.in_channels, conv.out_channels, bias=conv.bias is not None)
+        with torch.no_grad():
+            self.linear.weight.copy_(conv.weight[:, :, 0])
+            if conv.bias is not None:
+                self.linear.bias.copy_(conv.bias)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.linear(x.transpose(1, 2)).transpose(1, 2)
+
+def _is_pointwise(conv: torch.nn.Conv1d) -> bool:
+    return (
+        conv.kernel_size == (1,) and conv.stride == (1,) and conv.groups == 1
+        and conv.padding in ((0,), "valid", "same") and conv.padding_mode == "zeros"
+    )
+
+def _pointwise_convs_to_linear(module: torch.nn.Module) -> int:
+    """Replaces kernel-size-1 Conv1d layers with `PointwiseLinear` in place; returns how many."""
+    replaced = 0
+    for name, child in module.named_children():
+        if isinstance(child, torch.nn.Conv1d) and _is_pointwise(child):
+            setattr(module, name, PointwiseLinear(child))
+            replaced += 1
+        else:
+            replaced += _pointwise_convs_to_linear(child)
+    return replaced
+
+def quantize_module(module: torch.nn.Module, mode: str = "int8") -> torch.nn.Module:
+    """
+    Converts a module's Linear and pointwise (kernel-size-1) Conv1d layers to
+    dynamically quantized int8 Linear layers. Wider convolutions stay in fp32.
+
+    Weights are stored as int8 with per-channel scales; activations are quantized on
+    the fly per batch, so no calibration data is needed. The conversion happens in
+    place, so the fp32 weights can be freed.
+
+    Args:
+        module (torch.nn.Module): The (eval-mode) module to quantize.
+        mode (str): The quantization mode; only "int8" is supported.
+
+    Returns:
+        torch.nn.Module: The quantized module.
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}'. Supported: {', '.join(QUANTIZATION_MODES)}.")
+    n_pointwise = _pointwise_convs_to_linear(module)
+    quantized = quantize_dynamic(module, _INT8_QCONFIG, dtype=torch.qint8, inplace=True)
+    n_layers = sum(isinstance(m, nnqd.Linear) for m in quantized.modules())
+    logger.info(f"Quantized {n_layers} Linear layers ({n_pointwise} of them pointwise Conv1d) to {mode}.")
+    return quantized
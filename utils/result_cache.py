@@ -0,0 +1,153 @@
+# rem_accent_checker/utils/result_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "accent_classifier", "results.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+
+def make_cache_key(source_id: str, model_version: str, top_k: int, **options: Any) -> str:
+    """
+    Builds a content-addressed key for one analysis result.
+
+    Args:
+        source_id (str): A normalized identifier of the media, e.g. the clean URL from
+            `get_clean_youtube_url`, or the direct URL itself.
+        model_version (str): The classifier's `model_version` (checkpoint hash).
+        top_k (int): The number of predictions that were requested.
+        **options: Any other settings that change the result (e.g. the analysis window).
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    payload = json.dumps(
+        {"source": source_id.strip(), "model": model_version, "top_k": top_k, "options": options},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    A persistent on-disk cache of analysis results, backed by SQLite.
+
+    Entries expire after `ttl_seconds`. When more than `max_entries` are stored, the
+    least recently used ones are evicted. A new connection is opened per operation,
+    so one instance can be shared across threads, and several processes can share
+    the same file.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        """
+        Args:
+            path (Optional[str]): The SQLite file. Defaults to $ACCENT_CACHE_PATH or
+                ~/.cache/accent_classifier/results.sqlite3.
+            ttl_seconds (float): How long an entry stays valid.
+            max_entries (int): Upper bound on stored entries (LRU eviction).
+        """
+        self.path = path or os.environ.get("ACCENT_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+        logger.info(f"Result cache ready at: {self.path}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Opens a connection that commits on success and is always closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, hit: bool):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for `key`, or None on a miss or an expired entry.
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value FROM results WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds),
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache lookup failed. Error: {e}")
+            row = None
+
+        self._count(row is not None)
+        if row is None:
+            return None
+        logger.info(f"Result cache hit for key {key[:12]}")
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        """
+        Stores a JSON-serializable value, then drops expired and least recently used entries.
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now),
+                )
+                conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+                conn.execute(
+                    "DELETE FROM results WHERE key IN ("
+                    " SELECT key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not store result in cache. Error: {e}")
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def __bool__(self) -> bool:
+        # Without this, `if cache:` would be False for an empty cache (via __len__) and a
+        # fresh cache would never be written to; a cache object is always usable.
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss counters for this process and the number of stored entries."""
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        return {"hits": hits, "misses": misses, "entries": len(self)}
@@ -0,0 +1,334 @@
+# rem_accent_checker/utils/scratch.py
+"""
+Scratch space for downloads and extracted audio, with a global byte quota.
+
+Every job that writes media to disk takes a `ScratchDir` from the process's
+`ScratchSpace`, reserving the bytes it expects to write (the preflight's size
+estimate, or `default_job_bytes`). When the reservations would exceed the quota,
+`acquire` waits until running jobs give space back instead of letting the disk
+fill up and every job fail. A job gives space back as soon as it no longer needs
+a file (`discard`, e.g. the download once its audio is decoded) and all of it when
+it ends (`release`).
+
+The root is ACCENT_SCRATCH_DIR if set, else a RAM-backed tmpfs (/dev/shm) when
+one is mounted with room to spare, so media I/O does not compete with the model
+for the disk, else the system temp directory. The quota is ACCENT_SCRATCH_QUOTA_MB,
+or half the root's free space at startup. It is per process: processes sharing a
+root should split it between them.
+
+A job that learns it will write more (e.g. a WAV fallback) grows its reservation
+with `expect`, which waits against the quota the same way.
+
+`usage()` reports the current reservations and bytes on disk. The reservations are
+published as accent_scratch_* gauges whenever they change; the bytes on disk are
+measured (walking every job directory) only when `usage()` is called.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from .metrics import REGISTRY
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+SCRATCH_DIR_ENV = "ACCENT_SCRATCH_DIR"
+SCRATCH_QUOTA_ENV = "ACCENT_SCRATCH_QUOTA_MB"
+SCRATCH_JOB_ENV = "ACCENT_SCRATCH_JOB_MB"
+TMPFS_CANDIDATES = ("/dev/shm",)
+# A tmpfs with less free space than this is not worth using (it is RAM).
+MIN_TMPFS_FREE_BYTES = 512 * 1024 * 1024
+# Share of the root's free space used as the quota when none is configured.
+DEFAULT_QUOTA_FRACTION = 0.5
+# Reserved for a job whose download size is unknown: a minute or two of audio, with headroom.
+DEFAULT_JOB_BYTES = 64 * 1024 * 1024
+
+SCRATCH_RESERVED_BYTES = REGISTRY.gauge("accent_scratch_reserved_bytes", "Scratch bytes reserved by running jobs.")
+SCRATCH_USED_BYTES = REGISTRY.gauge("accent_scratch_used_bytes", "Bytes currently on disk in job scratch directories.")
+SCRATCH_QUOTA_BYTES = REGISTRY.gauge("accent_scratch_quota_bytes", "The scratch space quota.")
+SCRATCH_ACTIVE_DIRS = REGISTRY.gauge("accent_scratch_active_dirs", "Job scratch directories in use.")
+SCRATCH_WAITING = REGISTRY.gauge("accent_scratch_waiting_jobs", "Jobs waiting for scratch space.")
+
+def _mount_type(path: str) -> Optional[str]:
+    """The filesystem type of the mount holding `path` (Linux only; None elsewhere)."""
+    path = os.path.realpath(path)
+    best, best_type = "", None
+    try:
+        with open("/proc/mounts", "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1]
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) > len(best):
+                    best, best_type = mount_point, fields[2]
+    except OSError:
+        return None
+    return best_type
+
+def default_scratch_root() -> str:
+    """ACCENT_SCRATCH_DIR, else a writable tmpfs with room to spare, else the system temp directory."""
+    configured = os.environ.get(SCRATCH_DIR_ENV)
+    if configured:
+        return configured
+    for candidate in TMPFS_CANDIDATES:
+        try:
+            if (
+                os.path.isdir(candidate) and os.access(candidate, os.W_OK)
+                and _mount_type(candidate) == "tmpfs"
+                and shutil.disk_usage(candidate).free >= MIN_TMPFS_FREE_BYTES
+            ):
+                return candidate
+        except OSError:
+            continue
+    return tempfile.gettempdir()
+
+def directory_bytes(path: str) -> int:
+    """The total size of the files under `path` (0 if it is gone)."""
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+class ScratchDir:
+    """One job's scratch directory and its share of the quota. Use as a context manager or call `release`."""
+
+    def __init__(self, space: "ScratchSpace", path: str, reserved: int):
+        self.space = space
+        self.path = path
+        self.reserved = reserved
+        self.released = False
+
+    def used_bytes(self) -> int:
+        return directory_bytes(self.path)
+
+    def expect(
+        self,
+        extra_bytes: float,
+        timeout: Optional[float] = None,
+        on_wait: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """
+        Re-reserves what is on disk now plus `extra_bytes` about to be written (e.g. a WAV),
+        waiting like `ScratchSpace.acquire` while that does not fit in the quota. More than
+        the whole quota is capped to it.
+
+        Args:
+            extra_bytes (float): What is about to be written.
+            timeout (Optional[float]): Longest wait in seconds (None: no limit).
+            on_wait (Optional[Callable]): Called once if the job has to wait.
+
+        Returns:
+            bool: False if the wait timed out; the reservation is then unchanged.
+        """
+        return self.space._grow(self, self.used_bytes() + max(0, int(extra_bytes)), timeout, on_wait)
+
+    def discard(self, path: Optional[str]):
+        """Deletes a file (or directory) in here that is no longer needed and gives its space back."""
+        if not path or self.released:
+            return
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.space._resize(self, self.used_bytes())
+
+    def release(self):
+        """Deletes the directory and returns its reservation; safe to call more than once."""
+        if self.released:
+            return
+        self.released = True
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.space._release(self)
+
+    def __enter__(self) -> "ScratchDir":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class ScratchSpace:
+    """Hands out job scratch directories under one root, within a byte quota."""
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        quota_bytes: Optional[int] = None,
+        default_job_bytes: int = DEFAULT_JOB_BYTES,
+    ):
+        """
+        Args:
+            root (Optional[str]): Where job directories are created. Defaults to `default_scratch_root()`.
+            quota_bytes (Optional[int]): Most bytes reserved at once. Defaults to
+                DEFAULT_QUOTA_FRACTION of the root's free space.
+            default_job_bytes (int): Reserved for a job that does not know its size.
+        """
+        self.root = root or default_scratch_root()
+        os.makedirs(self.root, exist_ok=True)
+        if quota_bytes is None:
+            quota_bytes = int(shutil.disk_usage(self.root).free * DEFAULT_QUOTA_FRACTION)
+        self.quota_bytes = int(quota_bytes)
+        self.default_job_bytes = default_job_bytes
+        self._active: List[ScratchDir] = []
+        self._waiting = 0
+        self._condition = threading.Condition()
+        logger.info(f"Scratch space at {self.root} ({_mount_type(self.root) or 'unknown fs'}), "
+                    f"quota {self.quota_bytes / 1e6:.0f} MB")
+        self._publish()
+
+    @classmethod
+    def from_env(cls) -> "ScratchSpace":
+        """Builds a scratch space from ACCENT_SCRATCH_DIR, ACCENT_SCRATCH_QUOTA_MB and ACCENT_SCRATCH_JOB_MB."""
+        env = os.environ
+        quota = int(float(env[SCRATCH_QUOTA_ENV]) * 1e6) if env.get(SCRATCH_QUOTA_ENV) else None
+        job_bytes = int(float(env[SCRATCH_JOB_ENV]) * 1e6) if env.get(SCRATCH_JOB_ENV) else DEFAULT_JOB_BYTES
+        return cls(root=env.get(SCRATCH_DIR_ENV), quota_bytes=quota, default_job_bytes=job_bytes)
+
+    @property
+    def reserved_bytes(self) -> int:
+        with self._condition:
+            return sum(scratch.reserved for scratch in self._active)
+
+    def acquire(
+        self,
+        expected_bytes: Optional[float] = None,
+        prefix: str = "accent_job_",
+        timeout: Optional[float] = None,
+        on_wait: Optional[Callable[[], None]] = None,
+    ) -> Optional[ScratchDir]:
+        """
+        Creates a scratch directory once `expected_bytes` fit in the quota, waiting for
+        running jobs to give space back if they do not fit yet.
+
+        Args:
+            expected_bytes (Optional[float]): What the job will write; defaults to
+                `default_job_bytes`. More than the whole quota is capped to it, so such
+                a job runs, alone.
+            prefix (str): The directory name prefix.
+            timeout (Optional[float]): Longest wait in seconds (None: no limit).
+            on_wait (Optional[Callable]): Called once if the job has to wait, e.g. to
+                tell the user.
+
+        Returns:
+            Optional[ScratchDir]: The directory, or None if the wait timed out.
+        """
+        reserve = int(expected_bytes) if expected_bytes else self.default_job_bytes
+        reserve = min(reserve, self.quota_bytes)
+        with self._condition:
+            if not self._wait_for_room_locked(reserve, 0, timeout, on_wait):
+                return None
+            scratch = ScratchDir(self, tempfile.mkdtemp(prefix=prefix, dir=self.root), reserve)
+            self._active.append(scratch)
+            self._publish()
+        return scratch
+
+    def usage(self) -> Dict[str, Any]:
+        """
+        Current scratch usage, for monitoring.
+
+        Returns:
+            Dict[str, Any]: 'root', 'quota_bytes', 'reserved_bytes', 'used_bytes' (on disk
+            now), 'active' (directories in use) and 'waiting' (jobs waiting for space).
+        """
+        with self._condition:
+            active = list(self._active)
+            usage = {
+                "root": self.root, "quota_bytes": self.quota_bytes, "reserved_bytes": self._used_locked(),
+                "active": len(active), "waiting": self._waiting,
+            }
+        # Walks every job directory, so outside the lock; this is also the only place the gauge is set.
+        usage["used_bytes"] = sum(scratch.used_bytes() for scratch in active)
+        SCRATCH_USED_BYTES.set(usage["used_bytes"], root=self.root)
+        return usage
+
+    def _used_locked(self) -> int:
+        return sum(scratch.reserved for scratch in self._active)
+
+    def _wait_for_room_locked(
+        self, reserve: int, held: int, timeout: Optional[float], on_wait: Optional[Callable[[], None]],
+    ) -> bool:
+        """
+        Waits (with the condition held) until `reserve` bytes fit in the quota, counting
+        `held` bytes of the current reservations as the caller's own; False on timeout.
+        """
+        def fits() -> bool:
+            return self._used_locked() - held + reserve <= self.quota_bytes
+
+        if fits():
+            return True
+        logger.info(f"Waiting for {reserve / 1e6:.0f} MB of scratch space "
+                    f"({self._used_locked() / 1e6:.0f}/{self.quota_bytes / 1e6:.0f} MB reserved)")
+        if on_wait:
+            on_wait()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._waiting += 1
+        self._publish()
+        try:
+            while not fits():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    logger.warning(f"Gave up waiting for scratch space after {timeout:.0f}s")
+                    return False
+                self._condition.wait(remaining)
+        finally:
+            self._waiting -= 1
+            self._publish()
+        return True
+
+    def _grow(
+        self, scratch: ScratchDir, reserved: int, timeout: Optional[float], on_wait: Optional[Callable[[], None]],
+    ) -> bool:
+        reserved = min(reserved, self.quota_bytes)
+        with self._condition:
+            if scratch.released:
+                return False
+            if not self._wait_for_room_locked(reserved, scratch.reserved, timeout, on_wait):
+                return False
+            scratch.reserved = reserved
+            self._publish()
+            self._condition.notify_all()
+        return True
+
+    def _resize(self, scratch: ScratchDir, reserved: int):
+        with self._condition:
+            if scratch.released:
+                return
+            scratch.reserved = reserved
+            self._publish()
+            self._condition.notify_all()
+
+    def _release(self, scratch: ScratchDir):
+        with self._condition:
+            if scratch in self._active:
+                self._active.remove(scratch)
+            self._publish()
+            self._condition.notify_all()
+
+    def _publish(self):
+        """Updates the reservation gauges (called with the condition held, so no disk access)."""
+        labels = {"root": self.root}
+        SCRATCH_RESERVED_BYTES.set(self._used_locked(), **labels)
+        SCRATCH_QUOTA_BYTES.set(self.quota_bytes, **labels)
+        SCRATCH_ACTIVE_DIRS.set(len(self._active), **labels)
+        SCRATCH_WAITING.set(self._waiting, **labels)
+
+_default_space: Optional[ScratchSpace] = None
+_default_lock = threading.Lock()
+
+def get_scratch_space() -> ScratchSpace:
+    """The process-wide scratch space (`ScratchSpace.from_env()`), shared by the pipeline and batch runs."""
+    global _default_space
+    with _default_lock:
+        if _default_space is None:
+            _default_space = ScratchSpace.from_env()
+        return _default_space
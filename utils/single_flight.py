@@ -0,0 +1,89 @@
+# rem_accent_checker/utils/single_flight.py
+"""
+Cross-process single-flight locks.
+
+Processes that share a lock directory (several Streamlit workers on one host or a
+shared volume) take a `FlightLock` per analysis key before doing the work. The
+first process gets it; the others wait until it is released and then read the
+result the first one stored in the shared result cache, instead of downloading
+and classifying the same video again.
+
+Locks are `flock`-based, so the OS releases them if the holding process dies.
+The lock files are left in place (they are empty); deleting a lock file while
+another process waits on it would let a third process lock a new file.
+"""
+import hashlib
+import os
+import time
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_POLL_SECONDS = 0.25
+
+def cross_process_locks_supported() -> bool:
+    """False on platforms without fcntl, where `FlightLock` cannot be used."""
+    return fcntl is not None
+
+class FlightLock:
+    """An exclusive, non-reentrant lock on one key, shared by every process using `directory`."""
+
+    def __init__(self, directory: str, key: str):
+        """
+        Args:
+            directory (str): The shared lock directory; created if missing.
+            key (str): What the lock is for, e.g. an analysis cache key.
+
+        Raises:
+            RuntimeError: If the platform has no `fcntl` (cross-process locks unsupported).
+        """
+        if fcntl is None:
+            raise RuntimeError("Cross-process locks need fcntl, which this platform does not have.")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.lock")
+        self._file: Optional[IO] = None
+
+    @property
+    def locked(self) -> bool:
+        """True while this instance holds the lock."""
+        return self._file is not None
+
+    def acquire(self, blocking: bool = True, timeout: Optional[float] = None, poll_seconds: float = DEFAULT_POLL_SECONDS) -> bool:
+        """
+        Takes the lock.
+
+        Args:
+            blocking (bool): Wait for the lock if another process holds it.
+            timeout (Optional[float]): Longest wait in seconds (None: no limit).
+            poll_seconds (float): How often to retry while waiting.
+
+        Returns:
+            bool: True if the lock is now held, False if it was busy (or the wait timed out).
+        """
+        if self._file is not None:
+            return True
+        lock_file = open(self.path, "a+")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._file = lock_file
+                return True
+            except BlockingIOError:
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    lock_file.close()
+                    return False
+                time.sleep(poll_seconds)
+
+    def release(self):
+        """Releases the lock if held; safe to call from any thread and more than once."""
+        lock_file, self._file = self._file, None
+        if lock_file is None:
+            return
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        finally:
+            lock_file.close()
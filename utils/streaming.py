@@ -0,0 +1,486 @@
+# rem_accent_checker/utils/streaming.py
+"""
+Live accent classification of audio that is still arriving (microphone, live streams).
+
+`StreamingClassifier` keeps the most recent audio in a fixed-size `RingBuffer` and
+classifies overlapping windows (6 s long, one every 2 s by default) as they fill.
+Windows are classified in order while the engine keeps up; once it falls more than
+`max_lag_seconds` behind the input it jumps to the newest window, so a result is
+never older than that however slow the model is. Results are smoothed with an
+exponential moving average, and only the last `history` updates are kept, so memory
+stays constant however long a session runs.
+
+`LiveSession` runs a chunk source into the engine on two background threads (one
+reads and buffers, one classifies), so capture never waits for the model, and a UI
+polls it for updates. Sources: `live_stream_chunks` (a live stream URL through
+ffmpeg), `ChunkQueue` (pushed audio, e.g. microphone frames) and `paced` (any chunk
+iterator played back in real time, e.g. a local file for offline testing).
+
+A web UI starts its sessions through the process-wide `LiveSessions` registry
+(`get_live_sessions`), which caps how many run at once and stops the ones no viewer
+has polled (`LiveSession.touch`) for a while, e.g. because the browser tab was closed:
+
+    python -m utils.streaming recording.wav [--speed 4]
+    python -m utils.streaming https://www.youtube.com/watch?v=LIVE_ID
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from .audio_utils import MODEL_SAMPLE_RATE, stream_audio_chunks
+from .metrics import span
+from .progressive import ALL_LABELS
+from .vad import trim_silence
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_WINDOW_SECONDS = 6.0
+DEFAULT_HOP_SECONDS = 2.0
+DEFAULT_MAX_LAG_SECONDS = 4.0
+# Weight of the newest window in the running average.
+DEFAULT_SMOOTHING = 0.3
+DEFAULT_HISTORY = 300
+# Windows with less speech than this are reported as silence and leave the average alone.
+MIN_WINDOW_SPEECH_SECONDS = 1.5
+# How much audio live sources hand over at a time.
+LIVE_CHUNK_SECONDS = 0.5
+# Live sessions a process runs at once, and how long one runs unpolled before it is stopped.
+LIVE_MAX_SESSIONS_ENV = "ACCENT_LIVE_MAX_SESSIONS"
+LIVE_IDLE_SECONDS_ENV = "ACCENT_LIVE_IDLE_SECONDS"
+DEFAULT_MAX_LIVE_SESSIONS = 4
+DEFAULT_LIVE_IDLE_SECONDS = 30.0
+
+class RingBuffer:
+    """A fixed-size buffer of the latest float32 samples, addressed by absolute sample position."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total_written = 0
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def write(self, samples: np.ndarray):
+        """Appends samples, overwriting the oldest ones once full."""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        count = samples.shape[0]
+        # Only the newest `capacity` samples of an oversized write can survive it.
+        samples = samples[-self.capacity:]
+        with self._lock:
+            start = (self.total_written + count - samples.shape[0]) % self.capacity
+            first = min(samples.shape[0], self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._data[: samples.shape[0] - first] = samples[first:]
+            self.total_written += count
+
+    def read(self, end: int, length: int) -> Optional[np.ndarray]:
+        """
+        Returns a copy of the samples at absolute positions [end - length, end).
+
+        Returns:
+            Optional[np.ndarray]: The samples, or None if they are not written yet or
+            have already been overwritten.
+        """
+        with self._lock:
+            if end > self.total_written or end - length < max(0, self.total_written - self.capacity):
+                return None
+            indices = np.arange(end - length, end) % self.capacity
+            return self._data[indices]
+
+class StreamingClassifier:
+    """Classifies overlapping windows of a live audio stream with bounded latency and constant memory."""
+
+    def __init__(
+        self,
+        classifier,
+        window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        hop_seconds: float = DEFAULT_HOP_SECONDS,
+        max_lag_seconds: float = DEFAULT_MAX_LAG_SECONDS,
+        smoothing: float = DEFAULT_SMOOTHING,
+        history: int = DEFAULT_HISTORY,
+        top_k: int = 5,
+        sample_rate: int = MODEL_SAMPLE_RATE,
+    ):
+        """
+        Args:
+            classifier: An AccentClassifier or an InferenceClient (anything with `classify_batch`).
+            window_seconds (float): Audio per classification.
+            hop_seconds (float): Step between windows; less than the window means overlap.
+            max_lag_seconds (float): How far behind the input the engine may fall before
+                it skips to the newest window.
+            smoothing (float): Weight of the newest window in the running average (0-1].
+            history (int): Updates kept for `updates`.
+            top_k (int): The number of predictions per update.
+            sample_rate (int): The rate of the fed samples (the model's rate).
+        """
+        self.classifier = classifier
+        self.sample_rate = sample_rate
+        self.window = int(window_seconds * sample_rate)
+        self.hop = max(1, int(hop_seconds * sample_rate))
+        self.max_lag = int(max_lag_seconds * sample_rate)
+        self.smoothing = smoothing
+        self.top_k = top_k
+        # Room for one window plus the allowed lag, and a hop of slack for the writer.
+        self.buffer = RingBuffer(self.window + self.max_lag + self.hop)
+        self.average: Dict[str, float] = {}
+        self.windows_classified = 0
+        self.windows_skipped = 0
+        self._next_end = self.window
+        self._updates: "deque[Dict[str, Any]]" = deque(maxlen=history)
+        self._updates_seen = 0
+        self._updates_lock = threading.Lock()
+
+    def feed(self, samples: np.ndarray):
+        """Adds newly arrived audio; cheap and thread-safe, the model is not run here."""
+        self.buffer.write(samples)
+
+    def due(self) -> bool:
+        """True if a window is complete and waiting to be classified."""
+        return self.buffer.total_written >= self._next_end
+
+    def step(self) -> Optional[Dict[str, Any]]:
+        """
+        Classifies the next due window, if any.
+
+        Returns:
+            Optional[Dict[str, Any]]: The update (see `updates`), or None if no window was due.
+        """
+        written = self.buffer.total_written
+        if written < self._next_end:
+            return None
+        if written - self._next_end > self.max_lag:
+            # Behind by more than allowed: drop the stale windows and take the newest one.
+            newest = self._next_end + (written - self._next_end) // self.hop * self.hop
+            self.windows_skipped += (newest - self._next_end) // self.hop
+            self._next_end = newest
+        end = self._next_end
+        self._next_end += self.hop
+        window = self.buffer.read(end, self.window)
+        if window is None:
+            return None
+
+        started = time.perf_counter()
+        speech, _ = trim_silence(window, sample_rate=self.sample_rate)
+        scores = []
+        if speech.shape[0] >= MIN_WINDOW_SPEECH_SECONDS * self.sample_rate:
+            with span("stream_window", audio_seconds=self.window / self.sample_rate):
+                scores = self.classifier.classify_batch([speech], top_k=ALL_LABELS)[0]
+        if scores:
+            self.windows_classified += 1
+            for label in set(self.average) | {item["label"] for item in scores}:
+                score = next((item["score"] for item in scores if item["label"] == label), 0.0)
+                previous = self.average.get(label, score)
+                self.average[label] = (1 - self.smoothing) * previous + self.smoothing * score
+
+        ranked = sorted(self.average.items(), key=lambda item: -item[1])[: self.top_k]
+        update = {
+            "stream_seconds": end / self.sample_rate,
+            "window": scores[0] if scores else None,
+            "top_k": [{"label": label, "score": score} for label, score in ranked],
+            "compute_seconds": time.perf_counter() - started,
+            # How much newer audio had arrived by the time this result was ready.
+            "lag_seconds": (self.buffer.total_written - end) / self.sample_rate,
+        }
+        with self._updates_lock:
+            self._updates.append(update)
+            self._updates_seen += 1
+        return update
+
+    def updates(self, since: int = 0) -> List[Dict[str, Any]]:
+        """
+        Returns the updates from number `since` on (poll with the count seen so far),
+        as far as they are still in the history.
+
+        Each update has 'stream_seconds' (the window's end in the stream), 'window'
+        (that window's top {'label', 'score'}, None for silence), 'top_k' (the smoothed
+        ranking), 'compute_seconds' and 'lag_seconds'.
+        """
+        with self._updates_lock:
+            first_kept = self._updates_seen - len(self._updates)
+            return list(self._updates)[max(0, since - first_kept):]
+
+    @property
+    def update_count(self) -> int:
+        with self._updates_lock:
+            return self._updates_seen
+
+class ChunkQueue:
+    """A chunk source fed from elsewhere (e.g. microphone frames); iterate it to consume."""
+
+    def __init__(self, max_chunks: int = 256):
+        # Bounded: if the consumer stalls, the oldest audio is dropped rather than memory growing.
+        self._queue: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=max_chunks)
+        self._closed = threading.Event()
+
+    def put(self, samples: np.ndarray):
+        """Adds samples at the model rate; drops the oldest chunk when full."""
+        if self._closed.is_set():
+            return
+        while True:
+            try:
+                self._queue.put_nowait(np.asarray(samples, dtype=np.float32).reshape(-1))
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        """Ends the iteration once the queued chunks are consumed."""
+        self._closed.set()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        while True:
+            try:
+                chunk = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._closed.is_set():
+                    return
+                continue
+            yield chunk
+
+def to_model_rate(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Resamples mono float samples to the model's rate (e.g. 48 kHz browser audio)."""
+    samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+    if sample_rate == MODEL_SAMPLE_RATE:
+        return samples
+    from math import gcd
+    from scipy.signal import resample_poly
+    divisor = gcd(MODEL_SAMPLE_RATE, sample_rate)
+    return resample_poly(samples, MODEL_SAMPLE_RATE // divisor, sample_rate // divisor).astype(np.float32)
+
+def paced(chunks: Iterable[np.ndarray], sample_rate: int = MODEL_SAMPLE_RATE, speed: float = 1.0) -> Iterator[np.ndarray]:
+    """Yields chunks no faster than real time (times `speed`), as a live source would deliver them."""
+    started = time.monotonic()
+    delivered = 0
+    for chunk in chunks:
+        delivered += len(chunk)
+        wait = started + delivered / sample_rate / speed - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        yield chunk
+
+def live_stream_chunks(url: str, chunk_seconds: float = LIVE_CHUNK_SECONDS) -> Iterator[np.ndarray]:
+    """
+    Yields the audio of a live stream URL as it is broadcast.
+
+    Raises:
+        RuntimeError: If no stream could be resolved or decoded.
+    """
+    from .downloader import resolve_stream_url
+    # Live streams are usually HLS with muxed formats only; any single stream with audio will do.
+    stream = resolve_stream_url(url, "bestaudio/best")
+    if stream is None:
+        raise RuntimeError(f"Could not find a stream to listen to at {url}.")
+    yield from stream_audio_chunks(stream["url"], chunk_seconds=chunk_seconds, http_headers=stream["http_headers"])
+
+class LiveSession:
+    """Feeds a chunk source into a StreamingClassifier on background threads until the source ends or `stop`."""
+
+    def __init__(self, engine: StreamingClassifier, source: Iterable[np.ndarray], name: str = "live"):
+        self.engine = engine
+        self.name = name
+        self.error: Optional[BaseException] = None
+        self.samples_received = 0
+        self.source = source
+        # Heartbeat from whoever shows the results (see `touch`), on the monotonic clock.
+        self.last_polled = time.monotonic()
+        self.stopped_idle = False
+        self._stopped = threading.Event()
+        self._source_done = threading.Event()
+        self._reader = threading.Thread(target=self._read, name=f"{name}-reader", daemon=True)
+        self._worker = threading.Thread(target=self._classify, name=f"{name}-classifier", daemon=True)
+        self._reader.start()
+        self._worker.start()
+
+    def _read(self):
+        iterator = iter(self.source)
+        try:
+            for chunk in iterator:
+                if self._stopped.is_set():
+                    break
+                self.engine.feed(chunk)
+                self.samples_received += len(chunk)
+        except Exception as e:
+            logger.error(f"{self.name}: the audio source failed. Error: {e}")
+            self.error = e
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+            self._source_done.set()
+
+    def _classify(self):
+        try:
+            while not self._stopped.is_set():
+                if self.engine.step() is not None:
+                    continue
+                if self._source_done.is_set() and not self.engine.due():
+                    break
+                time.sleep(0.02)
+        except Exception as e:
+            logger.error(f"{self.name}: classification failed. Error: {e}")
+            self.error = e
+            self._stopped.set()
+
+    @property
+    def running(self) -> bool:
+        return self._worker.is_alive()
+
+    @property
+    def received_seconds(self) -> float:
+        return self.samples_received / self.engine.sample_rate
+
+    @property
+    def idle_seconds(self) -> float:
+        """Seconds since the last `touch`."""
+        return time.monotonic() - self.last_polled
+
+    def touch(self):
+        """Records that a viewer is still polling the session (a heartbeat)."""
+        self.last_polled = time.monotonic()
+
+    def stop(self, timeout: float = 5.0):
+        """Stops reading and classifying; a source blocked on input is abandoned after `timeout`."""
+        self._stopped.set()
+        if isinstance(self.source, ChunkQueue):
+            self.source.close()
+        self._worker.join(timeout)
+        self._reader.join(timeout)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the source is exhausted and every due window is classified; False on timeout."""
+        self._worker.join(timeout)
+        return not self._worker.is_alive()
+
+class LiveSessions:
+    """
+    The live sessions of one process: at most `max_sessions` run at once, and a
+    watcher thread stops those not polled for `idle_seconds`.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_LIVE_SESSIONS,
+        idle_seconds: float = DEFAULT_LIVE_IDLE_SECONDS,
+        check_seconds: float = 1.0,
+    ):
+        """
+        Args:
+            max_sessions (int): Sessions allowed to run at once.
+            idle_seconds (float): A session is stopped after this long without a `touch`.
+            check_seconds (float): How often the watcher looks for idle sessions.
+        """
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.check_seconds = check_seconds
+        self._sessions: List[LiveSession] = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self._watch, name="live-session-watcher", daemon=True).start()
+
+    @classmethod
+    def from_env(cls) -> "LiveSessions":
+        """Builds the registry from ACCENT_LIVE_MAX_SESSIONS and ACCENT_LIVE_IDLE_SECONDS."""
+        env = os.environ
+        return cls(
+            max_sessions=int(env.get(LIVE_MAX_SESSIONS_ENV) or DEFAULT_MAX_LIVE_SESSIONS),
+            idle_seconds=float(env.get(LIVE_IDLE_SECONDS_ENV) or DEFAULT_LIVE_IDLE_SECONDS),
+        )
+
+    @property
+    def active(self) -> int:
+        """Sessions running now."""
+        with self._lock:
+            return sum(session.running for session in self._sessions)
+
+    def start(self, engine: StreamingClassifier, source: Iterable[np.ndarray], name: str = "live") -> Optional[LiveSession]:
+        """
+        Starts a `LiveSession`, unless `max_sessions` are already running.
+
+        Returns:
+            Optional[LiveSession]: The session, or None if the process is at its limit.
+        """
+        with self._lock:
+            self._sessions = [session for session in self._sessions if session.running]
+            if len(self._sessions) >= self.max_sessions:
+                logger.warning(f"Refused live session '{name}': {len(self._sessions)} already running.")
+                return None
+            session = LiveSession(engine, source, name=name)
+            self._sessions.append(session)
+        return session
+
+    def stop(self, session: LiveSession, timeout: float = 1.0):
+        """Stops a session and forgets it."""
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        session.stop(timeout)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_seconds)
+            with self._lock:
+                idle = [s for s in self._sessions if s.running and s.idle_seconds > self.idle_seconds]
+            for session in idle:
+                logger.info(f"Stopping live session '{session.name}': not polled for {session.idle_seconds:.0f}s.")
+                session.stopped_idle = True
+                self.stop(session)
+
+_default_sessions: Optional[LiveSessions] = None
+_default_sessions_lock = threading.Lock()
+
+def get_live_sessions() -> LiveSessions:
+    """The process-wide live session registry (`LiveSessions.from_env()`), shared by every browser session."""
+    global _default_sessions
+    with _default_sessions_lock:
+        if _default_sessions is None:
+            _default_sessions = LiveSessions.from_env()
+        return _default_sessions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="A local media file (played back in real time) or a live stream URL.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed for a local file.")
+    parser.add_argument("--window-seconds", type=float, default=DEFAULT_WINDOW_SECONDS)
+    parser.add_argument("--hop-seconds", type=float, default=DEFAULT_HOP_SECONDS)
+    parser.add_argument("--max-lag-seconds", type=float, default=DEFAULT_MAX_LAG_SECONDS)
+    args = parser.parse_args()
+
+    from .classifier import AccentClassifier
+    engine = StreamingClassifier(
+        AccentClassifier(), window_seconds=args.window_seconds, hop_seconds=args.hop_seconds,
+        max_lag_seconds=args.max_lag_seconds,
+    )
+    if "://" in args.source:
+        source = live_stream_chunks(args.source)
+    else:
+        source = paced(stream_audio_chunks(args.source, chunk_seconds=LIVE_CHUNK_SECONDS), speed=args.speed)
+    session = LiveSession(engine, source)
+    seen = 0
+    try:
+        while session.running or seen < engine.update_count:
+            for update in engine.updates(since=seen):
+                seen += 1
+                best = update["top_k"][0] if update["top_k"] else None
+                window = f"{update['window']['label']} ({update['window']['score']:.2f})" if update["window"] else "silence"
+                overall = f"{best['label']} ({best['score']:.2f})" if best else "-"
+                print(f"{update['stream_seconds']:8.1f}s  window: {window:<28} overall: {overall:<28} "
+                      f"lag {update['lag_seconds']:.1f}s")
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.stop()
+    print(f"{engine.windows_classified} windows classified, {engine.windows_skipped} skipped to keep up.")
+
+if __name__ == "__main__":
+    main()
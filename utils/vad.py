@@ -0,0 +1,107 @@
+# rem_accent_checker/utils/vad.py
+import numpy as np
+from typing import Any, Dict, Sequence, Tuple
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Below this much detected speech a prediction is not meaningful.
+MIN_SPEECH_SECONDS = 3.0
+
+def trim_silence(
+    waveform: np.ndarray,
+    sample_rate: int = 16000,
+    frame_seconds: float = 0.03,
+    relative_threshold_db: float = 30.0,
+    absolute_threshold_db: float = -55.0,
+    padding_seconds: float = 0.2,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Drops silent and near-silent regions from a mono waveform with a fast energy VAD.
+
+    The waveform is cut into frames and each frame's energy (dBFS) is compared with
+    the loud end of the clip (95th percentile of frame energies): frames more than
+    `relative_threshold_db` below it, or below `absolute_threshold_db`, are treated
+    as non-speech. Speech regions are widened by `padding_seconds` on both sides so
+    word onsets and endings are kept. Everything is vectorized in NumPy.
+
+    Args:
+        waveform (np.ndarray): 1-D float samples in [-1, 1].
+        sample_rate (int): The waveform's sample rate in Hz.
+        frame_seconds (float): Analysis frame length.
+        relative_threshold_db (float): How far below the loud frames speech may be.
+        absolute_threshold_db (float): Frames quieter than this are never speech.
+        padding_seconds (float): Context kept around each speech region.
+
+    Returns:
+        Tuple[np.ndarray, Dict[str, Any]]: The speech-only samples, and a dictionary
+        with 'kept_seconds', 'dropped_seconds', 'speech_ratio' and 'intervals' (the
+        kept [start, end] regions in seconds of the input, to map times in the trimmed
+        audio back with `to_source_time`).
+    """
+    waveform = np.asarray(waveform, dtype=np.float32).reshape(-1)
+    total_seconds = waveform.shape[0] / sample_rate
+    frame = max(1, int(frame_seconds * sample_rate))
+    n_frames = waveform.shape[0] // frame
+    if n_frames == 0:
+        return waveform[:0], {
+            "kept_seconds": 0.0, "dropped_seconds": total_seconds, "speech_ratio": 0.0, "intervals": [],
+        }
+
+    frames = waveform[: n_frames * frame].reshape(n_frames, frame)
+    energy_db = 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    threshold_db = max(np.percentile(energy_db, 95) - relative_threshold_db, absolute_threshold_db)
+    speech = energy_db > threshold_db
+
+    pad_frames = int(round(padding_seconds / frame_seconds))
+    if pad_frames > 0 and speech.any():
+        kernel = np.ones(2 * pad_frames + 1)
+        speech = np.convolve(speech.astype(np.float32), kernel, mode="same") > 0
+
+    # The tail shorter than one frame follows the decision of the last full frame.
+    sample_mask = np.repeat(speech, frame)
+    tail = waveform.shape[0] - sample_mask.shape[0]
+    if tail:
+        sample_mask = np.concatenate([sample_mask, np.full(tail, speech[-1])])
+
+    trimmed = waveform[sample_mask]
+    kept_seconds = trimmed.shape[0] / sample_rate
+    # Runs of speech frames; a run reaching the last frame also covers the tail.
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], speech, [False]]).astype(np.int8)))
+    intervals = []
+    for first, last in zip(edges[::2], edges[1::2]):
+        end = waveform.shape[0] if last == n_frames else last * frame
+        intervals.append([first * frame / sample_rate, end / sample_rate])
+    stats = {
+        "kept_seconds": kept_seconds,
+        "dropped_seconds": total_seconds - kept_seconds,
+        "speech_ratio": kept_seconds / total_seconds if total_seconds else 0.0,
+        "intervals": intervals,
+    }
+    logger.info(
+        f"Voice activity detection kept {stats['kept_seconds']:.1f}s of speech and "
+        f"dropped {stats['dropped_seconds']:.1f}s of silence/non-speech."
+    )
+    return trimmed, stats
+
+def to_source_time(seconds: float, intervals: Sequence[Sequence[float]], end: bool = False) -> float:
+    """
+    Maps a time in audio trimmed by `trim_silence` to the time in its input.
+
+    Args:
+        seconds (float): A position in the trimmed audio.
+        intervals (Sequence): The 'intervals' of `trim_silence`'s stats.
+        end (bool): The position ends a span: at the seam between two kept regions it
+            maps to the end of the earlier one rather than the start of the later one.
+
+    Returns:
+        float: The position in the untrimmed input, in seconds.
+    """
+    elapsed = 0.0
+    for start, stop in intervals:
+        length = stop - start
+        if seconds < elapsed + length or (end and seconds <= elapsed + length):
+            return start + max(seconds - elapsed, 0.0)
+        elapsed += length
+    # At or past the end of the kept audio.
+    return intervals[-1][1] if intervals else seconds
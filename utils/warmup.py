@@ -0,0 +1,67 @@
+# rem_accent_checker/utils/warmup.py
+import threading
+import time
+from typing import Any, Callable, Optional
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+class BackgroundLoader:
+    """
+    Builds an expensive object (e.g. the classifier) on a background thread.
+
+    Loading starts as soon as the loader is created, so whatever the caller does
+    next (like rendering a UI) overlaps with it; only code that needs the object
+    calls `get` and, if loading is still running, waits for it.
+    """
+
+    def __init__(self, load: Callable[[], Any], name: str = "background-loader"):
+        """
+        Args:
+            load (Callable[[], Any]): Builds and returns the object. An exception it
+                raises is kept and re-raised by `get`.
+            name (str): The thread name, also used in log messages.
+        """
+        self.name = name
+        self.load_seconds: Optional[float] = None
+        self._load = load
+        self._value: Any = None
+        self._error: Optional[BaseException] = None
+        self._done = threading.Event()
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self._value = self._load()
+        except BaseException as e:
+            logger.error(f"{self.name} failed. Error: {e}")
+            self._error = e
+        finally:
+            self.load_seconds = time.perf_counter() - start
+            self._done.set()
+        if self._error is None:
+            logger.info(f"{self.name} finished in {self.load_seconds:.1f}s")
+
+    @property
+    def ready(self) -> bool:
+        """True once loading has finished, successfully or not."""
+        return self._done.is_set()
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        return self._error
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Returns the loaded object, waiting for it if needed.
+
+        Raises:
+            TimeoutError: If it is not loaded within `timeout` seconds.
+            Exception: Whatever the load function raised.
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} is still running after {timeout}s.")
+        if self._error is not None:
+            raise self._error
+        return self._value